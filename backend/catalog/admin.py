@@ -0,0 +1,20 @@
+"""
+Admin configuration for the catalog app
+"""
+from django.contrib import admin
+from .models import CatalogEntry
+
+
+@admin.register(CatalogEntry)
+class CatalogEntryAdmin(admin.ModelAdmin):
+    list_display = ['name', 'source', 'source_id', 'category', 'brand', 'price', 'ecoscore_grade', 'avg_rating', 'is_active', 'synced_at']
+    list_filter = ['source', 'is_active', 'is_eco_friendly', 'ecoscore_grade']
+    search_fields = ['name', 'category', 'brand']
+    ordering = ['source', 'source_id']
+    
+    # Entries are projections of the source products; rebuild instead of editing
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
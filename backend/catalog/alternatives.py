@@ -0,0 +1,205 @@
+"""
+Greener-alternative lookups: better-graded products in the same category
+
+Active catalog entries are grouped by (category, subcategory), and every
+entry also sits in a category-wide group. Each group is split into
+geometric price buckets, and each bucket is a list sorted by EcoScore grade,
+then score, then price. For "greener than X within +/- band of its price"
+only the buckets covering the band are read, and only their leading entries
+that grade better than X. The work per lookup therefore depends on the
+requested limit and band, not on the size of the catalog.
+
+The index lives in memory and follows catalog changes (see
+catalog.indexes), so it picks up new EcoScores as soon as products are
+saved.
+"""
+import math
+from bisect import insort
+from dataclasses import dataclass
+from heapq import merge
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .indexes import CatalogIndexHolder
+from .models import CatalogEntry
+
+VERSION_KEY = 'catalog:alternatives:version'
+REBUILD_INTERVAL = 600
+
+# Neighbouring buckets differ in price by this factor
+PRICE_BUCKET_RATIO = 1.25
+DEFAULT_PRICE_BAND = 0.3
+
+# Lower is greener; unrated entries never count as an alternative
+GRADE_RANKS = {'A': 0, 'B': 1, 'C': 2, 'D': 3, 'E': 4}
+UNRATED_RANK = len(GRADE_RANKS)
+
+ENTRY_FIELDS = (
+    'id', 'source', 'source_id', 'category_key', 'subcategory_key', 'price', 'ecoscore_value', 'ecoscore_grade',
+)
+
+
+@dataclass(frozen=True)
+class Candidate:
+    """
+    The fields of an entry the index compares on
+    """
+    entry_id: int
+    source: str
+    source_id: int
+    category_key: str
+    subcategory_key: str
+    price: float
+    ecoscore_value: float
+    grade_rank: int
+
+    @property
+    def sort_key(self) -> Tuple:
+        return (self.grade_rank, -self.ecoscore_value, self.price, self.entry_id)
+
+    def groups(self) -> List[Tuple[str, str]]:
+        groups = [(self.category_key, '')]
+        if self.subcategory_key:
+            groups.insert(0, (self.category_key, self.subcategory_key))
+        return groups
+
+
+def candidate(entry: Dict) -> Candidate:
+    return Candidate(
+        entry_id=entry['id'],
+        source=entry['source'],
+        source_id=entry['source_id'],
+        category_key=entry['category_key'],
+        subcategory_key=entry['subcategory_key'],
+        price=float(entry['price']),
+        ecoscore_value=entry['ecoscore_value'],
+        grade_rank=GRADE_RANKS.get(entry['ecoscore_grade'], UNRATED_RANK),
+    )
+
+
+def price_bucket(price: float) -> int:
+    return math.floor(math.log(max(price, 0.01)) / math.log(PRICE_BUCKET_RATIO))
+
+
+class AlternativesIndex:
+    """
+    Price-bucketed, grade-sorted candidate lists per category group
+    """
+
+    def __init__(self):
+        self.candidates: Dict[int, Candidate] = {}
+        self.entry_ids: Dict[Tuple[str, int], int] = {}
+        # {(category_key, subcategory_key): {bucket: [(sort_key, candidate), ...]}}
+        self.groups: Dict[Tuple[str, str], Dict[int, List[Tuple[Tuple, Candidate]]]] = {}
+
+    def add(self, item: Candidate):
+        self.remove(item.entry_id)
+        self.candidates[item.entry_id] = item
+        self.entry_ids[item.source, item.source_id] = item.entry_id
+        bucket = price_bucket(item.price)
+        for group in item.groups():
+            insort(self.groups.setdefault(group, {}).setdefault(bucket, []), (item.sort_key, item))
+
+    def bulk_load(self, items: List[Candidate]):
+        for item in items:
+            self.candidates[item.entry_id] = item
+            self.entry_ids[item.source, item.source_id] = item.entry_id
+            bucket = price_bucket(item.price)
+            for group in item.groups():
+                self.groups.setdefault(group, {}).setdefault(bucket, []).append((item.sort_key, item))
+        for buckets in self.groups.values():
+            for entries in buckets.values():
+                entries.sort()
+
+    def remove(self, entry_id: int):
+        item = self.candidates.pop(entry_id, None)
+        if item is None:
+            return
+        del self.entry_ids[item.source, item.source_id]
+        bucket = price_bucket(item.price)
+        for group in item.groups():
+            entries = self.groups[group][bucket]
+            entries.remove((item.sort_key, item))
+            if not entries:
+                del self.groups[group][bucket]
+                if not self.groups[group]:
+                    del self.groups[group]
+
+    def _greener_in_group(self, item: Candidate, group, low: float, high: float) -> Iterator[Candidate]:
+        """Greener candidates of one group within [low, high], best first"""
+        buckets = self.groups.get(group, {})
+        streams = []
+        for bucket in range(price_bucket(low), price_bucket(high) + 1):
+            streams.append(self._greener_in_bucket(item, buckets.get(bucket, ()), low, high))
+        for _, other in merge(*streams, key=lambda pair: pair[0]):
+            yield other
+
+    @staticmethod
+    def _greener_in_bucket(item: Candidate, entries, low: float, high: float):
+        for sort_key, other in entries:
+            if other.grade_rank >= item.grade_rank:
+                # Sorted by grade: nothing further along is greener
+                return
+            if low <= other.price <= high and other.entry_id != item.entry_id:
+                yield sort_key, other
+
+    def greener(self, entry_id: int, limit: int = 5, price_band: float = DEFAULT_PRICE_BAND) -> Optional[List[int]]:
+        """
+        Ids of up to ``limit`` entries grading better than ``entry_id`` and
+        priced within ``price_band`` (a fraction) of it, greenest first
+
+        The product's own subcategory is tried before the wider category.
+        Returns None when the entry is not indexed.
+        """
+        item = self.candidates.get(entry_id)
+        if item is None:
+            return None
+        low = item.price * (1 - price_band)
+        high = item.price * (1 + price_band)
+
+        results = []
+        for group in item.groups():
+            for other in self._greener_in_group(item, group, low, high):
+                if len(results) >= limit:
+                    return results
+                if other.entry_id not in results:
+                    results.append(other.entry_id)
+        return results
+
+
+def build_index() -> AlternativesIndex:
+    entries = CatalogEntry.objects.filter(is_active=True).values(*ENTRY_FIELDS)
+    index = AlternativesIndex()
+    index.bulk_load([candidate(entry) for entry in entries.iterator(chunk_size=2000)])
+    return index
+
+
+class GreenerAlternatives(CatalogIndexHolder):
+    """
+    Process-wide holder of the alternatives index
+    """
+    name = 'Greener alternatives'
+    version_key = VERSION_KEY
+    rebuild_interval = REBUILD_INTERVAL
+
+    def build(self) -> AlternativesIndex:
+        return build_index()
+
+    def greener(self, entry_id: int, limit: int = 5, price_band: float = DEFAULT_PRICE_BAND) -> Optional[List[int]]:
+        index = self.get_index()
+        with self._lock:
+            return index.greener(entry_id, limit, price_band)
+
+    def update(self, index: AlternativesIndex, source: str, source_ids: List[int]):
+        entries = CatalogEntry.objects.filter(source=source, source_id__in=source_ids, is_active=True)
+        active = {entry['source_id']: entry for entry in entries.values(*ENTRY_FIELDS)}
+        for source_id in source_ids:
+            if source_id in active:
+                index.add(candidate(active[source_id]))
+            else:
+                # Deactivated, or deleted along with its catalog row
+                entry_id = index.entry_ids.get((source, source_id))
+                if entry_id is not None:
+                    index.remove(entry_id)
+
+
+alternatives = GreenerAlternatives()
@@ -0,0 +1,92 @@
+"""
+Process-wide in-memory indexes built from the catalog
+
+An index is built from CatalogEntry on first use and kept current in two
+ways: catalog changes in this process are applied to it incrementally
+(``catalog_changed``, once committed), and each change bumps a shared
+version so other processes rebuild when they see a newer one. Every index
+is also rebuilt after ``rebuild_interval`` seconds to pick up anything the
+signals cannot see.
+"""
+import logging
+import threading
+import time
+from typing import List, Optional
+
+from django.db import transaction
+
+from ecoswitch_backend.versions import bump_version, get_version
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogIndexHolder:
+    """
+    Holder of one in-memory index, shared by every thread of the process
+
+    Subclasses build the index and fold changed entries into it.
+    """
+    name = None
+    version_key = None
+    rebuild_interval = 600
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._index = None
+        self._version = None
+        self._built_at = 0.0
+        self._building = False
+
+    def build(self):
+        raise NotImplementedError
+
+    def update(self, index, source: str, source_ids: List[int]):
+        """Apply changes to the given entries of one source to ``index``"""
+        raise NotImplementedError
+
+    def get_index(self):
+        version = get_version(self.version_key)
+        with self._lock:
+            index = self._index
+            expired = time.monotonic() - self._built_at > self.rebuild_interval
+            if index is not None and (self._building or (version == self._version and not expired)):
+                # Keep answering from the current index while a rebuild runs
+                return index
+            self._building = True
+
+        started = time.monotonic()
+        try:
+            index = self.build()
+        finally:
+            with self._lock:
+                self._building = False
+        logger.info(f"{self.name} index built in {(time.monotonic() - started) * 1000:.0f} ms")
+
+        with self._lock:
+            self._index = index
+            self._version = version
+            self._built_at = time.monotonic()
+        return index
+
+    def apply_changes(self, source: str, source_ids: Optional[List[int]]):
+        """
+        Fold catalog changes into this process's index and tell the others,
+        once the transaction writing them commits
+        """
+        transaction.on_commit(lambda: self._apply_committed(source, source_ids))
+
+    def _apply_committed(self, source: str, source_ids: Optional[List[int]]):
+        version = self._bump_version()
+        with self._lock:
+            if self._index is None:
+                return
+            if source_ids is None or self._version != version - 1:
+                # Whole source rebuilt, or changes from another process were
+                # missed in between; start over on next use
+                self._index = None
+                return
+            self.update(self._index, source, source_ids)
+            self._version = version
+
+    def _bump_version(self) -> int:
+        return bump_version(self.version_key)
@@ -0,0 +1,35 @@
+"""
+Management command to rebuild the unified catalog from every product source
+"""
+from django.core.management.base import BaseCommand, CommandError
+from catalog.sync import BATCH_SIZE, SOURCES, rebuild_catalog
+
+
+class Command(BaseCommand):
+    help = 'Re-project products, ecommerce products and merchant products into the catalog table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            action='append',
+            choices=list(SOURCES),
+            help='Only rebuild this source (repeatable; all sources by default)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Products loaded and written per batch (default {BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be a positive integer')
+
+        self.stdout.write('Rebuilding catalog...')
+        results = rebuild_catalog(options['source'], batch_size=options['batch_size'])
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write(self.style.SUCCESS('Catalog rebuilt'))
+        for source, counts in results.items():
+            self.stdout.write(f'{source}: {counts["synced"]} synced, {counts["removed"]} removed')
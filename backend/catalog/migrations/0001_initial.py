@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('product', 'Catalog product'), ('ecommerce', 'Shop product'), ('merchant', 'Merchant product')], max_length=20)),
+                ('source_id', models.PositiveBigIntegerField()),
+                ('name', models.CharField(max_length=200)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('category', models.CharField(max_length=100)),
+                ('category_key', models.CharField(max_length=100)),
+                ('brand', models.CharField(max_length=100)),
+                ('brand_key', models.CharField(max_length=100)),
+                ('is_eco_friendly', models.BooleanField(default=False)),
+                ('is_organic', models.BooleanField(default=False)),
+                ('is_biodegradable', models.BooleanField(default=False)),
+                ('is_recyclable', models.BooleanField(default=False)),
+                ('is_plastic_free', models.BooleanField(default=False)),
+                ('ecoscore_value', models.FloatField(default=0.0)),
+                ('ecoscore_grade', models.CharField(blank=True, max_length=1)),
+                ('avg_rating', models.FloatField(default=0.0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('stock_quantity', models.PositiveIntegerField(default=0)),
+                ('primary_image', models.CharField(blank=True, max_length=500)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField()),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Catalog entries',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['is_active', 'created_at', 'id'], name='catalog_active_created_idx'), models.Index(fields=['is_active', 'price', 'id'], name='catalog_active_price_idx'), models.Index(fields=['is_active', 'ecoscore_value', 'id'], name='catalog_active_ecoscore_idx'), models.Index(fields=['is_active', 'avg_rating', 'id'], name='catalog_active_rating_idx'), models.Index(fields=['is_active', 'name', 'id'], name='catalog_active_name_idx'), models.Index(fields=['is_active', 'category_key', 'price', 'id'], name='catalog_category_price_idx'), models.Index(fields=['is_active', 'source', 'category_key', 'brand_key', 'is_eco_friendly', 'ecoscore_grade'], name='catalog_facets_idx')],
+                'unique_together': {('source', 'source_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogentry',
+            name='subcategory',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='catalogentry',
+            name='subcategory_key',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
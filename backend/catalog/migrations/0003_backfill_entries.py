@@ -0,0 +1,137 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:10
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+ENTRY_FIELDS = [
+    'name', 'price', 'category', 'category_key', 'subcategory', 'subcategory_key', 'brand', 'brand_key',
+    'is_eco_friendly', 'is_organic', 'is_biodegradable', 'is_recyclable', 'is_plastic_free',
+    'ecoscore_value', 'ecoscore_grade', 'avg_rating', 'rating_count',
+    'stock_quantity', 'primary_image', 'is_active', 'created_at',
+]
+
+
+def normalize_key(value):
+    return ' '.join(str(value or '').split()).lower()[:100]
+
+
+def image_url(field_file):
+    return field_file.url if field_file else ''
+
+
+def product_entry(product):
+    return {
+        'name': product.name,
+        'price': product.price,
+        'category': product.category.name,
+        'subcategory': product.subcategory.name if product.subcategory_id else '',
+        'brand': product.brand.name,
+        'is_eco_friendly': product.is_eco_friendly,
+        'ecoscore_value': product.ecoscore_value,
+        'ecoscore_grade': product.ecoscore_grade,
+        'avg_rating': product.avg_rating,
+        'rating_count': product.rating_count,
+        'stock_quantity': product.stock_quantity,
+        'primary_image': image_url(product.primary_image),
+        'is_active': product.is_active,
+        'created_at': product.created_at,
+    }
+
+
+def shop_entry(product, image_names, storage):
+    image_name = image_names.get(product.pk)
+    return {
+        'name': product.name,
+        'price': product.price,
+        'category': product.category.name,
+        'brand': product.brand.name,
+        'is_eco_friendly': any([
+            product.is_organic, product.is_biodegradable, product.is_recyclable, product.is_plastic_free,
+        ]),
+        'is_organic': product.is_organic,
+        'is_biodegradable': product.is_biodegradable,
+        'is_recyclable': product.is_recyclable,
+        'is_plastic_free': product.is_plastic_free,
+        'avg_rating': product.avg_rating,
+        'rating_count': product.rating_count,
+        'stock_quantity': product.stock_quantity,
+        'primary_image': storage.url(image_name) if image_name else '',
+        'is_active': product.is_active,
+        'created_at': product.created_at,
+    }
+
+
+def merchant_entry(product):
+    return {
+        'name': product.name,
+        'price': product.price,
+        'category': product.category,
+        'subcategory': product.subcategory,
+        'brand': product.brand,
+        'is_eco_friendly': product.is_eco_friendly,
+        'ecoscore_value': product.ecoscore_value,
+        'ecoscore_grade': product.ecoscore_grade,
+        'stock_quantity': product.stock_quantity,
+        'primary_image': image_url(product.primary_image),
+        'is_active': product.is_active,
+        'created_at': product.created_at,
+    }
+
+
+def backfill_catalog_entries(apps, schema_editor):
+    """Project every existing product into the catalog, as ``rebuild_catalog`` does"""
+    CatalogEntry = apps.get_model('catalog', 'CatalogEntry')
+    ProductImage = apps.get_model('ecommerce', 'ProductImage')
+    image_storage = ProductImage._meta.get_field('image').storage
+    defaults = {field: CatalogEntry._meta.get_field(field).get_default() for field in ENTRY_FIELDS}
+
+    def shop_entries(products):
+        image_names = {}
+        primary_images = ProductImage.objects.filter(product__in=products, is_primary=True)
+        for product_id, image_name in primary_images.values_list('product_id', 'image'):
+            image_names.setdefault(product_id, image_name)
+        return [shop_entry(product, image_names, image_storage) for product in products]
+
+    sources = [
+        ('product', apps.get_model('products', 'Product').objects.select_related('category', 'subcategory', 'brand'),
+         lambda products: [product_entry(product) for product in products]),
+        ('ecommerce', apps.get_model('ecommerce', 'Product').objects.select_related('category', 'brand'),
+         shop_entries),
+        ('merchant', apps.get_model('merchants', 'MerchantProduct').objects.all(),
+         lambda products: [merchant_entry(product) for product in products]),
+    ]
+    for source, queryset, entries in sources:
+        last_id = 0
+        while True:
+            products = list(queryset.filter(pk__gt=last_id).order_by('pk')[:BATCH_SIZE])
+            if not products:
+                break
+            rows = []
+            for product, values in zip(products, entries(products)):
+                values = dict(defaults, **values)
+                for field in ('category', 'subcategory', 'brand'):
+                    values[field] = values[field][:100]
+                    values[f'{field}_key'] = normalize_key(values[field])
+                rows.append(CatalogEntry(source=source, source_id=product.pk, **values))
+            CatalogEntry.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['source', 'source_id'],
+                update_fields=ENTRY_FIELDS + ['synced_at'],
+            )
+            last_id = products[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_entry_subcategory'),
+        ('products', '0010_content_addressed_images'),
+        ('ecommerce', '0008_recount_customer_pair_stream'),
+        ('merchants', '0007_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_catalog_entries, migrations.RunPython.noop),
+    ]
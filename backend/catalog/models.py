@@ -0,0 +1,73 @@
+"""
+Denormalized catalog read model across every product source
+"""
+from django.db import models
+
+
+class CatalogEntry(models.Model):
+    """
+    One flat row per product of ``products``, ``ecommerce`` and ``merchants``
+    
+    Kept in sync by catalog.signals and rebuilt with ``rebuild_catalog``;
+    never edited directly.
+    """
+    SOURCE_CHOICES = [
+        ('product', 'Catalog product'),
+        ('ecommerce', 'Shop product'),
+        ('merchant', 'Merchant product'),
+    ]
+    
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    source_id = models.PositiveBigIntegerField()
+    
+    name = models.CharField(max_length=200)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    category = models.CharField(max_length=100)
+    category_key = models.CharField(max_length=100)  # Lowercased category, for filtering
+    subcategory = models.CharField(max_length=100, blank=True)
+    subcategory_key = models.CharField(max_length=100, blank=True)  # Lowercased subcategory, for grouping
+    brand = models.CharField(max_length=100)
+    brand_key = models.CharField(max_length=100)  # Lowercased brand, for filtering
+    
+    # Eco attributes
+    is_eco_friendly = models.BooleanField(default=False)
+    is_organic = models.BooleanField(default=False)
+    is_biodegradable = models.BooleanField(default=False)
+    is_recyclable = models.BooleanField(default=False)
+    is_plastic_free = models.BooleanField(default=False)
+    ecoscore_value = models.FloatField(default=0.0)
+    ecoscore_grade = models.CharField(max_length=1, blank=True)
+    
+    # Reviews
+    avg_rating = models.FloatField(default=0.0)
+    rating_count = models.PositiveIntegerField(default=0)
+    
+    stock_quantity = models.PositiveIntegerField(default=0)
+    primary_image = models.CharField(max_length=500, blank=True)  # Image URL
+    is_active = models.BooleanField(default=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField()  # Creation time of the source product
+    synced_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = 'Catalog entries'
+        ordering = ['-created_at', '-id']
+        unique_together = ['source', 'source_id']
+        # Back the named sorts of the catalog listing (see catalog.pagination);
+        # the facet index covers the grouped count without touching rows
+        indexes = [
+            models.Index(fields=['is_active', 'created_at', 'id'], name='catalog_active_created_idx'),
+            models.Index(fields=['is_active', 'price', 'id'], name='catalog_active_price_idx'),
+            models.Index(fields=['is_active', 'ecoscore_value', 'id'], name='catalog_active_ecoscore_idx'),
+            models.Index(fields=['is_active', 'avg_rating', 'id'], name='catalog_active_rating_idx'),
+            models.Index(fields=['is_active', 'name', 'id'], name='catalog_active_name_idx'),
+            models.Index(fields=['is_active', 'category_key', 'price', 'id'], name='catalog_category_price_idx'),
+            models.Index(
+                fields=['is_active', 'source', 'category_key', 'brand_key', 'is_eco_friendly', 'ecoscore_grade'],
+                name='catalog_facets_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.source} #{self.source_id})"
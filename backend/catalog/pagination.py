@@ -0,0 +1,20 @@
+"""
+Pagination for the catalog listing
+"""
+from ecoswitch_backend.pagination import KeysetPagination
+
+
+class CatalogPagination(KeysetPagination):
+    """
+    Named sorts over CatalogEntry, each backed by an (is_active, field, id) index
+    """
+    sorts = {
+        'newest': ('-created_at', '-id'),
+        'price_asc': ('price', 'id'),
+        'price_desc': ('-price', '-id'),
+        'ecoscore': ('-ecoscore_value', '-id'),
+        'rating': ('-avg_rating', '-id'),
+        'name': ('name', 'id'),
+    }
+    default_sort = 'newest'
+    max_page_size = 50
@@ -0,0 +1,14 @@
+"""
+Serializers for the catalog read model
+"""
+from rest_framework import serializers
+from .models import CatalogEntry
+
+
+class CatalogEntrySerializer(serializers.ModelSerializer):
+    """
+    Serializer for catalog entries
+    """
+    class Meta:
+        model = CatalogEntry
+        exclude = ('category_key', 'subcategory_key', 'brand_key', 'synced_at')
@@ -0,0 +1,98 @@
+"""
+Signal handlers keeping catalog entries in sync with their source products
+
+The catalog app is installed after products and ecommerce, so these run
+after their own handlers (e.g. the rating summary update) and re-read the
+product from the database.
+"""
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from customers.browse import invalidate_facets
+from ecommerce import models as ecommerce_models
+from merchants.models import MerchantProduct
+from products import models as product_models
+
+from .alternatives import alternatives
+from .sync import catalog_changed, remove_products, sync_matching, sync_products
+from .typeahead import typeahead
+
+
+PRODUCT_SOURCES = {
+    product_models.Product: 'product',
+    ecommerce_models.Product: 'ecommerce',
+    MerchantProduct: 'merchant',
+}
+
+# Child rows whose changes show up in their product's catalog entry
+PRODUCT_CHILDREN = {
+    product_models.ProductReview: 'product',
+    ecommerce_models.ProductReview: 'ecommerce',
+    ecommerce_models.ProductImage: 'ecommerce',
+}
+
+# Lookups denormalized into every product of the same source
+PRODUCT_LOOKUPS = {
+    product_models.Category: ('product', 'category'),
+    product_models.Subcategory: ('product', 'subcategory'),
+    product_models.Brand: ('product', 'brand'),
+    ecommerce_models.Category: ('ecommerce', 'category'),
+    ecommerce_models.Brand: ('ecommerce', 'brand'),
+}
+
+
+def sync_product(sender, instance, raw=False, **kwargs):
+    """Project a saved product into the catalog"""
+    if not raw:
+        sync_products(PRODUCT_SOURCES[sender], [instance.pk])
+
+
+def remove_product(sender, instance, **kwargs):
+    """Drop a deleted product from the catalog"""
+    remove_products(PRODUCT_SOURCES[sender], [instance.pk])
+
+
+def sync_parent_product(sender, instance, raw=False, **kwargs):
+    """Reviews and images change their product's rating and picture"""
+    if not raw:
+        sync_products(PRODUCT_CHILDREN[sender], [instance.product_id])
+
+
+def sync_lookup_products(sender, instance, created=False, raw=False, **kwargs):
+    """Category and brand names are copied into each entry, so refresh them on rename"""
+    if raw or created:
+        return
+    source_name, field = PRODUCT_LOOKUPS[sender]
+    sync_matching(source_name, Q(**{field: instance}))
+
+
+for model in PRODUCT_SOURCES:
+    post_save.connect(sync_product, sender=model, dispatch_uid=f'catalog_sync_{model._meta.label}')
+    post_delete.connect(remove_product, sender=model, dispatch_uid=f'catalog_remove_{model._meta.label}')
+
+for model in PRODUCT_CHILDREN:
+    post_save.connect(sync_parent_product, sender=model, dispatch_uid=f'catalog_child_save_{model._meta.label}')
+    post_delete.connect(sync_parent_product, sender=model, dispatch_uid=f'catalog_child_delete_{model._meta.label}')
+
+for model in PRODUCT_LOOKUPS:
+    post_save.connect(sync_lookup_products, sender=model, dispatch_uid=f'catalog_lookup_{model._meta.label}')
+
+
+@receiver(catalog_changed)
+def update_typeahead(sender, source, source_ids, **kwargs):
+    """Fold changed entries into the typeahead index"""
+    typeahead.apply_changes(source, source_ids)
+
+
+@receiver(catalog_changed)
+def update_alternatives(sender, source, source_ids, **kwargs):
+    """Re-rank changed entries, e.g. after a new EcoScore, in the alternatives index"""
+    alternatives.apply_changes(source, source_ids)
+
+
+@receiver(catalog_changed)
+def update_merchant_facets(sender, source, source_ids, **kwargs):
+    """Shop facets are counted over merchant entries, so recount them once those are written"""
+    if source == 'merchant':
+        invalidate_facets()
@@ -0,0 +1,250 @@
+"""
+Projection of product models into CatalogEntry rows
+
+Each source knows how to load its products with everything the catalog row
+needs in a fixed number of queries and how to flatten one product into row
+values. Rows are upserted in batches, so a single save, a brand rename and a
+full rebuild all go through ``sync_products``.
+"""
+import logging
+import re
+from typing import Dict, Iterable, List
+
+from django.db.models import Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import CatalogEntry
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_SIZE = 500
+
+WHITESPACE = re.compile(r'\s+')
+
+# Sent after entries are written or removed, with ``source`` and
+# ``source_ids`` (None when the whole source was rebuilt)
+catalog_changed = Signal()
+
+ENTRY_FIELDS = [
+    'name', 'price', 'category', 'category_key', 'subcategory', 'subcategory_key', 'brand', 'brand_key',
+    'is_eco_friendly', 'is_organic', 'is_biodegradable', 'is_recyclable', 'is_plastic_free',
+    'ecoscore_value', 'ecoscore_grade', 'avg_rating', 'rating_count',
+    'stock_quantity', 'primary_image', 'is_active', 'created_at',
+]
+
+
+def normalize_key(value) -> str:
+    """Lowercase a category or brand and collapse whitespace"""
+    return WHITESPACE.sub(' ', str(value or '')).strip().lower()[:100]
+
+
+def image_url(field_file) -> str:
+    return field_file.url if field_file else ''
+
+
+class CatalogSource:
+    """
+    Interface for a product model feeding the catalog
+    """
+    name = None
+
+    def get_model(self):
+        raise NotImplementedError
+
+    def get_queryset(self):
+        """Source products with the relations ``to_entry`` reads"""
+        return self.get_model().objects.all()
+
+    def to_entry(self, product) -> Dict:
+        """Catalog row values for one product"""
+        raise NotImplementedError
+
+
+class ProductSource(CatalogSource):
+    name = 'product'
+
+    def get_model(self):
+        from products.models import Product
+        return Product
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('category', 'subcategory', 'brand')
+
+    def to_entry(self, product) -> Dict:
+        return {
+            'name': product.name,
+            'price': product.price,
+            'category': product.category.name,
+            'subcategory': product.subcategory.name if product.subcategory_id else '',
+            'brand': product.brand.name,
+            'is_eco_friendly': product.is_eco_friendly,
+            'ecoscore_value': product.ecoscore_value,
+            'ecoscore_grade': product.ecoscore_grade,
+            'avg_rating': product.avg_rating,
+            'rating_count': product.rating_count,
+            'stock_quantity': product.stock_quantity,
+            'primary_image': image_url(product.primary_image),
+            'is_active': product.is_active,
+            'created_at': product.created_at,
+        }
+
+
+class EcommerceSource(CatalogSource):
+    name = 'ecommerce'
+
+    def get_model(self):
+        from ecommerce.models import Product
+        return Product
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('category', 'brand').with_primary_image()
+
+    def to_entry(self, product) -> Dict:
+        from ecommerce.models import ProductImage
+
+        image = ''
+        if product.primary_image_name:
+            image = ProductImage._meta.get_field('image').storage.url(product.primary_image_name)
+        return {
+            'name': product.name,
+            'price': product.price,
+            'category': product.category.name,
+            'brand': product.brand.name,
+            # Shop products have no single eco flag; any eco attribute counts
+            'is_eco_friendly': any([
+                product.is_organic, product.is_biodegradable,
+                product.is_recyclable, product.is_plastic_free,
+            ]),
+            'is_organic': product.is_organic,
+            'is_biodegradable': product.is_biodegradable,
+            'is_recyclable': product.is_recyclable,
+            'is_plastic_free': product.is_plastic_free,
+            'avg_rating': product.avg_rating,
+            'rating_count': product.rating_count,
+            'stock_quantity': product.stock_quantity,
+            'primary_image': image,
+            'is_active': product.is_active,
+            'created_at': product.created_at,
+        }
+
+
+class MerchantSource(CatalogSource):
+    name = 'merchant'
+
+    def get_model(self):
+        from merchants.models import MerchantProduct
+        return MerchantProduct
+
+    def to_entry(self, product) -> Dict:
+        return {
+            'name': product.name,
+            'price': product.price,
+            'category': product.category,
+            'subcategory': product.subcategory,
+            'brand': product.brand,
+            'is_eco_friendly': product.is_eco_friendly,
+            'ecoscore_value': product.ecoscore_value,
+            'ecoscore_grade': product.ecoscore_grade,
+            'stock_quantity': product.stock_quantity,
+            'primary_image': image_url(product.primary_image),
+            'is_active': product.is_active,
+            'created_at': product.created_at,
+        }
+
+
+SOURCES = {source.name: source for source in (ProductSource(), EcommerceSource(), MerchantSource())}
+
+
+def build_entry(source: CatalogSource, product) -> CatalogEntry:
+    values = {field: CatalogEntry._meta.get_field(field).get_default() for field in ENTRY_FIELDS}
+    values.update(source.to_entry(product))
+    values['category'] = values['category'][:100]
+    values['subcategory'] = values['subcategory'][:100]
+    values['brand'] = values['brand'][:100]
+    values['category_key'] = normalize_key(values['category'])
+    values['subcategory_key'] = normalize_key(values['subcategory'])
+    values['brand_key'] = normalize_key(values['brand'])
+    return CatalogEntry(source=source.name, source_id=product.pk, **values)
+
+
+def upsert_entries(entries: List[CatalogEntry]):
+    if entries:
+        CatalogEntry.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['source', 'source_id'],
+            update_fields=ENTRY_FIELDS + ['synced_at'],
+        )
+
+
+def sync_products(source_name: str, product_ids: Iterable[int]) -> int:
+    """
+    Refresh the catalog rows of the given products, dropping rows of
+    products that no longer exist
+
+    Returns:
+        Number of rows written
+    """
+    source = SOURCES[source_name]
+    product_ids = list(product_ids)
+    written = 0
+    for start in range(0, len(product_ids), BATCH_SIZE):
+        ids = product_ids[start:start + BATCH_SIZE]
+        products = list(source.get_queryset().filter(pk__in=ids))
+        upsert_entries([build_entry(source, product) for product in products])
+        written += len(products)
+
+        missing = set(ids) - {product.pk for product in products}
+        if missing:
+            CatalogEntry.objects.filter(source=source_name, source_id__in=missing).delete()
+    if product_ids:
+        catalog_changed.send(sender=CatalogEntry, source=source_name, source_ids=product_ids)
+    return written
+
+
+def sync_matching(source_name: str, condition: Q) -> int:
+    """Refresh the catalog rows of every source product matching ``condition``"""
+    model = SOURCES[source_name].get_model()
+    return sync_products(source_name, model.objects.filter(condition).values_list('pk', flat=True))
+
+
+def remove_products(source_name: str, product_ids: Iterable[int]):
+    product_ids = list(product_ids)
+    CatalogEntry.objects.filter(source=source_name, source_id__in=product_ids).delete()
+    catalog_changed.send(sender=CatalogEntry, source=source_name, source_ids=product_ids)
+
+
+def rebuild_catalog(source_names: Iterable[str] = None, batch_size: int = BATCH_SIZE) -> Dict[str, Dict[str, int]]:
+    """
+    Re-project every product of the given sources (all by default)
+
+    Args:
+        source_names: Sources to rebuild
+        batch_size: Products loaded and upserted per batch
+
+    Returns:
+        Dictionary of {source: {'synced': n, 'removed': n}}
+    """
+    results = {}
+    for source_name in source_names or SOURCES:
+        source = SOURCES[source_name]
+        started = timezone.now()
+        synced = 0
+        last_id = 0
+        while True:
+            products = list(source.get_queryset().filter(pk__gt=last_id).order_by('pk')[:batch_size])
+            if not products:
+                break
+            upsert_entries([build_entry(source, product) for product in products])
+            synced += len(products)
+            last_id = products[-1].pk
+
+        # Every surviving row was just upserted; older ones belong to deleted products
+        stale = CatalogEntry.objects.filter(source=source_name, synced_at__lt=started)
+        removed, _ = stale.delete()
+        results[source_name] = {'synced': synced, 'removed': removed}
+        catalog_changed.send(sender=CatalogEntry, source=source_name, source_ids=None)
+        logger.info(f"Catalog rebuild {source_name}: {synced} synced, {removed} removed")
+    return results
@@ -0,0 +1,275 @@
+"""
+Tests for the catalog read model
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ecommerce import models as shop
+from ecoswitch_backend.versions import version_cache
+from merchants.models import MerchantProduct, MerchantProfile
+from products import models as products
+
+from .alternatives import AlternativesIndex, Candidate, alternatives
+from .models import CatalogEntry
+from .sync import rebuild_catalog
+from .typeahead import PrefixIndex, Suggestion, typeahead
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'catalog-tests'},
+    'versions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'catalog-tests-versions'},
+}
+
+
+def create_merchant(username='merchant'):
+    user = get_user_model().objects.create_user(username=username, email=f'{username}@example.com')
+    return MerchantProfile.objects.create(
+        user=user, business_name='Green Goods', business_type='retail', business_description='Shop',
+        contact_person='Owner', phone_number='+919876543210', email=f'{username}@example.com',
+        address='Street', city='Pune', state='Maharashtra', postal_code='411001',
+    )
+
+
+def create_product(name, category, brand, **values):
+    slug = name.lower().replace(' ', '-')
+    values = {'description': 'Item', 'price': 100, **values}
+    return products.Product.objects.create(
+        name=name, slug=slug, sku=f'P-{slug}', category=category, brand=brand, **values,
+    )
+
+
+def create_shop_product(name, category, brand, **values):
+    slug = name.lower().replace(' ', '-')
+    values = {'description': 'Item', 'price': 100, **values}
+    return shop.Product.objects.create(name=name, slug=slug, sku=f'S-{slug}', category=category, brand=brand, **values)
+
+
+def create_merchant_product(merchant, name, **values):
+    values = {'description': 'Item', 'category': 'Home', 'brand': 'Leaf', 'price': 100, **values}
+    return MerchantProduct.objects.create(merchant=merchant, name=name, sku=f'M-{name.upper()}', **values)
+
+
+class CatalogTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = products.Category.objects.create(name='Home', slug='home')
+        cls.brand = products.Brand.objects.create(name='Leaf', slug='leaf')
+        cls.shop_category = shop.Category.objects.create(name='Kitchen', slug='kitchen')
+        cls.shop_brand = shop.Brand.objects.create(name='Ferro', slug='ferro')
+        cls.merchant = create_merchant()
+
+    def setUp(self):
+        cache.clear()
+        version_cache.clear()
+
+    def entry(self, source, product):
+        return CatalogEntry.objects.get(source=source, source_id=product.pk)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CatalogSyncTests(CatalogTestCase):
+    def test_saved_products_of_every_source_are_projected(self):
+        product = create_product('Dish Brush', self.category, self.brand, price=120)
+        shop_product = create_shop_product('Steel Bottle', self.shop_category, self.shop_brand, is_organic=True)
+        merchant_product = create_merchant_product(self.merchant, 'Jute Bag', category=' Bags  & Totes')
+
+        entry = self.entry('product', product)
+        self.assertEqual((entry.name, entry.price, entry.brand_key), ('Dish Brush', 120, 'leaf'))
+        self.assertTrue(self.entry('ecommerce', shop_product).is_eco_friendly)
+        self.assertEqual(self.entry('merchant', merchant_product).category_key, 'bags & totes')
+
+    def test_changes_and_deletes_follow_the_source(self):
+        product = create_merchant_product(self.merchant, 'Jute Bag')
+        product.price = 250
+        product.is_active = False
+        product.save()
+        entry = self.entry('merchant', product)
+        self.assertEqual((entry.price, entry.is_active), (250, False))
+
+        product.delete()
+        self.assertFalse(CatalogEntry.objects.exists())
+
+    def test_lookup_renames_and_reviews_reach_their_products(self):
+        product = create_shop_product('Steel Bottle', self.shop_category, self.shop_brand)
+        self.shop_brand.name = 'Ferro Living'
+        self.shop_brand.save()
+        self.assertEqual(self.entry('ecommerce', product).brand_key, 'ferro living')
+
+        user = get_user_model().objects.create_user(username='reviewer', email='reviewer@example.com')
+        shop.ProductReview.objects.create(product=product, user=user, rating=4, title='Good', comment='Text')
+        entry = self.entry('ecommerce', product)
+        self.assertEqual((entry.avg_rating, entry.rating_count), (4.0, 1))
+
+    def test_rebuild_repairs_drift_and_drops_orphans(self):
+        product = create_product('Dish Brush', self.category, self.brand)
+        CatalogEntry.objects.update(name='Drifted')
+        orphan = CatalogEntry.objects.create(
+            source='product', source_id=product.pk + 100, name='Gone', price=1, category='Home',
+            category_key='home', brand='Leaf', brand_key='leaf', created_at=timezone.now(),
+        )
+
+        result = rebuild_catalog(['product'])
+        self.assertEqual(result, {'product': {'synced': 1, 'removed': 1}})
+        self.assertEqual(self.entry('product', product).name, 'Dish Brush')
+        self.assertFalse(CatalogEntry.objects.filter(pk=orphan.pk).exists())
+
+    def test_listing_filters_across_sources(self):
+        create_product('Dish Brush', self.category, self.brand, price=120)
+        create_shop_product('Steel Bottle', self.shop_category, self.shop_brand, price=600)
+        create_merchant_product(self.merchant, 'Jute Bag', price=300)
+
+        def names(**params):
+            response = self.client.get('/api/catalog/entries/', {'sort': 'price_asc', **params})
+            self.assertEqual(response.status_code, 200)
+            return [entry['name'] for entry in response.json()['results']]
+
+        self.assertEqual(names(), ['Dish Brush', 'Jute Bag', 'Steel Bottle'])
+        self.assertEqual(names(category='HOME'), ['Dish Brush', 'Jute Bag'])
+        self.assertEqual(names(source='ecommerce'), ['Steel Bottle'])
+        self.assertEqual(names(min_price='200', max_price='500'), ['Jute Bag'])
+        self.assertEqual(self.client.get('/api/catalog/entries/', {'source': 'other'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/catalog/entries/', {'min_price': 'cheap'}).status_code, 400)
+
+
+class PrefixIndexTests(TestCase):
+    def suggestion(self, text, score, kind='product'):
+        return Suggestion(id=f'{kind}:{text}', text=text, kind=kind, score=score)
+
+    def texts(self, index, prefix, limit=10):
+        return [suggestion.text for suggestion in index.complete(prefix, limit)]
+
+    def test_prefixes_match_names_and_later_words_best_first(self):
+        index = PrefixIndex()
+        index.bulk_load([
+            self.suggestion('Steel Bottle', 1.0),
+            self.suggestion('Bamboo Brush', 2.0),
+            self.suggestion('Bottle Brush', 0.5),
+        ])
+        self.assertEqual(self.texts(index, 'b'), ['Bamboo Brush', 'Steel Bottle', 'Bottle Brush'])
+        self.assertEqual(self.texts(index, 'BOTT'), ['Steel Bottle', 'Bottle Brush'])
+        self.assertEqual(self.texts(index, 'steel b'), ['Steel Bottle'])
+        self.assertEqual(self.texts(index, 'x'), [])
+
+    def test_removed_suggestions_are_refilled_from_below(self):
+        index = PrefixIndex(top_k=2)
+        for text, score in (('Jar', 3.0), ('Jug', 2.0), ('Jute Bag', 1.0)):
+            index.add(self.suggestion(text, score))
+        self.assertEqual(self.texts(index, 'j'), ['Jar', 'Jug'])
+
+        index.remove('product:Jar')
+        self.assertEqual(self.texts(index, 'j'), ['Jug', 'Jute Bag'])
+
+        index.add(self.suggestion('Jug', 0.5))
+        self.assertEqual(self.texts(index, 'j'), ['Jute Bag', 'Jug'])
+
+    def test_same_text_from_several_sources_is_shown_once(self):
+        index = PrefixIndex()
+        index.add(Suggestion(id='product:product:1', text='Jute Bag', kind='product', score=1.0))
+        index.add(Suggestion(id='product:merchant:1', text='jute bag', kind='product', score=0.5))
+        index.add(self.suggestion('Jute', 0.1, kind='tag'))
+        self.assertEqual(self.texts(index, 'jute'), ['Jute Bag', 'Jute'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TypeaheadTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        typeahead._index = None
+
+    def complete(self, query):
+        response = self.client.get('/api/catalog/typeahead/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [(suggestion['kind'], suggestion['text']) for suggestion in response.json()['suggestions']]
+
+    def test_products_brands_and_tags_are_suggested(self):
+        create_merchant_product(self.merchant, 'Jute Bag', brand='Jutex', tags=['jute'])
+        self.assertEqual(
+            sorted(self.complete('jut')), [('brand', 'Jutex'), ('product', 'Jute Bag'), ('tag', 'jute')],
+        )
+        self.assertEqual(self.complete('  '), [])
+        self.assertEqual(self.client.get('/api/catalog/typeahead/', {'q': 'j', 'limit': 'x'}).status_code, 400)
+
+    def test_committed_changes_update_the_built_index(self):
+        bag = create_merchant_product(self.merchant, 'Jute Bag')
+        self.assertEqual(self.complete('jute'), [('product', 'Jute Bag')])
+        index = typeahead._index
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_merchant_product(self.merchant, 'Jute Rope', ecoscore_value=90)
+        with self.captureOnCommitCallbacks(execute=True):
+            bag.delete()
+        self.assertEqual(self.complete('jute'), [('product', 'Jute Rope')])
+        self.assertIs(typeahead._index, index)
+
+
+class AlternativesIndexTests(TestCase):
+    def setUp(self):
+        self.index = AlternativesIndex()
+        self.next_id = 1
+
+    def add(self, grade_rank, price, subcategory='', ecoscore=50.0):
+        entry_id = self.next_id
+        self.next_id += 1
+        self.index.add(Candidate(
+            entry_id=entry_id, source='merchant', source_id=entry_id, category_key='kitchen',
+            subcategory_key=subcategory, price=price, ecoscore_value=ecoscore, grade_rank=grade_rank,
+        ))
+        return entry_id
+
+    def test_greener_entries_within_the_band_greenest_first(self):
+        product = self.add(2, 100)
+        b_grade = self.add(1, 110)
+        a_grade = self.add(0, 90, ecoscore=80)
+        a_grade_lower = self.add(0, 95, ecoscore=70)
+        self.add(2, 100)  # Same grade
+        self.add(3, 100)  # Worse grade
+        self.add(0, 200)  # Outside the price band
+
+        self.assertEqual(self.index.greener(product), [a_grade, a_grade_lower, b_grade])
+        self.assertEqual(self.index.greener(product, limit=1), [a_grade])
+        self.assertEqual(self.index.greener(a_grade), [])
+        self.assertIsNone(self.index.greener(999))
+
+    def test_own_subcategory_comes_before_the_category(self):
+        product = self.add(2, 100, subcategory='bottles')
+        in_category = self.add(0, 100, ecoscore=90)
+        in_subcategory = self.add(1, 100, subcategory='bottles')
+        self.assertEqual(self.index.greener(product), [in_subcategory, in_category])
+
+    def test_removed_entries_are_no_longer_offered(self):
+        product = self.add(2, 100)
+        greener = self.add(0, 100)
+        self.index.remove(greener)
+        self.assertEqual(self.index.greener(product), [])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class GreenerAlternativesTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        alternatives._index = None
+
+    def alternative_names(self, product, **params):
+        entry = self.entry('merchant', product)
+        response = self.client.get(f'/api/catalog/entries/{entry.pk}/alternatives/', params)
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.json()['alternatives']]
+
+    def test_alternatives_follow_new_ecoscores(self):
+        product = create_merchant_product(self.merchant, 'Plastic Box', ecoscore_grade='D', price=300)
+        glass = create_merchant_product(self.merchant, 'Glass Box', ecoscore_grade='B', price=320)
+        create_merchant_product(self.merchant, 'Steel Box', ecoscore_grade='A', price=550)
+        self.assertEqual(self.alternative_names(product), ['Glass Box'])
+        self.assertEqual(self.alternative_names(product, price_band=100), ['Steel Box', 'Glass Box'])
+
+        index = alternatives._index
+        with self.captureOnCommitCallbacks(execute=True):
+            glass.ecoscore_grade = 'E'
+            glass.save()
+        self.assertEqual(self.alternative_names(product), [])
+        self.assertIs(alternatives._index, index)
+
+    def test_bad_parameters_and_unknown_entries(self):
+        self.assertEqual(self.client.get('/api/catalog/entries/1/alternatives/', {'limit': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/catalog/entries/999/alternatives/').status_code, 404)
@@ -0,0 +1,290 @@
+"""
+Prefix-trie typeahead over product names, brands and tags
+
+Suggestions are held in an in-process trie whose nodes keep the ids of
+their best ``TOP_K`` suggestions, so completing a prefix is a walk of
+``len(prefix)`` nodes plus a read of one short list. Product names are
+also reachable from each word ("bottle" finds "Steel Bottle").
+
+The index is built from CatalogEntry and Tag on first use and kept
+current as described in catalog.indexes. Tags only change through product
+saves and are refreshed by the periodic rebuild (``REBUILD_INTERVAL``).
+"""
+import logging
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from django.db.models import Avg, Count, Max, Sum
+
+from .indexes import CatalogIndexHolder
+from .models import CatalogEntry
+from .sync import normalize_key
+
+logger = logging.getLogger(__name__)
+
+
+TOP_K = 20
+MAX_KEY_LENGTH = 60
+MAX_WORD_KEYS = 6
+REBUILD_INTERVAL = 600
+VERSION_KEY = 'catalog:typeahead:version'
+
+POPULARITY_WEIGHT = 1.0
+ECOSCORE_WEIGHT = 2.0
+
+
+@dataclass
+class Suggestion:
+    id: str
+    text: str
+    kind: str
+    score: float
+    source: Optional[str] = None
+    source_id: Optional[int] = None
+    brand_key: str = ''
+
+    def as_dict(self) -> Dict:
+        data = {'text': self.text, 'kind': self.kind}
+        if self.source:
+            data['source'] = self.source
+            data['source_id'] = self.source_id
+        return data
+
+
+def rank(popularity: float, ecoscore_value: float) -> float:
+    """Suggestion score from a popularity count and an EcoScore (0-100)"""
+    return round(POPULARITY_WEIGHT * math.log1p(max(popularity, 0)) + ECOSCORE_WEIGHT * ecoscore_value / 100, 6)
+
+
+def text_keys(text: str) -> List[str]:
+    """Trie keys for a suggestion: the whole text and each later word onwards"""
+    words = normalize_key(text).split(' ')
+    return [' '.join(words[start:])[:MAX_KEY_LENGTH] for start in range(min(len(words), MAX_WORD_KEYS)) if words[start]]
+
+
+class TrieNode:
+    __slots__ = ('children', 'ids', 'top', 'stale')
+
+    def __init__(self):
+        self.children = {}
+        self.ids = set()  # Suggestions whose key ends here
+        self.top = []  # Best TOP_K suggestion ids in this subtree, best first
+        self.stale = False
+
+
+class PrefixIndex:
+    """
+    Trie of suggestions with per-node top-K lists
+
+    Additions are pushed into the top list of every node on the key's path;
+    removals drop the id from those lists and mark the nodes stale, and a
+    stale node is rebuilt from its children's lists the next time it is read.
+    """
+
+    def __init__(self, top_k: int = TOP_K):
+        self.top_k = top_k
+        self.root = TrieNode()
+        self.suggestions: Dict[str, Suggestion] = {}
+
+    def _sort_key(self, suggestion_id):
+        suggestion = self.suggestions[suggestion_id]
+        return -suggestion.score, suggestion.text
+
+    def add(self, suggestion: Suggestion):
+        if suggestion.id in self.suggestions:
+            self.remove(suggestion.id)
+        self.suggestions[suggestion.id] = suggestion
+        for key in text_keys(suggestion.text):
+            node = self.root
+            self._offer(node, suggestion.id)
+            for char in key:
+                node = node.children.setdefault(char, TrieNode())
+                self._offer(node, suggestion.id)
+            node.ids.add(suggestion.id)
+
+    def bulk_load(self, suggestions: Iterable[Suggestion]):
+        """Insert many suggestions, computing the top lists once at the end"""
+        for suggestion in suggestions:
+            self.suggestions[suggestion.id] = suggestion
+            for key in text_keys(suggestion.text):
+                node = self.root
+                node.stale = True
+                for char in key:
+                    node = node.children.setdefault(char, TrieNode())
+                    node.stale = True
+                node.ids.add(suggestion.id)
+        self._refresh(self.root)
+
+    def _offer(self, node: TrieNode, suggestion_id: str):
+        if suggestion_id in node.top:
+            return
+        if len(node.top) >= self.top_k and self._sort_key(suggestion_id) >= self._sort_key(node.top[-1]):
+            return
+        node.top.append(suggestion_id)
+        node.top.sort(key=self._sort_key)
+        del node.top[self.top_k:]
+
+    def remove(self, suggestion_id: str):
+        suggestion = self.suggestions.get(suggestion_id)
+        if suggestion is None:
+            return
+        for key in text_keys(suggestion.text):
+            path = [self.root]
+            node = self.root
+            for char in key:
+                node = node.children.get(char)
+                if node is None:
+                    break
+                path.append(node)
+            else:
+                node.ids.discard(suggestion_id)
+            for path_node in path:
+                if suggestion_id in path_node.top:
+                    path_node.top.remove(suggestion_id)
+                    path_node.stale = True
+        del self.suggestions[suggestion_id]
+
+    def _refresh(self, node: TrieNode):
+        candidates = set(node.ids)
+        for child in node.children.values():
+            if child.stale:
+                self._refresh(child)
+            candidates.update(child.top)
+        node.top = sorted(candidates, key=self._sort_key)[:self.top_k]
+        node.stale = False
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Suggestion]:
+        node = self.root
+        for char in normalize_key(prefix)[:MAX_KEY_LENGTH]:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        if node.stale:
+            self._refresh(node)
+
+        # The same product name can come from several sources; show it once
+        results = []
+        seen = set()
+        for suggestion_id in node.top:
+            suggestion = self.suggestions[suggestion_id]
+            text_key = (suggestion.kind, suggestion.text.lower())
+            if text_key in seen:
+                continue
+            seen.add(text_key)
+            results.append(suggestion)
+            if len(results) >= limit:
+                break
+        return results
+
+
+def product_suggestion(entry: Dict) -> Suggestion:
+    popularity = entry['rating_count'] * entry['avg_rating'] / 5
+    return Suggestion(
+        id=f"product:{entry['source']}:{entry['source_id']}",
+        text=entry['name'],
+        kind='product',
+        score=rank(popularity, entry['ecoscore_value']),
+        source=entry['source'],
+        source_id=entry['source_id'],
+        brand_key=entry['brand_key'],
+    )
+
+
+PRODUCT_FIELDS = ('source', 'source_id', 'name', 'brand_key', 'avg_rating', 'rating_count', 'ecoscore_value')
+
+
+def brand_suggestions(brand_keys: Optional[Iterable[str]] = None) -> Dict[str, Optional[Suggestion]]:
+    """Brand suggestions aggregated over active entries, None for brands left without any"""
+    entries = CatalogEntry.objects.filter(is_active=True).exclude(brand_key='')
+    if brand_keys is not None:
+        brand_keys = set(brand_keys)
+        entries = entries.filter(brand_key__in=brand_keys)
+    rows = (
+        entries.order_by()
+        .values('brand_key')
+        .annotate(
+            name=Max('brand'), products=Count('id'),
+            ratings=Sum('rating_count'), ecoscore=Avg('ecoscore_value'),
+        )
+    )
+
+    suggestions = dict.fromkeys(brand_keys or [])
+    for row in rows:
+        suggestions[row['brand_key']] = Suggestion(
+            id=f"brand:{row['brand_key']}",
+            text=row['name'],
+            kind='brand',
+            score=rank(row['products'] + (row['ratings'] or 0), row['ecoscore'] or 0),
+        )
+    return suggestions
+
+
+def tag_suggestions() -> List[Suggestion]:
+    from products.models import Tag
+
+    tags = Tag.objects.annotate(
+        product_uses=Count('products', distinct=True),
+        merchant_uses=Count('merchant_products', distinct=True),
+    ).values_list('name', 'product_uses', 'merchant_uses')
+    return [
+        Suggestion(id=f'tag:{name}', text=name, kind='tag', score=rank(product_uses + merchant_uses, 0))
+        for name, product_uses, merchant_uses in tags
+        if product_uses or merchant_uses
+    ]
+
+
+def build_index() -> PrefixIndex:
+    entries = CatalogEntry.objects.filter(is_active=True).values(*PRODUCT_FIELDS)
+    suggestions = [product_suggestion(entry) for entry in entries.iterator(chunk_size=2000)]
+    suggestions.extend(brand_suggestions().values())
+    suggestions.extend(tag_suggestions())
+
+    index = PrefixIndex()
+    index.bulk_load(suggestions)
+    return index
+
+
+class Typeahead(CatalogIndexHolder):
+    """
+    Process-wide holder of the prefix index
+    """
+    name = 'Typeahead'
+    version_key = VERSION_KEY
+    rebuild_interval = REBUILD_INTERVAL
+
+    def build(self) -> PrefixIndex:
+        return build_index()
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Suggestion]:
+        index = self.get_index()
+        with self._lock:
+            return index.complete(prefix, limit)
+
+    def update(self, index: PrefixIndex, source: str, source_ids: List[int]):
+        entries = {
+            entry['source_id']: entry
+            for entry in CatalogEntry.objects.filter(
+                source=source, source_id__in=source_ids, is_active=True
+            ).values(*PRODUCT_FIELDS)
+        }
+        # Brands of the products before and after the change
+        brand_keys = {entry['brand_key'] for entry in entries.values()}
+        for source_id in source_ids:
+            suggestion_id = f'product:{source}:{source_id}'
+            previous = index.suggestions.get(suggestion_id)
+            if previous is not None:
+                brand_keys.add(previous.brand_key)
+            if source_id in entries:
+                index.add(product_suggestion(entries[source_id]))
+            else:
+                index.remove(suggestion_id)
+
+        for brand_key, suggestion in brand_suggestions(brand_keys - {''}).items():
+            if suggestion is None:
+                index.remove(f'brand:{brand_key}')
+            else:
+                index.add(suggestion)
+
+
+typeahead = Typeahead()
@@ -0,0 +1,14 @@
+"""
+URLs for the catalog app
+"""
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from . import views
+
+router = DefaultRouter()
+router.register(r'entries', views.CatalogEntryViewSet, basename='catalog-entry')
+
+urlpatterns = [
+    path('', include(router.urls)),
+    path('typeahead/', views.typeahead, name='catalog_typeahead'),
+]
@@ -0,0 +1,190 @@
+"""
+Read-only views over the unified product catalog
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .alternatives import alternatives as alternatives_index
+from .models import CatalogEntry
+from .pagination import CatalogPagination
+from .serializers import CatalogEntrySerializer
+from .sync import SOURCES, normalize_key
+from .typeahead import typeahead as typeahead_index
+
+
+TYPEAHEAD_DEFAULT_LIMIT = 8
+TYPEAHEAD_MAX_LIMIT = 20
+
+ALTERNATIVES_DEFAULT_LIMIT = 5
+ALTERNATIVES_MAX_LIMIT = 20
+ALTERNATIVES_DEFAULT_PRICE_BAND = 30  # Percent either side of the product's price
+
+
+def _parse_number(params, name):
+    """Decimal value of a numeric filter, None when absent; 400 on anything else"""
+    value = params.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        number = None
+    if number is None or not number.is_finite():
+        raise ValidationError({name: 'Must be a number.'})
+    return number
+
+
+class CatalogEntryViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Products of every source in one listing
+    
+    Filters: ``source`` (repeatable), ``category``, ``brand``, ``min_price``,
+    ``max_price``, ``eco_friendly``, ``grade``, ``min_rating``, ``in_stock``
+    and ``search`` (name). Results are cursor paginated over named sorts.
+    """
+    serializer_class = CatalogEntrySerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = CatalogPagination
+    
+    def get_queryset(self):
+        queryset = CatalogEntry.objects.filter(is_active=True)
+        params = self.request.query_params
+        
+        sources = params.getlist('source')
+        if sources:
+            unknown = set(sources) - set(SOURCES)
+            if unknown:
+                raise ValidationError({'source': f"Unknown source. Choose from: {', '.join(SOURCES)}"})
+            queryset = queryset.filter(source__in=sources)
+        
+        category = params.get('category')
+        if category:
+            queryset = queryset.filter(category_key=normalize_key(category))
+        
+        brand = params.get('brand')
+        if brand:
+            queryset = queryset.filter(brand_key=normalize_key(brand))
+        
+        min_price = _parse_number(params, 'min_price')
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+        
+        max_price = _parse_number(params, 'max_price')
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=max_price)
+        
+        if params.get('eco_friendly') == 'true':
+            queryset = queryset.filter(is_eco_friendly=True)
+        
+        grade = params.get('grade')
+        if grade:
+            queryset = queryset.filter(ecoscore_grade=grade.upper())
+        
+        min_rating = _parse_number(params, 'min_rating')
+        if min_rating is not None:
+            queryset = queryset.filter(avg_rating__gte=min_rating)
+        
+        if params.get('in_stock') == 'true':
+            queryset = queryset.filter(stock_quantity__gt=0)
+        
+        search = params.get('search', '').strip()
+        if search:
+            queryset = queryset.filter(name__icontains=search)
+        
+        return queryset
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Source, category, brand, eco and EcoScore grade counts for the filters
+        
+        One grouped query answered from the facet index.
+        """
+        rows = (
+            self.get_queryset()
+            .order_by()
+            .values('source', 'category_key', 'brand_key', 'is_eco_friendly', 'ecoscore_grade')
+            .annotate(count=Count('id'))
+        )
+        
+        facets = {'total': 0, 'sources': {}, 'categories': {}, 'brands': {}, 'eco_friendly': {}, 'ecoscore_grades': {}}
+        for row in rows:
+            count = row['count']
+            facets['total'] += count
+            for facet, value in (
+                ('sources', row['source']),
+                ('categories', row['category_key']),
+                ('brands', row['brand_key']),
+                ('eco_friendly', 'true' if row['is_eco_friendly'] else 'false'),
+                ('ecoscore_grades', row['ecoscore_grade'] or 'unrated'),
+            ):
+                facets[facet][value] = facets[facet].get(value, 0) + count
+        
+        for facet in ('sources', 'categories', 'brands'):
+            facets[facet] = [
+                {'value': value, 'count': count}
+                for value, count in sorted(facets[facet].items(), key=lambda item: (-item[1], item[0]))
+            ]
+        return Response(facets)
+    
+    @action(detail=True, methods=['get'])
+    def alternatives(self, request, pk=None):
+        """
+        Products with a better EcoScore grade in the same (sub)category
+        
+        ``price_band`` is the allowed price difference in percent (default
+        30), ``limit`` defaults to 5 (at most 20). Answered from the
+        in-memory alternatives index plus one query for the rows.
+        """
+        try:
+            entry_id = int(pk)
+            limit = int(request.query_params.get('limit', ALTERNATIVES_DEFAULT_LIMIT))
+            price_band = float(request.query_params.get('price_band', ALTERNATIVES_DEFAULT_PRICE_BAND))
+        except ValueError:
+            return Response(
+                {'error': 'id, limit and price_band must be numbers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, ALTERNATIVES_MAX_LIMIT))
+        price_band = max(0.0, min(price_band, 100.0)) / 100
+        
+        alternative_ids = alternatives_index.greener(entry_id, limit, price_band) or []
+        entries = CatalogEntry.objects.filter(is_active=True).in_bulk([entry_id] + alternative_ids)
+        if entry_id not in entries:
+            return Response({'error': 'Catalog entry not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'product': CatalogEntrySerializer(entries[entry_id]).data,
+            'alternatives': [
+                CatalogEntrySerializer(entries[alternative_id]).data
+                for alternative_id in alternative_ids if alternative_id in entries
+            ],
+        })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def typeahead(request):
+    """
+    Autocomplete product names, brands and tags for a search box prefix
+    
+    Suggestions are ranked by popularity and EcoScore; ``limit`` defaults to
+    8 (at most 20).
+    """
+    query = request.GET.get('q', '')
+    try:
+        limit = int(request.GET.get('limit', TYPEAHEAD_DEFAULT_LIMIT))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, TYPEAHEAD_MAX_LIMIT))
+    
+    if not query.strip():
+        return Response({'query': query, 'suggestions': []})
+    
+    suggestions = typeahead_index.complete(query, limit)
+    return Response({'query': query, 'suggestions': [suggestion.as_dict() for suggestion in suggestions]})
@@ -0,0 +1,279 @@
+"""
+Shop browsing filters, facet counts and cached totals over merchant products
+
+Facet counts only need the flat columns the catalog read model copies from
+each merchant product, so they are counted over ``catalog.CatalogEntry``
+unless the filters search descriptions or match tags, which only the
+merchant product rows have.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Tuple
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count, Q
+
+from catalog.models import CatalogEntry
+from ecoswitch_backend.tiered_cache import tiered_cache
+from ecoswitch_backend.versions import bump_version, get_version
+from merchants.models import MerchantProduct
+from products.tags import filter_by_tags, normalize_tags
+
+logger = logging.getLogger(__name__)
+
+
+FACET_CACHE_TIMEOUT = 300
+# Expired facets are still served for this long while one request recounts
+FACET_STALE_TIMEOUT = 300
+FACET_VERSION_KEY = 'customers:facets:version'
+
+# Browse totals: served from cache, recounted in the background once stale
+COUNT_CACHE_TIMEOUT = 3600
+COUNT_REFRESH_AFTER = 60
+COUNT_ESTIMATE_LIMIT = 1000
+
+ECOSCORE_GRADES = ['A', 'B', 'C', 'D', 'E']
+
+# Same ranges as CustomerProfile.budget_range
+PRICE_BUCKETS = [
+    ('0-500', Decimal('0'), Decimal('500')),
+    ('500-2000', Decimal('500'), Decimal('2000')),
+    ('2000-5000', Decimal('2000'), Decimal('5000')),
+    ('5000+', Decimal('5000'), None),
+]
+
+
+def _parse_price(value):
+    if value in (None, ''):
+        return None
+    try:
+        return str(Decimal(str(value).strip()).normalize())
+    except InvalidOperation:
+        return None
+
+
+def normalize_filters(params) -> Dict:
+    """
+    Canonical form of the browse filters in a QueryDict
+
+    Equivalent requests (case, whitespace, tag order, ``10`` vs ``10.00``)
+    map to the same dict, which is also used as the facet cache key.
+    """
+    return {
+        'search': ' '.join(params.get('search', '').split()).lower(),
+        'category': params.get('category', '').strip().lower(),
+        'min_price': _parse_price(params.get('min_price')),
+        'max_price': _parse_price(params.get('max_price')),
+        'eco_friendly': params.get('eco_friendly') == 'true',
+        'tags': sorted(normalize_tags(params.getlist('tag'))),
+    }
+
+
+def filtered_products(filters: Dict):
+    """Active merchant products matching normalized filters"""
+    queryset = MerchantProduct.objects.filter(is_active=True)
+
+    search = filters['search']
+    if search:
+        queryset = queryset.filter(
+            Q(name__icontains=search) |
+            Q(description__icontains=search) |
+            Q(brand__icontains=search) |
+            Q(category__icontains=search)
+        )
+
+    if filters['category']:
+        queryset = queryset.filter(category__iexact=filters['category'])
+
+    if filters['min_price'] is not None:
+        queryset = queryset.filter(price__gte=filters['min_price'])
+
+    if filters['max_price'] is not None:
+        queryset = queryset.filter(price__lte=filters['max_price'])
+
+    if filters['eco_friendly']:
+        queryset = queryset.filter(is_eco_friendly=True)
+
+    if filters['tags']:
+        queryset = filter_by_tags(queryset, filters['tags'])
+
+    return queryset
+
+
+def facet_queryset(filters: Dict):
+    """
+    Rows to count facets over for normalized filters
+
+    The merchant entries of the catalog read model when it holds every
+    filtered column, the merchant products themselves otherwise.
+    """
+    if filters['search'] or filters['tags']:
+        return filtered_products(filters)
+
+    queryset = CatalogEntry.objects.filter(source='merchant', is_active=True)
+
+    if filters['category']:
+        # Same rule as filtered_products, so facets and listing agree
+        queryset = queryset.filter(category__iexact=filters['category'])
+
+    if filters['min_price'] is not None:
+        queryset = queryset.filter(price__gte=filters['min_price'])
+
+    if filters['max_price'] is not None:
+        queryset = queryset.filter(price__lte=filters['max_price'])
+
+    if filters['eco_friendly']:
+        queryset = queryset.filter(is_eco_friendly=True)
+
+    return queryset
+
+
+def _price_filter(low, high) -> Q:
+    condition = Q(price__gte=low)
+    if high is not None:
+        condition &= Q(price__lt=high)
+    return condition
+
+
+def compute_facets(queryset) -> Dict:
+    """
+    Facet counts for a queryset in one grouped query
+
+    Rows are grouped by (category, brand) and every other facet is a
+    conditional COUNT in the same statement; category and brand totals
+    are rolled up from the groups.
+    """
+    annotations = {
+        'total': Count('id'),
+        'eco_friendly': Count('id', filter=Q(is_eco_friendly=True)),
+    }
+    for grade in ECOSCORE_GRADES:
+        annotations[f'grade_{grade}'] = Count('id', filter=Q(ecoscore_grade=grade))
+    for index, (key, low, high) in enumerate(PRICE_BUCKETS):
+        annotations[f'price_{index}'] = Count('id', filter=_price_filter(low, high))
+
+    rows = queryset.order_by().values('category', 'brand').annotate(**annotations)
+
+    total = 0
+    eco_friendly = 0
+    categories = {}
+    brands = {}
+    grades = dict.fromkeys(ECOSCORE_GRADES, 0)
+    prices = [0] * len(PRICE_BUCKETS)
+    for row in rows:
+        total += row['total']
+        eco_friendly += row['eco_friendly']
+        categories[row['category']] = categories.get(row['category'], 0) + row['total']
+        brands[row['brand']] = brands.get(row['brand'], 0) + row['total']
+        for grade in ECOSCORE_GRADES:
+            grades[grade] += row[f'grade_{grade}']
+        for index in range(len(PRICE_BUCKETS)):
+            prices[index] += row[f'price_{index}']
+
+    return {
+        'total': total,
+        'categories': _sorted_counts(categories),
+        'brands': _sorted_counts(brands),
+        'eco_friendly': {'true': eco_friendly, 'false': total - eco_friendly},
+        'ecoscore_grades': dict(grades, unrated=total - sum(grades.values())),
+        'price_ranges': [
+            {
+                'key': key,
+                'min': float(low),
+                'max': float(high) if high is not None else None,
+                'count': prices[index],
+            }
+            for index, (key, low, high) in enumerate(PRICE_BUCKETS)
+        ],
+    }
+
+
+def _sorted_counts(counts: Dict) -> List[Dict]:
+    return [
+        {'value': value, 'count': count}
+        for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    ]
+
+
+def _cache_key(kind: str, filters: Dict) -> str:
+    version = get_version(FACET_VERSION_KEY)
+    digest = hashlib.sha1(json.dumps(filters, sort_keys=True).encode('utf-8')).hexdigest()
+    return f'customers:{kind}:{version}:{digest}'
+
+
+def get_facets(params) -> Dict:
+    """Facet counts for the browse filters in ``params``, cached per normalized filter"""
+    filters = normalize_filters(params)
+    key = _cache_key('facets', filters)
+    return tiered_cache.get_or_set(
+        key, lambda: compute_facets(facet_queryset(filters)), FACET_CACHE_TIMEOUT, FACET_STALE_TIMEOUT,
+    )
+
+
+def invalidate_facets():
+    """
+    Retire every cached facet result and total, e.g. after a merchant
+    product or its catalog entry changes
+    """
+    bump_version(FACET_VERSION_KEY)
+
+
+_count_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='browse-count')
+_counts_in_flight = set()
+_counts_lock = threading.Lock()
+
+
+def get_total_count(filters: Dict, queryset) -> Tuple[int, bool]:
+    """
+    Number of products matching the browse filters, without counting per page
+
+    The first request for a filter set counts at most COUNT_ESTIMATE_LIMIT
+    rows; larger results are reported as that lower bound while the exact
+    count runs in the background. Cached totals older than
+    COUNT_REFRESH_AFTER are served as is, but not as exact, and recounted in
+    the background.
+
+    Returns:
+        Tuple of (count, is_exact)
+    """
+    key = _cache_key('count', filters)
+    entry = cache.get(key)
+    if entry is not None:
+        if time.time() - entry['computed_at'] > COUNT_REFRESH_AFTER:
+            _schedule_count(key, filters)
+            return entry['count'], False
+        return entry['count'], True
+
+    estimate = queryset.order_by()[:COUNT_ESTIMATE_LIMIT + 1].count()
+    if estimate <= COUNT_ESTIMATE_LIMIT:
+        cache.set(key, {'count': estimate, 'computed_at': time.time()}, COUNT_CACHE_TIMEOUT)
+        return estimate, True
+
+    _schedule_count(key, filters)
+    return COUNT_ESTIMATE_LIMIT, False
+
+
+def _schedule_count(key: str, filters: Dict):
+    with _counts_lock:
+        if key in _counts_in_flight:
+            return
+        _counts_in_flight.add(key)
+    _count_executor.submit(_refresh_count, key, filters)
+
+
+def _refresh_count(key: str, filters: Dict):
+    try:
+        count = filtered_products(filters).count()
+        cache.set(key, {'count': count, 'computed_at': time.time()}, COUNT_CACHE_TIMEOUT)
+    except Exception:
+        logger.exception(f"Could not refresh browse count {key}")
+    finally:
+        with _counts_lock:
+            _counts_in_flight.discard(key)
+        connections.close_all()
@@ -0,0 +1,47 @@
+"""
+Management command to precompute personalized customer recommendations
+"""
+from django.core.management.base import BaseCommand, CommandError
+from customers.recommendations import BLOCK_SIZE, TOP_K, generate_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Score merchant products for every customer and store the top recommendations (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--customer',
+            type=int,
+            action='append',
+            help='Only this customer profile id (repeatable; all customers by default)',
+        )
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=TOP_K,
+            help=f'Recommendations stored per customer (default {TOP_K})',
+        )
+        parser.add_argument(
+            '--block-size',
+            type=int,
+            default=BLOCK_SIZE,
+            help=f'Customers scored together (default {BLOCK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        if options['top_k'] < 1:
+            raise CommandError('--top-k must be a positive integer')
+        if options['block_size'] < 1:
+            raise CommandError('--block-size must be a positive integer')
+
+        self.stdout.write('Generating recommendations...')
+        result = generate_recommendations(
+            options['customer'],
+            top_k=options['top_k'],
+            block_size=options['block_size'],
+        )
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write(self.style.SUCCESS('Recommendations generated'))
+        self.stdout.write(f'Customers: {result["customers"]}')
+        self.stdout.write(f'Recommendations stored: {result["recommendations"]}')
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 
+from ecoswitch_backend.query_cache import CachedQuerySet
+
 
 class CustomerProfile(models.Model):
     """
@@ -36,6 +38,8 @@ class CustomerProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CachedQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.user.email}'s Customer Profile"
 
@@ -0,0 +1,73 @@
+"""
+Resolution of the product references stored on customer order items
+
+OrderItem.product_id is a free-form string, and the writers of order items
+put ids of different product models in it: the shop checkout
+(ecommerce.views_extra, from cart items) stores ecommerce.Product ids,
+populate_customer_data stores MerchantProduct ids, and the order API
+stores whatever the client sends. A bare id does not say which model it
+belongs to.
+
+Every order item also keeps the name of the product when it was ordered,
+so ``resolve_product_refs`` attributes an id to the product model whose row
+with that id has the same name. References matching no model (non-numeric,
+deleted or renamed products) or more than one are left out.
+"""
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.apps import apps
+
+# Product models order items may refer to, by source name
+PRODUCT_SOURCES = {
+    'merchant': 'merchants.MerchantProduct',
+    'product': 'products.Product',
+    'shop': 'ecommerce.Product',
+}
+
+CHUNK_SIZE = 500
+
+# (source, product id) of a resolved reference
+ProductKey = Tuple[str, int]
+
+
+def parse_product_id(reference) -> Optional[int]:
+    reference = str(reference).strip()
+    return int(reference) if reference.isdigit() else None
+
+
+def normalize_name(name: str) -> str:
+    return ' '.join((name or '').split()).casefold()
+
+
+def resolve_product_refs(items: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], ProductKey]:
+    """
+    Product named by each (reference, product name) pair of order items
+
+    Args:
+        items: (OrderItem.product_id, OrderItem.product_name) pairs
+
+    Returns:
+        {(reference, product name): (source, product id)} for the pairs
+        naming exactly one product
+    """
+    wanted = {}
+    for reference, name in set(items):
+        product_id = parse_product_id(reference)
+        if product_id is not None:
+            wanted[(reference, name)] = (product_id, normalize_name(name))
+
+    matches = {}
+    ids = sorted({product_id for product_id, _ in wanted.values()})
+    for source, model_label in PRODUCT_SOURCES.items():
+        model = apps.get_model(model_label)
+        for start in range(0, len(ids), CHUNK_SIZE):
+            rows = model.objects.filter(pk__in=ids[start:start + CHUNK_SIZE]).values_list('pk', 'name')
+            for product_id, name in rows:
+                matches.setdefault((product_id, normalize_name(name)), []).append(source)
+
+    resolved = {}
+    for item, (product_id, name) in wanted.items():
+        sources = matches.get((product_id, name), [])
+        if len(sources) == 1:
+            resolved[item] = (sources[0], product_id)
+    return resolved
@@ -0,0 +1,57 @@
+"""
+Pagination for shop browsing
+"""
+from ecoswitch_backend.pagination import KeysetPagination
+
+from .browse import get_total_count
+
+
+class BrowseProductsPagination(KeysetPagination):
+    """
+    Cursor pagination over merchant products with a cached total
+
+    Each sort has a matching (is_active, field, id) index on MerchantProduct.
+    """
+    sorts = {
+        'newest': ('-created_at', '-id'),
+        'oldest': ('created_at', 'id'),
+        'price_asc': ('price', 'id'),
+        'price_desc': ('-price', '-id'),
+        'ecoscore': ('-ecoscore_value', '-id'),
+        'name': ('name', 'id'),
+    }
+    default_sort = 'newest'
+    max_page_size = 50
+
+    # (sort_by, sort_order) pairs accepted before named sorts existed
+    legacy_sorts = {
+        ('created_at', 'desc'): 'newest',
+        ('created_at', 'asc'): 'oldest',
+        ('price', 'asc'): 'price_asc',
+        ('price', 'desc'): 'price_desc',
+        ('ecoscore_value', 'desc'): 'ecoscore',
+        ('name', 'asc'): 'name',
+    }
+
+    def __init__(self, filters):
+        self.filters = filters
+
+    def get_sort(self, request):
+        sort_by = request.query_params.get('sort_by')
+        if sort_by and not request.query_params.get(self.sort_query_param):
+            sort_order = request.query_params.get('sort_order', 'desc')
+            legacy = self.legacy_sorts.get((sort_by, sort_order))
+            if legacy:
+                return legacy
+        return super().get_sort(request)
+
+    def approximate_count(self, queryset):
+        return get_total_count(self.filters, queryset)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        # Keep the keys browse_products has always returned
+        response.data['products'] = response.data.pop('results')
+        response.data['total_count'] = response.data.pop('count')
+        response.data['page_size'] = self.page_size_value
+        return response
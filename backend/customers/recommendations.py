@@ -0,0 +1,338 @@
+"""
+Batch-precomputed personalized recommendations
+
+``generate_recommendations`` scores every active merchant product for every
+customer at once: preferred categories, eco interests, budget, the
+categories of past orders and the product's EcoScore each contribute a
+weighted term, computed as matrix products over blocks of customers. The
+top products per customer are stored as ``CustomerRecommendation`` rows in
+bulk, and ``get_recommendations`` only reads them, through a per-customer
+cache that a batch run or a "viewed" mark retires.
+"""
+import logging
+import re
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from scipy import sparse
+
+from django.core.cache import cache
+from django.db import transaction
+
+from ecoswitch_backend.versions import bump_version, get_version
+from merchants.models import MerchantProduct
+
+from .browse import PRICE_BUCKETS
+from .models import CustomerProfile, CustomerRecommendation, OrderItem
+from .order_refs import resolve_product_refs
+
+logger = logging.getLogger(__name__)
+
+
+TOP_K = 10
+BLOCK_SIZE = 256
+
+# Weight of each signal; they sum to 1, so a score is also a confidence
+WEIGHTS = {
+    'category': 0.3,
+    'history': 0.2,
+    'interests': 0.2,
+    'budget': 0.1,
+    'ecoscore': 0.2,
+}
+
+# CustomerProfile.budget_range -> index into PRICE_BUCKETS
+BUDGET_BUCKETS = {'low': 0, 'medium': 1, 'high': 2, 'premium': 3}
+
+# Orders in these states do not count as purchases
+EXCLUDED_ORDER_STATUSES = ('cancelled', 'returned')
+
+CACHE_TIMEOUT = 3600
+CACHE_VERSION_KEY = 'customers:recommendations:version'
+
+NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_text(value) -> str:
+    """Lowercase words separated by single spaces, for whole-phrase matching"""
+    return ' '.join(NON_WORD.sub(' ', str(value or '').lower()).split())
+
+
+class ProductMatrix:
+    """
+    Candidate products and their features as row-aligned arrays
+    """
+
+    def __init__(self, interests: List[str]):
+        self.products = list(
+            MerchantProduct.objects.filter(is_active=True).order_by('id').values(
+                'id', 'name', 'description', 'category', 'tags', 'eco_certifications',
+                'price', 'ecoscore_value', 'ecoscore_grade', 'is_eco_friendly', 'primary_image',
+            )
+        )
+        self.index = {product['id']: row for row, product in enumerate(self.products)}
+        self.categories = {}
+        self.interests = interests
+        # Interests each product matches, for the recommendation reason
+        self.matched_interests = []
+
+        category_rows, category_cols = [], []
+        interest_rows, interest_cols = [], []
+        budget_cols = []
+        ecoscore = np.zeros(len(self.products), dtype=np.float32)
+        for row, product in enumerate(self.products):
+            category = normalize_text(product['category'])
+            category_rows.append(row)
+            category_cols.append(self.categories.setdefault(category, len(self.categories)))
+
+            tags = product['tags'] if isinstance(product['tags'], list) else [product['tags']]
+            certifications = product['eco_certifications']
+            if not isinstance(certifications, list):
+                certifications = [certifications]
+            words = [product['name'], product['description'], *tags, *certifications]
+            text = f" {normalize_text(' '.join(map(str, words)))} "
+            matched = [column for column, interest in enumerate(interests) if f' {interest} ' in text]
+            interest_rows.extend([row] * len(matched))
+            interest_cols.extend(matched)
+            self.matched_interests.append({interests[column] for column in matched})
+
+            budget_cols.append(price_bucket(product['price']))
+            ecoscore[row] = max(
+                min(product['ecoscore_value'] / 100.0, 1.0),
+                0.5 if product['is_eco_friendly'] else 0.0,
+            )
+
+        shape = len(self.products)
+        self.category = sparse.csr_matrix(
+            (np.ones(len(category_rows), dtype=np.float32), (category_rows, category_cols)),
+            shape=(shape, max(len(self.categories), 1)),
+        )
+        self.interest = sparse.csr_matrix(
+            (np.ones(len(interest_rows), dtype=np.float32), (interest_rows, interest_cols)),
+            shape=(shape, max(len(interests), 1)),
+        )
+        self.budget = sparse.csr_matrix(
+            (np.ones(shape, dtype=np.float32), (range(shape), budget_cols)),
+            shape=(shape, len(PRICE_BUCKETS)),
+        )
+        self.ecoscore = ecoscore
+
+
+def price_bucket(price) -> int:
+    for index, (_, low, high) in enumerate(PRICE_BUCKETS):
+        if price >= low and (high is None or price < high):
+            return index
+    return 0
+
+
+def purchase_history(customer_ids: List[int]) -> Dict[int, Dict[int, int]]:
+    """
+    Units bought per merchant product for each customer
+
+    Order items naming shop or catalog products (see customers.order_refs)
+    do not count.
+    """
+    history = {}
+    items = list(OrderItem.objects.filter(order__customer_id__in=customer_ids).exclude(
+        order__order_status__in=EXCLUDED_ORDER_STATUSES,
+    ).values_list('order__customer_id', 'product_id', 'product_name', 'quantity'))
+    resolved = resolve_product_refs((reference, name) for _, reference, name, _ in items)
+    for customer_id, reference, name, quantity in items:
+        source, product_id = resolved.get((reference, name), (None, None))
+        if source == 'merchant':
+            products = history.setdefault(customer_id, {})
+            products[product_id] = products.get(product_id, 0) + quantity
+    return history
+
+
+def score_block(matrix: ProductMatrix, customers: List[Dict], history: Dict[int, Dict[int, int]],
+                history_categories: Dict[int, str]) -> Dict[str, np.ndarray]:
+    """
+    Weighted score components for a block of customers
+
+    Returns:
+        {signal: array of shape (customers, products)}
+    """
+    block = len(customers)
+    preferred = np.zeros((block, matrix.category.shape[1]), dtype=np.float32)
+    bought = np.zeros((block, matrix.category.shape[1]), dtype=np.float32)
+    interests = np.zeros((block, matrix.interest.shape[1]), dtype=np.float32)
+    budget = np.zeros((block, len(PRICE_BUCKETS)), dtype=np.float32)
+    interest_columns = {interest: column for column, interest in enumerate(matrix.interests)}
+
+    for row, customer in enumerate(customers):
+        for category in customer['preferred_categories']:
+            column = matrix.categories.get(category)
+            if column is not None:
+                preferred[row, column] = 1.0
+
+        for product_id, quantity in history.get(customer['id'], {}).items():
+            column = matrix.categories.get(history_categories.get(product_id))
+            if column is not None:
+                bought[row, column] += quantity
+        if bought[row].sum():
+            bought[row] /= bought[row].sum()
+
+        if customer['eco_interests']:
+            for interest in customer['eco_interests']:
+                interests[row, interest_columns[interest]] = 1.0 / len(customer['eco_interests'])
+
+        if customer['budget_range'] in BUDGET_BUCKETS:
+            budget[row, BUDGET_BUCKETS[customer['budget_range']]] = 1.0
+
+    def against(features, product_features):
+        # (products x features) . (features x customers) -> customers x products
+        return np.asarray(product_features.dot(features.T)).T
+
+    return {
+        'category': WEIGHTS['category'] * against(preferred, matrix.category),
+        'history': WEIGHTS['history'] * against(bought, matrix.category),
+        'interests': WEIGHTS['interests'] * against(interests, matrix.interest),
+        'budget': WEIGHTS['budget'] * against(budget, matrix.budget),
+        'ecoscore': np.broadcast_to(WEIGHTS['ecoscore'] * matrix.ecoscore, (block, len(matrix.products))),
+    }
+
+
+def top_products(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Column indexes of the ``top_k`` best scores per row, best first"""
+    top_k = min(top_k, scores.shape[1])
+    candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def recommendation_reason(signal: str, customer: Dict, product: Dict, matched_interests) -> str:
+    if signal == 'category':
+        return f"In your preferred category {product['category']}"
+    if signal == 'history':
+        return f"Based on your past orders in {product['category']}"
+    if signal == 'interests':
+        matched = [interest for interest in customer['eco_interests'] if interest in matched_interests]
+        return f"Based on your interest in {', '.join(matched[:2])}"
+    if signal == 'budget':
+        return "Within your budget"
+    if product['ecoscore_grade']:
+        return f"Highly sustainable choice (EcoScore {product['ecoscore_grade']})"
+    return "Eco-friendly choice"
+
+
+def _image_url(name: str) -> str:
+    return MerchantProduct._meta.get_field('primary_image').storage.url(name) if name else ''
+
+
+def generate_recommendations(customer_ids: Optional[Iterable[int]] = None, top_k: int = TOP_K,
+                             block_size: int = BLOCK_SIZE) -> Dict[str, int]:
+    """
+    Recompute and store the recommendations of customers (all by default)
+
+    Products a customer already bought are skipped. Rows of products the
+    customer had marked as viewed keep that mark.
+
+    Args:
+        customer_ids: Restrict to these customer profiles
+        top_k: Recommendations stored per customer
+        block_size: Customers scored per matrix product
+
+    Returns:
+        Dictionary with the number of customers and recommendations stored
+    """
+    profiles = CustomerProfile.objects.order_by('id')
+    if customer_ids is not None:
+        profiles = profiles.filter(id__in=list(customer_ids))
+    customers = list(profiles.values('id', 'preferred_categories', 'eco_interests', 'budget_range'))
+    for customer in customers:
+        customer['preferred_categories'] = [
+            normalize_text(category) for category in customer['preferred_categories'] or [] if category
+        ]
+        customer['eco_interests'] = list(dict.fromkeys(
+            normalize_text(interest) for interest in customer['eco_interests'] or [] if normalize_text(interest)
+        ))
+
+    interests = sorted({interest for customer in customers for interest in customer['eco_interests']})
+    matrix = ProductMatrix(interests)
+    logger.info(
+        f"Recommendation matrix: {len(customers)} customers x {len(matrix.products)} products, "
+        f"{len(matrix.categories)} categories, {len(interests)} interests"
+    )
+
+    stored = 0
+    for start in range(0, len(customers), block_size):
+        block = customers[start:start + block_size]
+        ids = [customer['id'] for customer in block]
+        history = purchase_history(ids)
+        bought_ids = {product_id for products in history.values() for product_id in products}
+        history_categories = {
+            product_id: normalize_text(category)
+            for product_id, category in MerchantProduct.objects.filter(id__in=bought_ids).values_list('id', 'category')
+        }
+
+        rows = []
+        if matrix.products:
+            components = score_block(matrix, block, history, history_categories)
+            scores = sum(components.values())
+            for row, customer in enumerate(block):
+                purchased = [matrix.index[pid] for pid in history.get(customer['id'], {}) if pid in matrix.index]
+                scores[row, purchased] = -1.0
+            best = top_products(scores, top_k)
+            signals = list(components)
+            contributions = np.stack([
+                np.take_along_axis(components[signal], best, axis=1) for signal in signals
+            ])
+            for row, customer in enumerate(block):
+                for position, column in enumerate(best[row]):
+                    if scores[row, column] < 0:
+                        continue
+                    product = matrix.products[column]
+                    signal = signals[int(np.argmax(contributions[:, row, position]))]
+                    rows.append(CustomerRecommendation(
+                        customer_id=customer['id'],
+                        product_id=str(product['id']),
+                        product_name=product['name'],
+                        product_image=_image_url(product['primary_image']),
+                        product_price=product['price'],
+                        recommendation_reason=recommendation_reason(
+                            signal, customer, product, matrix.matched_interests[column],
+                        ),
+                        confidence_score=round(float(scores[row, column]), 4),
+                    ))
+
+        with transaction.atomic():
+            existing = CustomerRecommendation.objects.filter(customer_id__in=ids)
+            viewed = set(existing.filter(is_viewed=True).values_list('customer_id', 'product_id'))
+            for recommendation in rows:
+                recommendation.is_viewed = (recommendation.customer_id, recommendation.product_id) in viewed
+            existing.delete()
+            CustomerRecommendation.objects.bulk_create(rows, batch_size=500)
+        stored += len(rows)
+
+    invalidate_recommendations()
+    return {'customers': len(customers), 'recommendations': stored}
+
+
+def invalidate_recommendations():
+    """Retire every cached recommendation list"""
+    bump_version(CACHE_VERSION_KEY)
+
+
+def _cache_key(user_id: int) -> str:
+    return f'customers:recommendations:{get_version(CACHE_VERSION_KEY)}:{user_id}'
+
+
+def cached_recommendations(user_id: int, load):
+    """
+    Serialized recommendations of a user, from cache or ``load()``
+
+    ``load`` returns None when the user has no customer profile; that is
+    not cached.
+    """
+    key = _cache_key(user_id)
+    data = cache.get(key)
+    if data is None:
+        data = load()
+        if data is not None:
+            cache.set(key, data, CACHE_TIMEOUT)
+    return data
+
+
+def forget_cached_recommendations(user_id: int):
+    cache.delete(_cache_key(user_id))
@@ -0,0 +1,225 @@
+"""
+Tests for shop browsing facets and totals and precomputed recommendations
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ecoswitch_backend.tiered_cache import tiered_cache
+from ecoswitch_backend.versions import version_cache
+from merchants.models import MerchantProduct, MerchantProfile
+
+from . import browse
+from .browse import filtered_products, get_facets, get_total_count, normalize_filters
+from .models import CustomerOrder, CustomerProfile, CustomerRecommendation, OrderItem
+from .recommendations import generate_recommendations
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'customers-tests'},
+    'versions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'customers-tests-versions'},
+}
+
+
+def create_merchant(username='merchant'):
+    user = get_user_model().objects.create_user(username=username, email=f'{username}@example.com')
+    return MerchantProfile.objects.create(
+        user=user, business_name='Green Goods', business_type='retail', business_description='Shop',
+        contact_person='Owner', phone_number='+919876543210', email=f'{username}@example.com',
+        address='Street', city='Pune', state='Maharashtra', postal_code='411001',
+    )
+
+
+def create_merchant_product(merchant, name, **values):
+    sku = name.upper().replace(' ', '-')
+    values = {'description': 'Everyday essential', 'category': 'Home', 'brand': 'Leaf', **values}
+    return MerchantProduct.objects.create(merchant=merchant, name=name, sku=sku, **values)
+
+
+def query(**params):
+    query_dict = QueryDict(mutable=True)
+    for key, value in params.items():
+        if isinstance(value, list):
+            query_dict.setlist(key, value)
+        else:
+            query_dict[key] = value
+    return query_dict
+
+
+@override_settings(CACHES=TEST_CACHES)
+class FacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        merchant = create_merchant()
+        create_merchant_product(merchant, 'Dish Brush', price=300, ecoscore_grade='A', tags=['bamboo'])
+        create_merchant_product(merchant, 'Steel Bottle', price=1200, ecoscore_grade='B', brand='Ferro')
+        create_merchant_product(merchant, 'Soap Bar', price=150, category='Personal Care', is_eco_friendly=False)
+        create_merchant_product(merchant, 'Old Stock', price=100, is_active=False)
+        cls.merchant = merchant
+        cls.user = get_user_model().objects.create_user(username='customer', email='customer@example.com')
+
+    def setUp(self):
+        cache.clear()
+        version_cache.clear()
+        tiered_cache.clear_local()
+
+    def test_equivalent_filters_normalize_alike(self):
+        self.assertEqual(
+            normalize_filters(query(search=' Steel  BOTTLE', category='Home ', min_price='10', tag=['B', 'a'])),
+            normalize_filters(query(search='steel bottle', category='home', min_price='10.00', tag=['a', 'b'])),
+        )
+
+    def test_every_facet_is_counted(self):
+        facets = get_facets(query())
+        self.assertEqual(facets['total'], 3)
+        self.assertEqual(facets['categories'], [
+            {'value': 'Home', 'count': 2}, {'value': 'Personal Care', 'count': 1},
+        ])
+        self.assertEqual(facets['brands'], [{'value': 'Leaf', 'count': 2}, {'value': 'Ferro', 'count': 1}])
+        self.assertEqual(facets['eco_friendly'], {'true': 2, 'false': 1})
+        self.assertEqual(facets['ecoscore_grades'], {'A': 1, 'B': 1, 'C': 0, 'D': 0, 'E': 0, 'unrated': 1})
+        self.assertEqual([bucket['count'] for bucket in facets['price_ranges']], [2, 1, 0, 0])
+
+    def test_filters_apply_to_the_counts(self):
+        self.assertEqual(get_facets(query(category='home', max_price='500'))['total'], 1)
+        self.assertEqual(get_facets(query(eco_friendly='true'))['total'], 2)
+        # Tags and search are only on the merchant products themselves
+        self.assertEqual(get_facets(query(tag=['Bamboo']))['categories'], [{'value': 'Home', 'count': 1}])
+        self.assertEqual(get_facets(query(search='soap'))['total'], 1)
+
+    def test_counts_are_cached_until_a_product_changes(self):
+        get_facets(query())
+        with self.assertNumQueries(0):
+            get_facets(query())
+
+        create_merchant_product(self.merchant, 'Jute Bag', price=700)
+        self.assertEqual(get_facets(query())['total'], 4)
+
+    def test_view_needs_a_signed_in_user(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/customers/products/facets/').status_code, 401)
+
+        client.force_authenticate(self.user)
+        response = client.get('/api/customers/products/facets/', {'category': 'Personal Care'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total'], 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BrowseTotalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        merchant = create_merchant()
+        for index in range(3):
+            create_merchant_product(merchant, f'Dish Brush {index}', price=100 + index)
+        cls.user = get_user_model().objects.create_user(username='customer', email='customer@example.com')
+        CustomerProfile.objects.create(user=cls.user, city='Pune')
+
+    def setUp(self):
+        cache.clear()
+        version_cache.clear()
+        self.filters = normalize_filters(query())
+
+    def total(self):
+        return get_total_count(self.filters, filtered_products(self.filters))
+
+    @mock.patch.object(browse, '_schedule_count')
+    def test_small_totals_are_exact_and_cached(self, schedule_count):
+        self.assertEqual(self.total(), (3, True))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.total(), (3, True))
+        schedule_count.assert_not_called()
+
+    @mock.patch.object(browse, 'COUNT_ESTIMATE_LIMIT', 2)
+    @mock.patch.object(browse, '_schedule_count')
+    def test_large_totals_are_a_lower_bound_until_counted(self, schedule_count):
+        self.assertEqual(self.total(), (2, False))
+        schedule_count.assert_called_once()
+
+        browse._refresh_count(*schedule_count.call_args.args)
+        self.assertEqual(self.total(), (3, True))
+
+    @mock.patch.object(browse, '_schedule_count')
+    def test_stale_total_is_served_as_inexact_and_recounted(self, schedule_count):
+        self.total()
+        with mock.patch.object(browse, 'COUNT_REFRESH_AFTER', -1):
+            self.assertEqual(self.total(), (3, False))
+        schedule_count.assert_called_once()
+
+    def test_browse_pages_with_a_cursor(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/customers/products/browse/', {'sort': 'price_asc', 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([product['name'] for product in data['products']], ['Dish Brush 0', 'Dish Brush 1'])
+        self.assertEqual(data['total_count'], 3)
+
+        response = client.get(data['next'])
+        self.assertEqual([product['name'] for product in response.json()['products']], ['Dish Brush 2'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        merchant = create_merchant()
+        cls.match = create_merchant_product(merchant, 'Steel Lunch Box', category='Kitchen', price=300, tags=['Zero Waste'])
+        cls.other = create_merchant_product(
+            merchant, 'Garden Bench', category='Garden', price=6000, is_eco_friendly=False,
+        )
+        cls.bought = create_merchant_product(merchant, 'Steel Tumbler', category='Kitchen', price=200)
+        cls.user = get_user_model().objects.create_user(username='customer', email='customer@example.com')
+        cls.customer = CustomerProfile.objects.create(
+            user=cls.user, preferred_categories=['kitchen'], eco_interests=['zero waste'], budget_range='low',
+        )
+        order = CustomerOrder.objects.create(customer=cls.customer, order_number='ORD-1', total_amount=200)
+        OrderItem.objects.create(
+            order=order, product_id=str(cls.bought.pk), product_name=cls.bought.name,
+            quantity=1, unit_price=200, total_price=200,
+        )
+
+    def setUp(self):
+        cache.clear()
+        version_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def recommended(self):
+        response = self.client.get('/api/customers/recommendations/')
+        self.assertEqual(response.status_code, 200)
+        return [row['product_name'] for row in response.json()['recommendations']]
+
+    def test_products_are_ranked_by_the_customer_signals(self):
+        result = generate_recommendations()
+        self.assertEqual(result, {'customers': 1, 'recommendations': 2})
+        recommendations = list(CustomerRecommendation.objects.order_by('-confidence_score'))
+        self.assertEqual([row.product_name for row in recommendations], ['Steel Lunch Box', 'Garden Bench'])
+        self.assertEqual(recommendations[0].recommendation_reason, 'In your preferred category Kitchen')
+        # Category, order history, interest, budget and half the EcoScore weight
+        self.assertEqual(recommendations[0].confidence_score, 0.9)
+
+    def test_viewed_marks_survive_a_new_run(self):
+        generate_recommendations()
+        self.assertEqual(self.recommended(), ['Steel Lunch Box', 'Garden Bench'])
+
+        recommendation = CustomerRecommendation.objects.get(product_name='Steel Lunch Box')
+        response = self.client.post(
+            '/api/customers/recommendations/mark-viewed/', {'recommendation_id': recommendation.pk},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.recommended(), ['Garden Bench'])
+
+        generate_recommendations()
+        self.assertTrue(CustomerRecommendation.objects.get(product_name='Steel Lunch Box').is_viewed)
+
+    def test_served_lists_are_cached_until_the_next_run(self):
+        self.assertEqual(self.recommended(), [])
+        with self.assertNumQueries(0):
+            self.recommended()
+
+        generate_recommendations()
+        self.assertEqual(self.recommended(), ['Steel Lunch Box', 'Garden Bench'])
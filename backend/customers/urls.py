@@ -11,12 +11,14 @@ router.register(r'reviews', views.CustomerReviewViewSet, basename='customer-revi
 router.register(r'recommendations', views.CustomerRecommendationViewSet, basename='customer-recommendation')
 
 urlpatterns = [
+    # Ahead of the router, whose recommendations/ routes would shadow them
+    path('recommendations/', views.get_recommendations, name='get_recommendations'),
+    path('recommendations/mark-viewed/', views.mark_recommendation_viewed, name='mark_recommendation_viewed'),
     path('', include(router.urls)),
     path('dashboard/', views.customer_dashboard, name='customer_dashboard'),
     path('products/browse/', views.browse_products, name='browse_products'),
+    path('products/facets/', views.product_facets, name='product_facets'),
     path('products/categories/', views.get_categories, name='get_categories'),
-    path('recommendations/', views.get_recommendations, name='get_recommendations'),
-    path('recommendations/mark-viewed/', views.mark_recommendation_viewed, name='mark_recommendation_viewed'),
     path('eco-interests/', views.get_eco_interests, name='get_eco_interests'),
 ]
 
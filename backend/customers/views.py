@@ -16,6 +16,9 @@ from .serializers import (
     OrderItemSerializer, CustomerWishlistSerializer, CustomerReviewSerializer,
     CustomerRecommendationSerializer
 )
+from .browse import filtered_products, get_facets, normalize_filters
+from .pagination import BrowseProductsPagination
+from .recommendations import cached_recommendations, forget_cached_recommendations
 
 
 class CustomerProfileViewSet(viewsets.ModelViewSet):
@@ -37,7 +40,7 @@ class CustomerProfileViewSet(viewsets.ModelViewSet):
         Get customer preferences and interests
         """
         try:
-            customer_profile = CustomerProfile.objects.get(user=request.user)
+            customer_profile = CustomerProfile.objects.cached().get(user=request.user)
             return Response({
                 'eco_interests': customer_profile.eco_interests,
                 'preferred_categories': customer_profile.preferred_categories,
@@ -84,11 +87,11 @@ class CustomerAddressViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        customer_profile = CustomerProfile.objects.get(user=self.request.user)
+        customer_profile = CustomerProfile.objects.cached().get(user=self.request.user)
         return CustomerAddress.objects.filter(customer=customer_profile)
     
     def perform_create(self, serializer):
-        customer_profile = CustomerProfile.objects.get(user=self.request.user)
+        customer_profile = CustomerProfile.objects.cached().get(user=self.request.user)
         serializer.save(customer=customer_profile)
 
 
@@ -276,7 +279,7 @@ class CustomerWishlistViewSet(viewsets.ModelViewSet):
         Add a product to wishlist
         """
         try:
-            customer_profile = CustomerProfile.objects.get(user=request.user)
+            customer_profile = CustomerProfile.objects.cached().get(user=request.user)
             product_id = request.data.get('product_id')
             product_name = request.data.get('product_name')
             product_image = request.data.get('product_image', '')
@@ -315,7 +318,7 @@ class CustomerWishlistViewSet(viewsets.ModelViewSet):
         Remove a product from wishlist
         """
         try:
-            customer_profile = CustomerProfile.objects.get(user=request.user)
+            customer_profile = CustomerProfile.objects.cached().get(user=request.user)
             product_id = request.data.get('product_id')
             
             if not product_id:
@@ -341,7 +344,7 @@ class CustomerWishlistViewSet(viewsets.ModelViewSet):
         Check if a product is in wishlist
         """
         try:
-            customer_profile = CustomerProfile.objects.get(user=request.user)
+            customer_profile = CustomerProfile.objects.cached().get(user=request.user)
             product_id = request.query_params.get('product_id')
             
             if not product_id:
@@ -366,11 +369,11 @@ class CustomerReviewViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        customer_profile = CustomerProfile.objects.get(user=self.request.user)
+        customer_profile = CustomerProfile.objects.cached().get(user=self.request.user)
         return CustomerReview.objects.filter(customer=customer_profile)
     
     def perform_create(self, serializer):
-        customer_profile = CustomerProfile.objects.get(user=self.request.user)
+        customer_profile = CustomerProfile.objects.cached().get(user=self.request.user)
         serializer.save(customer=customer_profile)
 
 
@@ -382,7 +385,7 @@ class CustomerRecommendationViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        customer_profile = CustomerProfile.objects.get(user=self.request.user)
+        customer_profile = CustomerProfile.objects.cached().get(user=self.request.user)
         return CustomerRecommendation.objects.filter(customer=customer_profile)
 
 
@@ -393,7 +396,7 @@ def customer_dashboard(request):
     Get customer dashboard data
     """
     try:
-        customer_profile = CustomerProfile.objects.get(user=request.user)
+        customer_profile = CustomerProfile.objects.cached().get(user=request.user)
     except CustomerProfile.DoesNotExist:
         return Response({'error': 'Customer profile not found'}, status=status.HTTP_404_NOT_FOUND)
     
@@ -465,74 +468,37 @@ def customer_dashboard(request):
 def browse_products(request):
     """
     Browse products with filtering and search
+    
+    ``sort`` is one of the named sorts in BrowseProductsPagination
+    (``sort_by``/``sort_order`` pairs for those orders are still accepted).
     """
     try:
-        customer_profile = CustomerProfile.objects.get(user=request.user)
+        customer_profile = CustomerProfile.objects.cached().get(user=request.user)
     except CustomerProfile.DoesNotExist:
         return Response({'error': 'Customer profile not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Import here to avoid circular imports
-    from merchants.models import MerchantProduct
-    
-    # Get query parameters
-    search = request.query_params.get('search', '')
-    category = request.query_params.get('category', '')
-    min_price = request.query_params.get('min_price')
-    max_price = request.query_params.get('max_price')
-    eco_friendly = request.query_params.get('eco_friendly')
-    sort_by = request.query_params.get('sort_by', 'created_at')
-    sort_order = request.query_params.get('sort_order', 'desc')
-    
-    # Build queryset
-    queryset = MerchantProduct.objects.filter(is_active=True)
-    
-    # Apply filters
-    if search:
-        queryset = queryset.filter(
-            Q(name__icontains=search) |
-            Q(description__icontains=search) |
-            Q(brand__icontains=search) |
-            Q(category__icontains=search)
-        )
-    
-    if category:
-        queryset = queryset.filter(category__iexact=category)
-    
-    if min_price:
-        queryset = queryset.filter(price__gte=min_price)
-    
-    if max_price:
-        queryset = queryset.filter(price__lte=max_price)
+    filters = normalize_filters(request.query_params)
+    queryset = filtered_products(filters).select_related('merchant').prefetch_related('normalized_tags')
     
-    if eco_friendly == 'true':
-        queryset = queryset.filter(is_eco_friendly=True)
-    
-    # Apply sorting
-    if sort_order == 'desc':
-        queryset = queryset.order_by(f'-{sort_by}')
-    else:
-        queryset = queryset.order_by(sort_by)
-    
-    # Pagination
-    page_size = int(request.query_params.get('page_size', 20))
-    page = int(request.query_params.get('page', 1))
-    start = (page - 1) * page_size
-    end = start + page_size
-    
-    products = queryset[start:end]
-    total_count = queryset.count()
+    # Cursor pagination over named sorts; follow 'next' for further pages
+    paginator = BrowseProductsPagination(filters)
+    products = paginator.paginate_queryset(queryset, request)
     
     # Serialize products
     from merchants.serializers import MerchantProductSerializer
     product_data = MerchantProductSerializer(products, many=True).data
     
-    return Response({
-        'products': product_data,
-        'total_count': total_count,
-        'page': page,
-        'page_size': page_size,
-        'total_pages': (total_count + page_size - 1) // page_size
-    })
+    return paginator.get_paginated_response(product_data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def product_facets(request):
+    """
+    Facet counts (category, brand, eco flag, EcoScore grade, price range)
+    for the same filters as browse_products
+    """
+    return Response(get_facets(request.query_params))
 
 
 @api_view(['GET'])
@@ -540,60 +506,26 @@ def browse_products(request):
 def get_recommendations(request):
     """
     Get personalized product recommendations
-    """
-    try:
-        customer_profile = CustomerProfile.objects.get(user=request.user)
-    except CustomerProfile.DoesNotExist:
-        return Response({'error': 'Customer profile not found'}, status=status.HTTP_404_NOT_FOUND)
-    
-    # Get existing recommendations
-    recommendations = CustomerRecommendation.objects.filter(
-        customer=customer_profile,
-        is_viewed=False
-    ).order_by('-confidence_score')[:10]
     
-    if not recommendations.exists():
-        # Generate new recommendations based on preferences
-        from merchants.models import MerchantProduct
-        
-        # Get products based on customer preferences
-        preferred_categories = customer_profile.preferred_categories or []
-        eco_interests = customer_profile.eco_interests or []
-        
-        recommended_products = MerchantProduct.objects.filter(
-            is_active=True,
-            is_eco_friendly=True
-        )
-        
-        if preferred_categories:
-            recommended_products = recommended_products.filter(
-                category__in=preferred_categories
-            )
-        
-        # Create recommendation entries
-        for product in recommended_products[:10]:
-            confidence_score = random.uniform(0.6, 0.9)  # Mock confidence score
-            
-            CustomerRecommendation.objects.get_or_create(
-                customer=customer_profile,
-                product_id=str(product.id),
-                defaults={
-                    'product_name': product.name,
-                    'product_image': product.primary_image.url if product.primary_image else '',
-                    'product_price': product.price,
-                    'recommendation_reason': f"Based on your interest in {', '.join(eco_interests[:2])}",
-                    'confidence_score': confidence_score
-                }
-            )
-        
-        # Get the newly created recommendations
+    Recommendations are precomputed by the generate_recommendations command;
+    this only reads them (cached per user).
+    """
+    def load():
+        customer_profile = CustomerProfile.objects.filter(user=request.user).first()
+        if customer_profile is None:
+            return None
         recommendations = CustomerRecommendation.objects.filter(
             customer=customer_profile,
             is_viewed=False
         ).order_by('-confidence_score')[:10]
+        return list(CustomerRecommendationSerializer(recommendations, many=True).data)
+    
+    data = cached_recommendations(request.user.pk, load)
+    if data is None:
+        return Response({'error': 'Customer profile not found'}, status=status.HTTP_404_NOT_FOUND)
     
     return Response({
-        'recommendations': CustomerRecommendationSerializer(recommendations, many=True).data
+        'recommendations': data
     })
 
 
@@ -604,7 +536,7 @@ def mark_recommendation_viewed(request):
     Mark a recommendation as viewed
     """
     try:
-        customer_profile = CustomerProfile.objects.get(user=request.user)
+        customer_profile = CustomerProfile.objects.cached().get(user=request.user)
         recommendation_id = request.data.get('recommendation_id')
         
         if not recommendation_id:
@@ -617,6 +549,7 @@ def mark_recommendation_viewed(request):
         
         recommendation.is_viewed = True
         recommendation.save()
+        forget_cached_recommendations(request.user.pk)
         
         return Response({'message': 'Recommendation marked as viewed'})
         
@@ -0,0 +1,290 @@
+"""
+Frequently-bought-together counts from order history
+
+Each stream of order items (currently customer orders, which is what cart
+suggestions are made from) is read incrementally past a stored watermark. Every pair of distinct products
+sharing an order adds one to ``ProductPairCount`` in both directions, and
+the top partners of every product touched by a batch are re-ranked into
+``BoughtTogether``, which the cart suggestions read without going near the
+orders. A batch, its counts and its watermark commit together.
+
+A batch stops short of items whose order was created in the last
+``SETTLE_SECONDS``: an item id allocated by a transaction that has not
+committed yet must not fall behind the watermark. Order statuses are only
+checked when an item is counted, so orders cancelled or returned later stay
+in the counts until the stream is rebuilt (``--rebuild``).
+
+Products are keyed as ``<source>:<id>`` (see ``product_key``), since order
+item references name products of several models
+(customers.order_refs).
+"""
+import logging
+from collections import Counter, defaultdict
+from itertools import permutations
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import BoughtTogether, CoOccurrenceWatermark, ProductPairCount
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_SIZE = 2000
+TOP_K = 20
+REFRESH_CHUNK_SIZE = 200
+WRITE_BATCH_SIZE = 500
+# Longer than any transaction creating an order with its items
+SETTLE_SECONDS = 300
+
+# Orders in these states do not count
+EXCLUDED_ORDER_STATUSES = ('cancelled', 'returned')
+
+
+class ItemStream:
+    """
+    Interface for an order item model feeding the pair counts
+    """
+    name = None
+
+    def get_queryset(self):
+        """Counted order items"""
+        raise NotImplementedError
+
+    def rows(self, queryset) -> Iterable[Tuple[int, int, Optional[str]]]:
+        """(item id, order id, product key or None when unknown) per item"""
+        raise NotImplementedError
+
+    def first_unsettled_id(self, after_id: int, cutoff) -> Optional[int]:
+        """Lowest item id past ``after_id`` created after ``cutoff``, whatever its order's status"""
+        raise NotImplementedError
+
+
+class CustomerItemStream(ItemStream):
+    name = 'customer'
+
+    def get_queryset(self):
+        from customers.models import OrderItem
+        return OrderItem.objects.exclude(order__order_status__in=EXCLUDED_ORDER_STATUSES)
+
+    def rows(self, queryset):
+        from customers.order_refs import resolve_product_refs
+
+        items = list(queryset.values_list('pk', 'order_id', 'product_id', 'product_name'))
+        products = resolve_product_refs((reference, name) for _, _, reference, name in items)
+        for item_id, order_id, reference, name in items:
+            product = products.get((reference, name))
+            yield item_id, order_id, product_key(*product) if product else None
+
+    def first_unsettled_id(self, after_id, cutoff):
+        from customers.models import OrderItem
+        return (
+            OrderItem.objects.filter(pk__gt=after_id, order__created_at__gt=cutoff)
+            .order_by('pk').values_list('pk', flat=True).first()
+        )
+
+
+STREAMS = {stream.name: stream for stream in (CustomerItemStream(),)}
+
+
+def product_key(source: str, product_id: int) -> str:
+    """Reference of a product in the pair counts, e.g. ``shop:12``"""
+    return f'{source}:{product_id}'
+
+
+def parse_product_key(key: str) -> Optional[Tuple[str, int]]:
+    """(source, product id) of a key made by ``product_key``"""
+    source, _, product_id = key.partition(':')
+    return (source, int(product_id)) if product_id.isdigit() else None
+
+
+def pair_deltas(items_by_order: Dict[int, List[Tuple[int, str]]], watermark: int) -> Counter:
+    """
+    Directed pair increments for the orders of a batch
+
+    A pair counts once per order, when its second product arrives: pairs
+    whose products were both already in the order at ``watermark`` were
+    counted by an earlier batch.
+    """
+    deltas = Counter()
+    for items in items_by_order.values():
+        counted = {ref for item_id, ref in items if item_id <= watermark}
+        products = {ref for _, ref in items}
+        for pair in permutations(products, 2):
+            if not (pair[0] in counted and pair[1] in counted):
+                deltas[pair] += 1
+    return deltas
+
+
+def apply_pair_deltas(stream_name: str, deltas: Counter):
+    """Add ``deltas`` to the stored pair counts"""
+    by_product = defaultdict(dict)
+    for (product_ref, partner_ref), delta in deltas.items():
+        by_product[product_ref][partner_ref] = delta
+
+    product_refs = list(by_product)
+    for start in range(0, len(product_refs), REFRESH_CHUNK_SIZE):
+        chunk = product_refs[start:start + REFRESH_CHUNK_SIZE]
+        existing = {
+            (product_ref, partner_ref): count
+            for product_ref, partner_ref, count in ProductPairCount.objects.filter(
+                stream=stream_name, product_ref__in=chunk,
+            ).values_list('product_ref', 'partner_ref', 'count')
+            if partner_ref in by_product[product_ref]
+        }
+        rows = [
+            ProductPairCount(
+                stream=stream_name,
+                product_ref=product_ref,
+                partner_ref=partner_ref,
+                count=existing.get((product_ref, partner_ref), 0) + delta,
+            )
+            for product_ref in chunk
+            for partner_ref, delta in by_product[product_ref].items()
+        ]
+        ProductPairCount.objects.bulk_create(
+            rows,
+            batch_size=WRITE_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['stream', 'product_ref', 'partner_ref'],
+            update_fields=['count'],
+        )
+
+
+def refresh_top_partners(stream_name: str, product_refs: Iterable[str], top_k: int = TOP_K):
+    """Re-rank the stored top partners of the given products"""
+    product_refs = list(product_refs)
+    for start in range(0, len(product_refs), REFRESH_CHUNK_SIZE):
+        chunk = product_refs[start:start + REFRESH_CHUNK_SIZE]
+        ranked = ProductPairCount.objects.filter(stream=stream_name, product_ref__in=chunk).annotate(
+            position=Window(
+                expression=RowNumber(),
+                partition_by=[F('product_ref')],
+                order_by=[F('count').desc(), F('partner_ref').asc()],
+            )
+        ).filter(position__lte=top_k).values_list('product_ref', 'partner_ref', 'count', 'position')
+
+        BoughtTogether.objects.filter(stream=stream_name, product_ref__in=chunk).delete()
+        BoughtTogether.objects.bulk_create([
+            BoughtTogether(
+                stream=stream_name,
+                product_ref=product_ref,
+                partner_ref=partner_ref,
+                count=count,
+                rank=position,
+            )
+            for product_ref, partner_ref, count, position in ranked
+        ], batch_size=WRITE_BATCH_SIZE)
+
+
+def process_batch(stream: ItemStream, batch_size: int = BATCH_SIZE, top_k: int = TOP_K) -> Dict[str, int]:
+    """
+    Count the next batch of order items past the stream's watermark
+
+    Returns:
+        Dictionary with the items read, pair increments and products re-ranked
+    """
+    with transaction.atomic():
+        watermark, _ = CoOccurrenceWatermark.objects.get_or_create(stream=stream.name)
+        # Serialize concurrent runs on the watermark row
+        watermark = CoOccurrenceWatermark.objects.select_for_update().get(pk=watermark.pk)
+        last_item_id = watermark.last_item_id
+
+        queryset = stream.get_queryset().filter(pk__gt=last_item_id)
+        # Lower ids may belong to transactions still open; wait for them
+        unsettled_id = stream.first_unsettled_id(last_item_id, timezone.now() - timedelta(seconds=SETTLE_SECONDS))
+        if unsettled_id is not None:
+            queryset = queryset.filter(pk__lt=unsettled_id)
+        new_items = list(stream.rows(queryset.order_by('pk')[:batch_size]))
+        if not new_items:
+            return {'items': 0, 'pairs': 0, 'products': 0}
+        high = new_items[-1][0]
+
+        # Earlier items of the same orders pair with the new ones
+        items_by_order = defaultdict(list)
+        order_ids = list({order_id for _, order_id, _ in new_items})
+        for start in range(0, len(order_ids), REFRESH_CHUNK_SIZE):
+            queryset = stream.get_queryset().filter(
+                order_id__in=order_ids[start:start + REFRESH_CHUNK_SIZE], pk__lte=high,
+            )
+            for item_id, order_id, ref in stream.rows(queryset):
+                # Items naming no known product still advance the watermark
+                if ref is not None:
+                    items_by_order[order_id].append((item_id, ref))
+
+        deltas = pair_deltas(items_by_order, last_item_id)
+        apply_pair_deltas(stream.name, deltas)
+        touched = {product_ref for product_ref, _ in deltas}
+        refresh_top_partners(stream.name, touched, top_k)
+
+        watermark.last_item_id = high
+        watermark.save(update_fields=['last_item_id', 'updated_at'])
+
+    return {'items': len(new_items), 'pairs': sum(deltas.values()), 'products': len(touched)}
+
+
+def reset_stream(stream_name: str):
+    """Forget a stream's counts so the next update recounts every order"""
+    with transaction.atomic():
+        ProductPairCount.objects.filter(stream=stream_name).delete()
+        BoughtTogether.objects.filter(stream=stream_name).delete()
+        CoOccurrenceWatermark.objects.filter(stream=stream_name).delete()
+
+
+def update_bought_together(stream_names: Iterable[str] = None, batch_size: int = BATCH_SIZE,
+                           top_k: int = TOP_K, rebuild: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    Count every order item added since the last run
+
+    Args:
+        stream_names: Streams to update (all by default)
+        batch_size: Order items counted per transaction
+        top_k: Partners kept per product
+        rebuild: Drop the stored counts first and recount all orders
+
+    Returns:
+        Dictionary of {stream: {'items': n, 'pairs': n, 'products': n}}
+    """
+    results = {}
+    for stream_name in stream_names or STREAMS:
+        stream = STREAMS[stream_name]
+        if rebuild:
+            reset_stream(stream_name)
+
+        totals = Counter()
+        while True:
+            batch = process_batch(stream, batch_size, top_k)
+            if not batch['items']:
+                break
+            totals.update(batch)
+        results[stream_name] = {key: totals[key] for key in ('items', 'pairs', 'products')}
+        logger.info(
+            f"Bought together {stream_name}: {totals['items']} items, "
+            f"{totals['pairs']} pair increments, {totals['products']} products re-ranked"
+        )
+    return results
+
+
+def suggest_partners(stream_name: str, product_refs: Iterable[str], limit: int = 10) -> List[Tuple[str, int]]:
+    """
+    Products most often bought with any of ``product_refs``, excluding them
+
+    Returns:
+        (partner reference, summed pair count) pairs, best first
+    """
+    product_refs = [str(ref) for ref in product_refs]
+    if not product_refs:
+        return []
+    return list(
+        BoughtTogether.objects.filter(stream=stream_name, product_ref__in=product_refs)
+        .exclude(partner_ref__in=product_refs)
+        .values('partner_ref')
+        .annotate(score=Sum('count'))
+        .order_by('-score', 'partner_ref')
+        .values_list('partner_ref', 'score')[:limit]
+    )
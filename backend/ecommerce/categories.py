@@ -0,0 +1,104 @@
+"""
+Cached category tree for subtree filters and breadcrumbs
+
+The whole ``ecommerce.Category`` table is loaded in one query into a tree
+held per process. Category saves and deletes bump a shared version,
+and every process reloads when it sees a newer one. "Category and its
+descendants" then becomes a list of ids for a single ``category_id IN``
+query, and breadcrumbs need no query at all.
+"""
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from ecoswitch_backend.versions import bump_version, get_version
+
+VERSION_KEY = 'ecommerce:category_tree:version'
+
+
+@dataclass
+class CategoryNode:
+    id: int
+    name: str
+    slug: str
+    parent_id: Optional[int]
+    path: str
+    depth: int
+    is_active: bool
+    sort_order: int
+    children: List['CategoryNode'] = field(default_factory=list)
+
+    def as_crumb(self) -> Dict:
+        return {'id': self.id, 'name': self.name, 'slug': self.slug}
+
+
+class CategoryTree:
+    """
+    Categories by id and slug, with children in display order
+    """
+
+    def __init__(self, rows: List[Dict]):
+        self.nodes: Dict[int, CategoryNode] = {row['id']: CategoryNode(**row) for row in rows}
+        self.by_slug: Dict[str, CategoryNode] = {node.slug: node for node in self.nodes.values()}
+        self.roots: List[CategoryNode] = []
+        for node in sorted(self.nodes.values(), key=lambda node: (node.sort_order, node.name)):
+            parent = self.nodes.get(node.parent_id)
+            (parent.children if parent else self.roots).append(node)
+        self._subtrees: Dict[int, List[int]] = {}
+
+    def get(self, slug_or_id) -> Optional[CategoryNode]:
+        if isinstance(slug_or_id, int):
+            return self.nodes.get(slug_or_id)
+        return self.by_slug.get(slug_or_id)
+
+    def subtree_ids(self, category_id: int) -> List[int]:
+        """The category and all of its descendants"""
+        if category_id not in self._subtrees:
+            ids = []
+            stack = [self.nodes[category_id]] if category_id in self.nodes else []
+            while stack:
+                node = stack.pop()
+                ids.append(node.id)
+                stack.extend(node.children)
+            self._subtrees[category_id] = ids
+        return self._subtrees[category_id]
+
+    def breadcrumbs(self, category_id: int) -> List[Dict]:
+        """Root-first chain of categories down to ``category_id``"""
+        node = self.nodes.get(category_id)
+        if node is None:
+            return []
+        return [
+            self.nodes[int(ancestor_id)].as_crumb()
+            for ancestor_id in node.path.strip('/').split('/')
+            if int(ancestor_id) in self.nodes
+        ]
+
+
+_lock = threading.Lock()
+_tree: Optional[CategoryTree] = None
+_tree_version = None
+
+
+def get_category_tree() -> CategoryTree:
+    """This process's category tree, reloaded when categories changed anywhere"""
+    global _tree, _tree_version
+    from .models import Category
+
+    version = get_version(VERSION_KEY)
+    tree = _tree
+    if tree is not None and _tree_version == version:
+        return tree
+
+    rows = list(Category.objects.values(
+        'id', 'name', 'slug', 'parent_id', 'path', 'depth', 'is_active', 'sort_order',
+    ))
+    tree = CategoryTree(rows)
+    with _lock:
+        _tree, _tree_version = tree, version
+    return tree
+
+
+def invalidate_category_tree():
+    bump_version(VERSION_KEY)
+
@@ -0,0 +1,57 @@
+"""
+Management command to count frequently-bought-together products from new orders
+"""
+from django.core.management.base import BaseCommand, CommandError
+from ecommerce.bought_together import BATCH_SIZE, STREAMS, TOP_K, update_bought_together
+
+
+class Command(BaseCommand):
+    help = 'Add order items since the last run to the bought-together counts (run on a schedule, e.g. every 15 minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stream',
+            action='append',
+            choices=list(STREAMS),
+            help='Only update this order stream (repeatable; all streams by default)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Order items counted per transaction (default {BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=TOP_K,
+            help=f'Partners kept per product (default {TOP_K})',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Drop the stored counts and recount every order (after changing --top-k, '
+                 'and to drop orders cancelled or returned since they were counted)',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be a positive integer')
+        if options['top_k'] < 1:
+            raise CommandError('--top-k must be a positive integer')
+
+        self.stdout.write('Updating bought-together counts...')
+        results = update_bought_together(
+            options['stream'],
+            batch_size=options['batch_size'],
+            top_k=options['top_k'],
+            rebuild=options['rebuild'],
+        )
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write(self.style.SUCCESS('Bought-together counts updated'))
+        for stream, counts in results.items():
+            self.stdout.write(
+                f'{stream}: {counts["items"]} order items, {counts["pairs"]} pair increments, '
+                f'{counts["products"]} products re-ranked'
+            )
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:49
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+
+def backfill_rating_summaries(apps, schema_editor):
+    # Frozen copy of products.ratings.rebuild_rating_summaries; migrations
+    # must not depend on code that keeps changing
+    Product = apps.get_model('ecommerce', 'Product')
+    ProductReview = apps.get_model('ecommerce', 'ProductReview')
+    reviews = ProductReview.objects.filter(product=OuterRef('pk'), is_approved=True).order_by().values('product')
+
+    def aggregate(queryset, expression):
+        return Coalesce(
+            Subquery(queryset.annotate(value=expression).values('value'), output_field=IntegerField()),
+            Value(0),
+        )
+
+    updates = {
+        'rating_sum': aggregate(reviews, Sum('rating')),
+        'rating_count': aggregate(reviews, Count('id')),
+    }
+    for rating in range(1, 6):
+        updates[f'rating_{rating}'] = aggregate(reviews.filter(rating=rating), Count('id'))
+    Product.objects.update(**updates)
+    Product.objects.update(avg_rating=Case(
+        When(rating_count__gt=0, then=Cast(F('rating_sum'), FloatField()) / Cast(F('rating_count'), FloatField())),
+        default=Value(0.0),
+        output_field=FloatField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='avg_rating',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'avg_rating', 'id'], name='ecom_product_active_rating_idx'),
+        ),
+        migrations.RunPython(backfill_rating_summaries, migrations.RunPython.noop),
+    ]
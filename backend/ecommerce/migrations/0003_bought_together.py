@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0002_rating_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoOccurrenceWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stream', models.CharField(choices=[('customer', 'Customer orders'), ('merchant', 'Merchant orders')], max_length=20, unique=True)),
+                ('last_item_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductPairCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stream', models.CharField(choices=[('customer', 'Customer orders'), ('merchant', 'Merchant orders')], max_length=20)),
+                ('product_ref', models.CharField(max_length=100)),
+                ('partner_ref', models.CharField(max_length=100)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['stream', 'product_ref', '-count'], name='ecom_pair_count_idx')],
+                'unique_together': {('stream', 'product_ref', 'partner_ref')},
+            },
+        ),
+        migrations.CreateModel(
+            name='BoughtTogether',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stream', models.CharField(choices=[('customer', 'Customer orders'), ('merchant', 'Merchant orders')], max_length=20)),
+                ('product_ref', models.CharField(max_length=100)),
+                ('partner_ref', models.CharField(max_length=100)),
+                ('count', models.PositiveIntegerField()),
+                ('rank', models.PositiveSmallIntegerField()),
+            ],
+            options={
+                'ordering': ['stream', 'product_ref', 'rank'],
+                'indexes': [models.Index(fields=['stream', 'product_ref', 'rank'], name='ecom_bought_together_idx')],
+                'unique_together': {('stream', 'product_ref', 'partner_ref')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:09
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def backfill_category_paths(apps, schema_editor):
+    """Compute ``path`` and ``depth`` of every category from the parent links"""
+    Category = apps.get_model('ecommerce', 'Category')
+    parents = dict(Category.objects.values_list('id', 'parent_id'))
+    children = defaultdict(list)
+    for category_id, parent_id in parents.items():
+        children[parent_id if parent_id in parents else None].append(category_id)
+
+    updated = []
+    stack = [(category_id, '') for category_id in children[None]]
+    while stack:
+        category_id, parent_path = stack.pop()
+        path = f'{parent_path}{category_id}/'
+        updated.append(Category(pk=category_id, path=path, depth=path.count('/') - 1))
+        stack.extend((child_id, path) for child_id in children[category_id])
+
+    Category.objects.bulk_update(updated, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0003_bought_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_category_paths, migrations.RunPython.noop),
+    ]
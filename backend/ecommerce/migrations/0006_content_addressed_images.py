@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:24
+
+from django.db import migrations, models
+import ecoswitch_backend.content_storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0005_productimage_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=models.ImageField(storage=ecoswitch_backend.content_storage.ContentAddressedStorage(), upload_to='products/'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:39
+
+from django.db import migrations, models
+
+
+def delete_merchant_stream(apps, schema_editor):
+    for model_name in ('ProductPairCount', 'BoughtTogether', 'CoOccurrenceWatermark'):
+        apps.get_model('ecommerce', model_name).objects.filter(stream='merchant').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0006_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_merchant_stream, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='boughttogether',
+            name='stream',
+            field=models.CharField(choices=[('customer', 'Customer orders')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='cooccurrencewatermark',
+            name='stream',
+            field=models.CharField(choices=[('customer', 'Customer orders')], max_length=20, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='productpaircount',
+            name='stream',
+            field=models.CharField(choices=[('customer', 'Customer orders')], max_length=20),
+        ),
+    ]
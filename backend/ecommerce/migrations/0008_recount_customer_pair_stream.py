@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def reset_customer_stream(apps, schema_editor):
+    # Counts were keyed on raw order item references; the next
+    # update_bought_together run recounts every order with product keys
+    for model_name in ('ProductPairCount', 'BoughtTogether', 'CoOccurrenceWatermark'):
+        apps.get_model('ecommerce', model_name).objects.filter(stream='customer').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0007_drop_merchant_pair_stream'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_customer_stream, migrations.RunPython.noop),
+    ]
@@ -1,18 +1,33 @@
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Concat, Substr
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
 
+from ecoswitch_backend.content_storage import content_storage
+from products.models import RatingSummary
+
+from .categories import invalidate_category_tree
+
 
 class Category(models.Model):
     """
     Product categories
+    
+    ``path`` materializes the position in the tree as the ids from the root
+    down, e.g. ``"1/5/9/"``, so a subtree is every row whose path starts
+    with the node's. It is maintained on save; moving a category rewrites
+    its descendants in one UPDATE.
     """
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    path = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)  # 0 for top-level categories
     is_active = models.BooleanField(default=True)
     sort_order = models.PositiveIntegerField(default=0)
     
@@ -25,6 +40,48 @@ class Category(models.Model):
     
     def __str__(self):
         return self.name
+    
+    def clean(self):
+        if self.pk and self.parent_id and self._is_in_subtree(self.parent_id):
+            raise ValidationError({'parent': 'A category cannot be moved below itself.'})
+    
+    def save(self, *args, **kwargs):
+        stored = None
+        if self.pk:
+            stored = Category.objects.filter(pk=self.pk).values('path', 'depth').first()
+            if stored and self.parent_id and self._is_in_subtree(self.parent_id, stored['path']):
+                raise ValueError('A category cannot be moved below itself')
+        super().save(*args, **kwargs)
+        self._update_path(stored)
+        # After the path is written, so no process reloads a half-moved tree
+        invalidate_category_tree()
+    
+    def _is_in_subtree(self, category_id, path=None):
+        """Whether ``category_id`` is this category or one of its descendants"""
+        path = path if path is not None else self.path
+        if not path:
+            return category_id == self.pk
+        return Category.objects.filter(pk=category_id, path__startswith=path).exists()
+    
+    def _update_path(self, stored):
+        parent_path = ''
+        if self.parent_id:
+            parent_path = Category.objects.values_list('path', flat=True).get(pk=self.parent_id)
+        path = f'{parent_path}{self.pk}/'
+        depth = path.count('/') - 1
+        old_path = stored['path'] if stored else ''
+        if path == old_path:
+            self.path, self.depth = path, depth
+            return
+        
+        if old_path:
+            # Re-root the descendants under the new path
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (depth - stored['depth']),
+            )
+        Category.objects.filter(pk=self.pk).update(path=path, depth=depth)
+        self.path, self.depth = path, depth
 
 
 class Brand(models.Model):
@@ -45,9 +102,20 @@ class Brand(models.Model):
         return self.name
 
 
-class Product(models.Model):
+class ProductQuerySet(models.QuerySet):
+    
+    def with_primary_image(self):
+        """Annotate ``primary_image_name``, the stored file name of the primary image, and its thumbnails"""
+        images = ProductImage.objects.filter(product=OuterRef('pk'), is_primary=True)
+        return self.annotate(
+            primary_image_name=Subquery(images.values('image')[:1]),
+            primary_image_thumbnails=Subquery(images.values('thumbnails')[:1], output_field=models.JSONField()),
+        )
+
+
+class Product(RatingSummary):
     """
-    Main product model
+    Main product model (rating summary counts approved reviews only)
     """
     ECO_RATING_CHOICES = [
         (1, '1 Star'),
@@ -97,6 +165,8 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProductQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -104,6 +174,7 @@ class Product(models.Model):
             models.Index(fields=['brand', 'is_active']),
             models.Index(fields=['price']),
             models.Index(fields=['eco_rating']),
+            models.Index(fields=['is_active', 'avg_rating', 'id'], name='ecom_product_active_rating_idx'),
         ]
     
     def __str__(self):
@@ -129,7 +200,8 @@ class ProductImage(models.Model):
     Product images
     """
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='products/')
+    image = models.ImageField(upload_to='products/', storage=content_storage)
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)  # Derivatives of image (products.thumbnails)
     alt_text = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)
     sort_order = models.PositiveIntegerField(default=0)
@@ -314,4 +386,63 @@ class EcoImpact(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f"{self.user.email} - {self.order.order_number} - Eco Impact"
\ No newline at end of file
+        return f"{self.user.email} - {self.order.order_number} - Eco Impact"
+
+
+# Order item streams feeding the bought-together counts: customers.OrderItem
+# (product references as stored in carts)
+CO_OCCURRENCE_STREAMS = [
+    ('customer', 'Customer orders'),
+]
+
+
+class ProductPairCount(models.Model):
+    """
+    Number of orders containing both products, stored in both directions
+    """
+    stream = models.CharField(max_length=20, choices=CO_OCCURRENCE_STREAMS)
+    product_ref = models.CharField(max_length=100)
+    partner_ref = models.CharField(max_length=100)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['stream', 'product_ref', 'partner_ref']
+        indexes = [
+            models.Index(fields=['stream', 'product_ref', '-count'], name='ecom_pair_count_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.stream}: {self.product_ref} + {self.partner_ref} ({self.count})"
+
+
+class BoughtTogether(models.Model):
+    """
+    Top partners of a product by pair count, refreshed from ProductPairCount
+    """
+    stream = models.CharField(max_length=20, choices=CO_OCCURRENCE_STREAMS)
+    product_ref = models.CharField(max_length=100)
+    partner_ref = models.CharField(max_length=100)
+    count = models.PositiveIntegerField()
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        unique_together = ['stream', 'product_ref', 'partner_ref']
+        ordering = ['stream', 'product_ref', 'rank']
+        indexes = [
+            models.Index(fields=['stream', 'product_ref', 'rank'], name='ecom_bought_together_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.stream}: {self.product_ref} -> {self.partner_ref} (#{self.rank})"
+
+
+class CoOccurrenceWatermark(models.Model):
+    """
+    Last order item id of a stream already counted into ProductPairCount
+    """
+    stream = models.CharField(max_length=20, choices=CO_OCCURRENCE_STREAMS, unique=True)
+    last_item_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.stream} up to item {self.last_item_id}"
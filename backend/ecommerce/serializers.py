@@ -4,6 +4,8 @@ from .models import (
     Category, Brand, Product, ProductImage, ProductVariant, 
     ProductReview, Coupon, Payment, ShippingMethod, OrderTracking, EcoImpact
 )
+from .categories import get_category_tree
+from products.thumbnails import ThumbnailSrcsetField, thumbnail_srcset
 from customers.models import Cart, CartItem, CustomerProfile, CustomerOrder, OrderItem, CustomerWishlist
 
 User = get_user_model()
@@ -22,9 +24,11 @@ class BrandSerializer(serializers.ModelSerializer):
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    srcset = ThumbnailSrcsetField('image')
+    
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'alt_text', 'is_primary', 'sort_order']
+        fields = ['id', 'image', 'srcset', 'alt_text', 'is_primary', 'sort_order']
 
 
 class ProductVariantSerializer(serializers.ModelSerializer):
@@ -48,8 +52,9 @@ class ProductListSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     brand_name = serializers.CharField(source='brand.name', read_only=True)
     primary_image = serializers.SerializerMethodField()
+    primary_image_srcset = serializers.SerializerMethodField()
     average_rating = serializers.SerializerMethodField()
-    review_count = serializers.SerializerMethodField()
+    review_count = serializers.IntegerField(source='rating_count', read_only=True)
     discount_percentage = serializers.ReadOnlyField()
     
     class Meta:
@@ -57,35 +62,49 @@ class ProductListSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'slug', 'short_description', 'category_name', 'brand_name',
                  'price', 'compare_price', 'stock_quantity', 'is_in_stock', 'is_low_stock',
                  'eco_rating', 'is_organic', 'is_biodegradable', 'is_recyclable', 'is_plastic_free',
-                 'primary_image', 'average_rating', 'review_count', 'discount_percentage',
+                 'primary_image', 'primary_image_srcset', 'average_rating', 'review_count', 'discount_percentage',
                  'is_featured', 'created_at']
     
+    def _primary_image(self, obj):
+        """(file name, thumbnails) of the primary image"""
+        # Annotated by Product.objects.with_primary_image() on list endpoints
+        if not hasattr(obj, 'primary_image_name'):
+            primary_image = obj.images.filter(is_primary=True).first()
+            obj.primary_image_name = primary_image.image.name if primary_image else None
+            obj.primary_image_thumbnails = primary_image.thumbnails if primary_image else None
+        return obj.primary_image_name, obj.primary_image_thumbnails
+    
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
-        if primary_image:
-            return self.context['request'].build_absolute_uri(primary_image.image.url)
+        name, _ = self._primary_image(obj)
+        if name:
+            url = ProductImage._meta.get_field('image').storage.url(name)
+            return self.context['request'].build_absolute_uri(url)
         return None
     
-    def get_average_rating(self, obj):
-        reviews = obj.reviews.filter(is_approved=True)
-        if reviews.exists():
-            return round(sum(review.rating for review in reviews) / reviews.count(), 1)
-        return 0
+    def get_primary_image_srcset(self, obj):
+        name, thumbnails = self._primary_image(obj)
+        storage = ProductImage._meta.get_field('image').storage
+        return thumbnail_srcset(thumbnails, name, storage, self.context.get('request'))
     
-    def get_review_count(self, obj):
-        return obj.reviews.filter(is_approved=True).count()
+    def get_average_rating(self, obj):
+        return round(obj.avg_rating, 1)
 
 
 class ProductDetailSerializer(ProductListSerializer):
     images = ProductImageSerializer(many=True, read_only=True)
     variants = ProductVariantSerializer(many=True, read_only=True)
     reviews = ProductReviewSerializer(many=True, read_only=True)
+    rating_histogram = serializers.ReadOnlyField()
+    breadcrumbs = serializers.SerializerMethodField()
     
     class Meta(ProductListSerializer.Meta):
         fields = ProductListSerializer.Meta.fields + [
-            'description', 'sku', 'images', 'variants', 'reviews',
-            'carbon_footprint', 'meta_title', 'meta_description'
+            'description', 'sku', 'images', 'variants', 'reviews', 'rating_histogram',
+            'breadcrumbs', 'carbon_footprint', 'meta_title', 'meta_description'
         ]
+    
+    def get_breadcrumbs(self, obj):
+        return get_category_tree().breadcrumbs(obj.category_id)
 
 
 class CartItemSerializer(serializers.ModelSerializer):
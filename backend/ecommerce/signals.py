@@ -0,0 +1,61 @@
+"""
+Signal handlers keeping product rating summaries in sync with approved reviews,
+the cached category tree in sync with categories, and image thumbnails current
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from ecoswitch_backend.response_cache import watch_models
+from products.ratings import apply_rating_change, stored_rating_entry
+from products.thumbnails import schedule_thumbnails
+
+from .categories import invalidate_category_tree
+from .models import Brand, Category, Coupon, Product, ProductImage, ProductReview, ShippingMethod
+
+
+def counted_entry(review):
+    """Entry of a review in its product's summary; only approved reviews count"""
+    if not review.is_approved:
+        return None
+    return review.product_id, review.rating
+
+
+@receiver(pre_save, sender=ProductReview)
+def remember_review_rating(sender, instance, raw=False, **kwargs):
+    """Note how a review counted before this save"""
+    if not raw:
+        instance._stored_rating_entry = stored_rating_entry(sender, instance.pk, is_approved=True)
+
+
+@receiver(post_save, sender=ProductReview)
+def update_rating_summary(sender, instance, raw=False, **kwargs):
+    """Move a saved review's rating into its product's summary"""
+    if raw:
+        return
+    before = getattr(instance, '_stored_rating_entry', None)
+    after = counted_entry(instance)
+    apply_rating_change(Product, before, after)
+    instance._stored_rating_entry = after
+
+
+@receiver(post_delete, sender=ProductReview)
+def remove_rating_from_summary(sender, instance, **kwargs):
+    """Take a deleted review's rating out of its product's summary"""
+    apply_rating_change(Product, counted_entry(instance), None)
+
+
+@receiver(post_delete, sender=Category)
+def refresh_category_tree(sender, instance, **kwargs):
+    """Have every process reload the category tree; saves do so in Category.save()"""
+    invalidate_category_tree()
+
+
+@receiver(post_save, sender=ProductImage)
+def update_product_image_thumbnails(sender, instance, raw=False, **kwargs):
+    """Make thumbnails of a new or replaced image"""
+    if not raw:
+        schedule_thumbnails(instance)
+
+
+# Cached API responses built from these models (ecoswitch_backend.response_cache)
+watch_models(Category, Brand, Coupon, ShippingMethod, ProductImage)
@@ -1,3 +1,296 @@
-from django.test import TestCase
+"""
+Tests for shop product listings, moderated rating summaries, bought-together
+counts and category paths
+"""
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from customers.models import CustomerOrder, CustomerProfile, OrderItem
+
+from .bought_together import pair_deltas, product_key, suggest_partners, update_bought_together
+from .categories import get_category_tree
+from .models import BoughtTogether, Brand, Category, Product, ProductImage, ProductPairCount, ProductReview
+from .serializers import ProductListSerializer
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ecommerce-tests'},
+    'versions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ecommerce-tests-versions'},
+}
+
+
+def create_category(name, parent=None):
+    return Category.objects.create(name=name, slug=name.lower(), parent=parent)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ProductListTests(TestCase):
+    url = '/api/ecommerce/products/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = create_category('Kitchen')
+        cls.brand = Brand.objects.create(name='Leaf', slug='leaf')
+        cls.with_image = cls.create_product('Steel bottle', images=['products/side.jpg', 'products/front.jpg'])
+        cls.without_image = cls.create_product('Cloth bag')
+
+    @classmethod
+    def create_product(cls, name, images=()):
+        slug = name.lower().replace(' ', '-')
+        product = Product.objects.create(
+            name=name, slug=slug, sku=slug.upper(), description='Item', price=100,
+            category=cls.category, brand=cls.brand,
+        )
+        for index, image in enumerate(images):
+            # The last image is the primary one
+            ProductImage.objects.create(
+                product=product, image=image, is_primary=index == len(images) - 1, sort_order=index,
+            )
+        return product
+
+    def listed_images(self):
+        data = self.client.get(self.url).json()
+        rows = data['results'] if isinstance(data, dict) else data
+        return {row['name']: row['primary_image'] for row in rows}
+
+    def test_list_shows_each_primary_image(self):
+        images = self.listed_images()
+        self.assertTrue(images['Steel bottle'].endswith('/products/front.jpg'))
+        self.assertIsNone(images['Cloth bag'])
+
+    def test_list_queries_do_not_grow_with_the_page(self):
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.url)
+        for index in range(3):
+            self.create_product(f'Jar {index}', images=[f'products/jar-{index}.jpg'])
+        with CaptureQueriesContext(connection) as more:
+            self.client.get(self.url)
+        self.assertEqual(len(more), len(few))
+
+    def test_unannotated_products_load_their_image(self):
+        request = Request(APIRequestFactory().get(self.url))
+        data = ProductListSerializer(Product.objects.get(pk=self.with_image.pk), context={'request': request}).data
+        self.assertTrue(data['primary_image'].endswith('/products/front.jpg'))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ModeratedRatingSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(
+            name='Steel bottle', slug='steel-bottle', sku='SB1', description='Bottle', price=500,
+            category=create_category('Kitchen'), brand=Brand.objects.create(name='Leaf', slug='leaf'),
+        )
+        cls.user = get_user_model().objects.create_user(username='reviewer', email='reviewer@example.com')
+
+    def summary(self):
+        product = Product.objects.get(pk=self.product.pk)
+        return product.rating_count, product.rating_sum, product.rating_4, product.avg_rating
+
+    def test_only_approved_reviews_count(self):
+        review = ProductReview.objects.create(
+            product=self.product, user=self.user, rating=4, title='Good', comment='Text', is_approved=False,
+        )
+        self.assertEqual(self.summary(), (0, 0, 0, 0.0))
+
+        review.is_approved = True
+        review.save()
+        self.assertEqual(self.summary(), (1, 4, 1, 4.0))
+
+        review.is_approved = False
+        review.save()
+        self.assertEqual(self.summary(), (0, 0, 0, 0.0))
+
+    def test_deleting_an_unapproved_review_changes_nothing(self):
+        ProductReview.objects.create(product=self.product, user=self.user, rating=4, title='Good', comment='Text')
+        other = get_user_model().objects.create_user(username='other', email='other@example.com')
+        pending = ProductReview.objects.create(
+            product=self.product, user=other, rating=1, title='Bad', comment='Text', is_approved=False,
+        )
+        pending.delete()
+        self.assertEqual(self.summary(), (1, 4, 1, 4.0))
+
+    def test_list_filters_on_the_stored_average(self):
+        ProductReview.objects.create(product=self.product, user=self.user, rating=4, title='Good', comment='Text')
+        response = self.client.get('/api/ecommerce/products/', {'min_rating': '4'})
+        data = response.json()
+        rows = data['results'] if isinstance(data, dict) else data
+        self.assertEqual([row['id'] for row in rows], [self.product.pk])
+        self.assertEqual(self.client.get('/api/ecommerce/products/', {'min_rating': 'high'}).status_code, 400)
+
+
+class PairDeltasTests(TestCase):
+    def test_every_ordered_pair_counts_once_per_order(self):
+        deltas = pair_deltas({1: [(1, 'a'), (2, 'b'), (3, 'c')], 2: [(4, 'a'), (5, 'b')]}, watermark=0)
+        self.assertEqual(deltas[('a', 'b')], 2)
+        self.assertEqual(deltas[('b', 'a')], 2)
+        self.assertEqual(deltas[('a', 'c')], 1)
+        self.assertEqual(sum(deltas.values()), 8)
+
+    def test_pairs_counted_before_the_watermark_are_skipped(self):
+        # Items 1 and 2 were counted by an earlier batch; item 3 is new
+        deltas = pair_deltas({1: [(1, 'a'), (2, 'b'), (3, 'c')]}, watermark=2)
+        self.assertNotIn(('a', 'b'), deltas)
+        self.assertNotIn(('b', 'a'), deltas)
+        self.assertEqual(set(deltas), {('a', 'c'), ('c', 'a'), ('b', 'c'), ('c', 'b')})
+
+    def test_repeated_products_in_an_order_count_once(self):
+        deltas = pair_deltas({1: [(1, 'a'), (2, 'a'), (3, 'b')]}, watermark=0)
+        self.assertEqual(dict(deltas), {('a', 'b'): 1, ('b', 'a'): 1})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BoughtTogetherTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = create_category('Kitchen')
+        brand = Brand.objects.create(name='Leaf', slug='leaf')
+        cls.products = [
+            Product.objects.create(
+                name=f'Shop item {i}', slug=f'shop-item-{i}', sku=f'SI{i}', description='Item', price=100,
+                category=category, brand=brand,
+            )
+            for i in range(3)
+        ]
+        user = get_user_model().objects.create_user(username='shopper', email='shopper@example.com')
+        cls.customer = CustomerProfile.objects.create(user=user)
+
+    def order(self, number, products, settled=True):
+        order = CustomerOrder.objects.create(customer=self.customer, order_number=number, total_amount=100)
+        for product in products:
+            OrderItem.objects.create(
+                order=order, product_id=str(product.pk), product_name=product.name,
+                quantity=1, unit_price=100, total_price=100,
+            )
+        if settled:
+            # Items of recent orders may still be committing and are held back
+            CustomerOrder.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        return order
+
+    def count(self, product, partner):
+        return ProductPairCount.objects.get(
+            stream='customer', product_ref=product_key('shop', product.pk), partner_ref=product_key('shop', partner.pk),
+        ).count
+
+    def test_incremental_runs_count_each_pair_once(self):
+        first, second, third = self.products
+        order = self.order('ORD-1', [first, second])
+        self.order('ORD-2', [first, second])
+        update_bought_together(['customer'])
+        self.assertEqual(self.count(first, second), 2)
+
+        # A later item of an already counted order only adds its own pairs
+        OrderItem.objects.create(
+            order=order, product_id=str(third.pk), product_name=third.name,
+            quantity=1, unit_price=100, total_price=100,
+        )
+        result = update_bought_together(['customer'])
+        self.assertEqual(result['customer']['items'], 1)
+        self.assertEqual(self.count(first, second), 2)
+        self.assertEqual(self.count(first, third), 1)
+        self.assertEqual(
+            suggest_partners('customer', [product_key('shop', first.pk)]),
+            [(product_key('shop', second.pk), 2), (product_key('shop', third.pk), 1)],
+        )
+
+    def test_recent_orders_wait_until_settled(self):
+        first, second, _ = self.products
+        self.order('ORD-1', [first, second])
+        recent = self.order('ORD-2', [first, second], settled=False)
+        result = update_bought_together(['customer'])
+        self.assertEqual(result['customer']['items'], 2)
+        self.assertEqual(self.count(first, second), 1)
+
+        CustomerOrder.objects.filter(pk=recent.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        update_bought_together(['customer'])
+        self.assertEqual(self.count(first, second), 2)
+
+    def test_unknown_references_are_left_out(self):
+        first, second, _ = self.products
+        order = self.order('ORD-1', [first])
+        OrderItem.objects.create(
+            order=order, product_id='999', product_name='Deleted product',
+            quantity=1, unit_price=100, total_price=100,
+        )
+        update_bought_together(['customer'])
+        self.assertFalse(ProductPairCount.objects.exists())
+
+        self.order('ORD-2', [first, second])
+        update_bought_together(['customer'])
+        self.assertEqual(self.count(first, second), 1)
+        self.assertEqual(BoughtTogether.objects.filter(stream='customer').count(), 2)
+
+    def test_rebuild_recounts_from_scratch(self):
+        first, second, _ = self.products
+        self.order('ORD-1', [first, second])
+        update_bought_together(['customer'])
+        ProductPairCount.objects.update(count=50)
+
+        update_bought_together(['customer'], rebuild=True)
+        self.assertEqual(self.count(first, second), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CategoryPathTests(TestCase):
+    def setUp(self):
+        self.home = create_category('Home')
+        self.kitchen = create_category('Kitchen', parent=self.home)
+        self.storage = create_category('Storage', parent=self.kitchen)
+        self.jars = create_category('Jars', parent=self.storage)
+        self.garden = create_category('Garden')
+
+    def stored(self, category):
+        return Category.objects.values_list('path', 'depth').get(pk=category.pk)
+
+    def test_new_categories_get_their_path(self):
+        self.assertEqual(self.stored(self.home), (f'{self.home.pk}/', 0))
+        self.assertEqual(
+            self.stored(self.jars),
+            (f'{self.home.pk}/{self.kitchen.pk}/{self.storage.pk}/{self.jars.pk}/', 3),
+        )
+
+    def test_moving_a_category_re_roots_its_descendants(self):
+        self.kitchen.parent = self.garden
+        self.kitchen.save()
+
+        self.assertEqual(self.stored(self.kitchen), (f'{self.garden.pk}/{self.kitchen.pk}/', 1))
+        self.assertEqual(self.stored(self.storage), (f'{self.garden.pk}/{self.kitchen.pk}/{self.storage.pk}/', 2))
+        self.assertEqual(
+            self.stored(self.jars),
+            (f'{self.garden.pk}/{self.kitchen.pk}/{self.storage.pk}/{self.jars.pk}/', 3),
+        )
+        self.assertEqual(self.stored(self.home), (f'{self.home.pk}/', 0))
+
+    def test_moving_to_the_top_level(self):
+        self.storage.parent = None
+        self.storage.save()
+        self.assertEqual(self.stored(self.storage), (f'{self.storage.pk}/', 0))
+        self.assertEqual(self.stored(self.jars), (f'{self.storage.pk}/{self.jars.pk}/', 1))
+
+    def test_a_category_cannot_move_below_itself(self):
+        self.kitchen.parent = self.jars
+        with self.assertRaises(ValueError):
+            self.kitchen.save()
+        self.assertEqual(self.stored(self.jars)[1], 3)
+
+    def test_tree_reloads_after_a_move(self):
+        self.assertCountEqual(
+            get_category_tree().subtree_ids(self.home.pk),
+            [self.home.pk, self.kitchen.pk, self.storage.pk, self.jars.pk],
+        )
+
+        self.kitchen.parent = self.garden
+        self.kitchen.save()
+
+        tree = get_category_tree()
+        self.assertEqual(tree.subtree_ids(self.home.pk), [self.home.pk])
+        self.assertEqual(
+            [crumb['name'] for crumb in tree.breadcrumbs(self.jars.pk)],
+            ['Garden', 'Kitchen', 'Storage', 'Jars'],
+        )
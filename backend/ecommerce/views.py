@@ -1,5 +1,6 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
@@ -19,25 +20,33 @@ from .serializers import (
     PaymentSerializer, ShippingMethodSerializer, OrderTrackingSerializer, EcoImpactSerializer,
     WishlistItemSerializer, AddToWishlistSerializer
 )
+from .bought_together import parse_product_key, product_key, suggest_partners
+from .categories import get_category_tree
+from ecoswitch_backend.response_cache import CachedResponseMixin
 from customers.models import Cart, CartItem, CustomerProfile, CustomerOrder, OrderItem, CustomerWishlist
+from customers.order_refs import parse_product_id
 
 User = get_user_model()
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = (Category,)
 
 
-class BrandViewSet(viewsets.ReadOnlyModelViewSet):
+class BrandViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Brand.objects.filter(is_active=True)
     serializer_class = BrandSerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = (Brand,)
 
 
 class ProductViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Product.objects.filter(is_active=True).select_related('category', 'brand').prefetch_related('images', 'reviews')
+    queryset = Product.objects.filter(is_active=True).select_related(
+        'category', 'brand'
+    ).with_primary_image()
     permission_classes = [permissions.AllowAny]
     
     def get_serializer_class(self):
@@ -47,11 +56,17 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related('images', 'variants', 'reviews__user')
         
-        # Filter by category
+        # Filter by category, including its subcategories
         category = self.request.query_params.get('category')
         if category:
-            queryset = queryset.filter(category__slug=category)
+            node = get_category_tree().get(category)
+            if node is None:
+                queryset = queryset.none()
+            else:
+                queryset = queryset.filter(category_id__in=get_category_tree().subtree_ids(node.id))
         
         # Filter by brand
         brand = self.request.query_params.get('brand')
@@ -79,6 +94,15 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         if is_plastic_free == 'true':
             queryset = queryset.filter(is_plastic_free=True)
         
+        # Filter by average review rating
+        min_rating = self.request.query_params.get('min_rating')
+        if min_rating:
+            try:
+                min_rating = float(min_rating)
+            except ValueError:
+                raise ValidationError({'min_rating': 'Must be a number.'})
+            queryset = queryset.filter(avg_rating__gte=min_rating)
+        
         # Search
         search = self.request.query_params.get('search')
         if search:
@@ -95,7 +119,7 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         elif sort == 'newest':
             queryset = queryset.order_by('-created_at')
         elif sort == 'popular':
-            queryset = queryset.order_by('-reviews__rating')
+            queryset = queryset.order_by('-avg_rating', '-id')
         
         return queryset
     
@@ -176,4 +200,38 @@ class CartViewSet(viewsets.ModelViewSet):
             
             return Response({'message': 'Item added to cart'}, status=status.HTTP_201_CREATED)
         
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def suggestions(self, request):
+        """
+        Products frequently bought together with the cart's items (``?limit=``)
+        
+        Reads the pair counts kept by the update_bought_together command.
+        """
+        customer_profile = get_object_or_404(CustomerProfile, user=request.user)
+        cart, created = Cart.objects.get_or_create(customer=customer_profile)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 8)), 1), 20)
+        except ValueError:
+            limit = 8
+        
+        # Cart items hold ids of shop products
+        product_refs = [
+            product_key('shop', product_id)
+            for product_id in map(parse_product_id, cart.items.values_list('product_id', flat=True))
+            if product_id is not None
+        ]
+        # Over-fetch: partners may since have gone inactive
+        partners = suggest_partners('customer', product_refs, limit=limit * 2)
+        partner_ids = [
+            product[1] for product in (parse_product_key(ref) for ref, _ in partners)
+            if product and product[0] == 'shop'
+        ]
+        products = Product.objects.filter(pk__in=partner_ids, is_active=True).select_related(
+            'category', 'brand'
+        ).with_primary_image().in_bulk()
+        suggested = [products[pk] for pk in partner_ids if pk in products][:limit]
+        
+        serializer = ProductListSerializer(suggested, many=True, context={'request': request})
+        return Response({'results': serializer.data})
\ No newline at end of file
@@ -13,6 +13,7 @@ from .serializers import (
     EcoImpactSerializer, WishlistItemSerializer, AddToWishlistSerializer,
     UpdateCartItemSerializer
 )
+from ecoswitch_backend.response_cache import CachedResponseMixin
 from customers.models import Cart, CartItem, CustomerProfile, CustomerOrder, OrderItem, CustomerWishlist
 from .models import Product
 
@@ -144,16 +145,22 @@ class WishlistViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CouponViewSet(viewsets.ReadOnlyModelViewSet):
+class CouponViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Coupon.objects.filter(is_active=True)
     serializer_class = CouponSerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = (Coupon,)
+    # is_valid depends on the clock as well as the row: never serve an
+    # expired entry
+    cache_timeout = 60
+    cache_stale_timeout = 0
 
 
-class ShippingMethodViewSet(viewsets.ReadOnlyModelViewSet):
+class ShippingMethodViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset = ShippingMethod.objects.filter(is_active=True)
     serializer_class = ShippingMethodSerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = (ShippingMethod,)
 
 
 class EcoImpactViewSet(viewsets.ReadOnlyModelViewSet):
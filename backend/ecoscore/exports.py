@@ -0,0 +1,168 @@
+"""
+Streaming EcoScore exports for partners
+
+Rows are read with ``values()`` and ``iterator(chunk_size=...)`` (a server
+side cursor where the database supports one) and encoded one at a time, so
+memory use does not grow with the size of the catalog.
+
+``calculation_date`` is stamped when a row is written, not when its
+transaction commits, so an export only goes up to a watermark some time
+before it started (``ECOSCORE_EXPORT_WATERMARK_LAG``). A score committed late
+is still newer than that watermark and goes out with the next export.
+"""
+import csv
+import json
+import zlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import EcoScore
+
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_WATERMARK_LAG = 300  # Seconds
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+# Output column -> EcoScore.values() lookup
+EXPORT_COLUMNS = [
+    ('ecoscore_id', 'id'),
+    ('product_id', 'product_id'),
+    ('merchant_product_id', 'merchant_product_id'),
+    ('product_name', None),
+    ('score_grade', 'score_grade'),
+    ('score_value', 'score_value'),
+    ('raw_impact', 'raw_impact'),
+    ('impact_unit', 'impact_unit'),
+    ('normalized_impact', 'normalized_impact'),
+    ('lca_method', 'lca_method'),
+    ('process_code', 'ecoinvent_process__code'),
+    ('process_name', 'ecoinvent_process__name'),
+    ('process_location', 'ecoinvent_process__location'),
+    ('benchmark_category', 'benchmark__category'),
+    ('benchmark_subcategory', 'benchmark__subcategory'),
+    ('benchmark_impact', 'benchmark__benchmark_impact'),
+    ('calculation_date', 'calculation_date'),
+]
+
+NAME_LOOKUPS = ('product__name', 'merchant_product__name')
+
+
+class ExportError(ValueError):
+    """Raised for invalid export parameters"""
+
+
+def parse_watermark(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse a ``since`` watermark (ISO 8601); naive values are taken as UTC
+    """
+    if not value:
+        return None
+
+    parsed = parse_datetime(value.strip())
+    if parsed is None:
+        raise ExportError(f"Invalid watermark {value!r}, expected an ISO 8601 datetime")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def export_watermark(now: Optional[datetime] = None) -> datetime:
+    """Upper bound of an export started ``now``, before which every score has committed"""
+    lag = getattr(settings, 'ECOSCORE_EXPORT_WATERMARK_LAG', DEFAULT_WATERMARK_LAG)
+    return (now or timezone.now()) - timedelta(seconds=lag)
+
+
+def export_queryset(since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """
+    EcoScores calculated in ``(since, until]``, oldest first, as plain dicts
+
+    A recalculation replaces the EcoScore row, so an incremental export
+    picks up every product whose score changed after the watermark.
+    """
+    queryset = EcoScore.objects.all()
+    if since is not None:
+        queryset = queryset.filter(calculation_date__gt=since)
+    if until is not None:
+        queryset = queryset.filter(calculation_date__lte=until)
+
+    lookups = [lookup for column, lookup in EXPORT_COLUMNS if lookup] + list(NAME_LOOKUPS)
+    return queryset.order_by('calculation_date', 'id').values(*lookups)
+
+
+def iter_export_rows(queryset, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict]:
+    """Yield export rows in column order from a ``values()`` queryset"""
+    for values in queryset.iterator(chunk_size=chunk_size):
+        row = {}
+        for column, lookup in EXPORT_COLUMNS:
+            if lookup is None:
+                value = values['product__name'] or values['merchant_product__name'] or ''
+            else:
+                value = values[lookup]
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            row[column] = value
+        yield row
+
+
+class _LineBuffer:
+    """File-like object that hands back what csv.writer writes"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows: Iterable[Dict]) -> Iterator[str]:
+    """Encode rows as CSV lines, header first"""
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow([column for column, lookup in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow([row[column] for column, lookup in EXPORT_COLUMNS])
+
+
+def iter_jsonl(rows: Iterable[Dict]) -> Iterator[str]:
+    """Encode rows as JSON-lines"""
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def iter_gzip(chunks: Iterable[str], level: int = 6) -> Iterator[bytes]:
+    """Gzip a stream of text chunks incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(file_format: str = 'csv', since: Optional[datetime] = None,
+                  until: Optional[datetime] = None, compress: bool = False,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator:
+    """
+    Stream an export as text chunks, or gzip bytes when ``compress`` is set
+
+    Args:
+        file_format: 'csv' or 'jsonl'
+        since: Only scores calculated after this watermark
+        until: Upper bound, normally ``export_watermark()``
+        compress: Gzip the output
+        chunk_size: Rows fetched from the database per round trip
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ExportError(f"Unsupported export format {file_format!r}")
+
+    rows = iter_export_rows(export_queryset(since, until), chunk_size=chunk_size)
+    chunks = iter_csv(rows) if file_format == 'csv' else iter_jsonl(rows)
+    return iter_gzip(chunks) if compress else chunks
+
+
+def export_filename(file_format: str, compress: bool = False, now: Optional[datetime] = None) -> str:
+    """Default download name, e.g. ecoscores-20240101T020000Z.csv.gz"""
+    now = now or timezone.now()
+    name = f"ecoscores-{now.astimezone(dt_timezone.utc):%Y%m%dT%H%M%SZ}.{file_format}"
+    return f"{name}.gz" if compress else name
@@ -0,0 +1,261 @@
+"""
+Bulk import helpers for ecoinvent process catalogs
+"""
+import csv
+import gzip
+import io
+import json
+import logging
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+
+from .models import EcoInventProcess
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+PROCESS_UPDATE_FIELDS = [
+    'name', 'category', 'subcategory', 'unit', 'description',
+    'is_active', 'updated_at'
+]
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n', ''}
+
+
+class ProcessRowError(ValueError):
+    """Raised when a catalog row cannot be turned into an EcoInventProcess"""
+
+    def __init__(self, line_number: int, message: str):
+        self.line_number = line_number
+        super().__init__(f"line {line_number}: {message}")
+
+
+def detect_format(path: str) -> str:
+    """
+    Guess the catalog format from the file name
+    """
+    name = path.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    if name.endswith('.jsonl') or name.endswith('.ndjson') or name.endswith('.json'):
+        return 'jsonl'
+    return 'csv'
+
+
+def open_catalog(path: str):
+    """
+    Open a catalog file as text, transparently decompressing .gz files
+    """
+    if path.lower().endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def iter_catalog_rows(handle, file_format: str) -> Iterator[Tuple[int, Dict]]:
+    """
+    Yield (line_number, raw_row) pairs from an open catalog without
+    loading the whole file into memory
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(handle)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(handle, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, {'__error__': f"invalid JSON ({e})"}
+                continue
+            if not isinstance(row, dict):
+                yield line_number, {'__error__': 'expected a JSON object'}
+                continue
+            yield line_number, row
+    else:
+        raise ValueError(f"Unsupported catalog format: {file_format}")
+
+
+def _parse_bool(value, line_number: int) -> bool:
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return True
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ProcessRowError(line_number, f"invalid is_active value {value!r}")
+
+
+def _clean_text(row: Dict, field_name: str, line_number: int, required: bool = False,
+                default: str = '') -> str:
+    value = row.get(field_name)
+    value = default if value is None else str(value).strip()
+    if required and not value:
+        raise ProcessRowError(line_number, f"missing required field '{field_name}'")
+
+    max_length = EcoInventProcess._meta.get_field(field_name).max_length
+    if max_length and len(value) > max_length:
+        raise ProcessRowError(
+            line_number, f"'{field_name}' is longer than {max_length} characters"
+        )
+    return value
+
+
+def validate_process_row(line_number: int, row: Dict) -> EcoInventProcess:
+    """
+    Validate a raw catalog row and build an unsaved EcoInventProcess
+
+    Raises:
+        ProcessRowError: if the row is malformed
+    """
+    if '__error__' in row:
+        raise ProcessRowError(line_number, row['__error__'])
+
+    return EcoInventProcess(
+        code=_clean_text(row, 'code', line_number, required=True),
+        name=_clean_text(row, 'name', line_number, required=True),
+        category=_clean_text(row, 'category', line_number, required=True),
+        subcategory=_clean_text(row, 'subcategory', line_number),
+        unit=_clean_text(row, 'unit', line_number, required=True),
+        description=_clean_text(row, 'description', line_number),
+        location=_clean_text(row, 'location', line_number, default='GLO') or 'GLO',
+        is_active=_parse_bool(row.get('is_active'), line_number),
+    )
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    """Split an iterable into lists of at most ``size`` items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def upsert_processes(processes: List[EcoInventProcess]) -> Tuple[int, int, List[str]]:
+    """
+    Insert or update a chunk of processes keyed on ``(code, location)``
+
+    Rows sharing a code and location inside the chunk collapse to the last
+    one. Rows whose name already belongs to a different code in the same
+    location are rejected, since ``(name, location)`` is unique as well and
+    would abort the whole statement.
+
+    Returns:
+        Tuple of (created_count, updated_count, rejected_messages)
+    """
+    by_key = {}
+    for process in processes:
+        by_key[(process.code, process.location)] = process
+
+    rejected = []
+    by_name = {}
+    for process in by_key.values():
+        other = by_name.get((process.name, process.location))
+        if other is not None:
+            rejected.append(
+                f"code {process.code} ({process.location}): name '{process.name}' also used by {other.code}"
+            )
+            continue
+        by_name[(process.name, process.location)] = process
+
+    names = {name for name, location in by_name}
+    name_owners = {
+        (name, location): code
+        for name, location, code in EcoInventProcess.objects.filter(
+            name__in=names
+        ).values_list('name', 'location', 'code')
+    }
+    accepted = []
+    for (name, location), process in by_name.items():
+        owner = name_owners.get((name, location))
+        if owner is not None and owner != process.code:
+            rejected.append(f"code {process.code} ({location}): name '{name}' already belongs to {owner}")
+            continue
+        accepted.append(process)
+
+    if not accepted:
+        return 0, 0, rejected
+
+    keys = {(process.code, process.location) for process in accepted}
+    with transaction.atomic():
+        existing = {
+            key for key in EcoInventProcess.objects.filter(
+                code__in={code for code, location in keys}
+            ).values_list('code', 'location')
+            if key in keys
+        }
+        EcoInventProcess.objects.bulk_create(
+            accepted,
+            update_conflicts=True,
+            unique_fields=['code', 'location'],
+            update_fields=PROCESS_UPDATE_FIELDS,
+        )
+
+    updated_count = len(existing)
+    return len(accepted) - updated_count, updated_count, rejected
+
+
+def import_processes(rows: Iterable[Tuple[int, Dict]], batch_size: int = DEFAULT_BATCH_SIZE,
+                     dry_run: bool = False, progress=None) -> Dict[str, object]:
+    """
+    Validate and upsert catalog rows chunk by chunk
+
+    Args:
+        rows: Iterable of (line_number, raw_row) pairs
+        batch_size: Number of rows validated and written per statement
+        dry_run: Validate only, do not write to the database
+        progress: Optional callable receiving the running stats after each chunk
+
+    Returns:
+        Dictionary with processed/created/updated/invalid counts and the
+        first few error messages
+    """
+    stats = {
+        'processed': 0,
+        'created': 0,
+        'updated': 0,
+        'invalid': 0,
+        'errors': [],
+    }
+
+    for chunk in chunked(rows, batch_size):
+        valid = []
+        for line_number, row in chunk:
+            try:
+                valid.append(validate_process_row(line_number, row))
+            except ProcessRowError as e:
+                stats['invalid'] += 1
+                _record_error(stats, str(e))
+
+        stats['processed'] += len(chunk)
+
+        if valid and not dry_run:
+            created, updated, rejected = upsert_processes(valid)
+            stats['created'] += created
+            stats['updated'] += updated
+            stats['invalid'] += len(rejected)
+            for message in rejected:
+                _record_error(stats, message)
+
+        if progress:
+            progress(stats)
+
+    return stats
+
+
+def _record_error(stats: Dict, message: str, limit: int = 20):
+    if len(stats['errors']) < limit:
+        stats['errors'].append(message)
+    logger.info(f"Skipping ecoinvent catalog row: {message}")
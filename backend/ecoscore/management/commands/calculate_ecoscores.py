@@ -8,6 +8,8 @@ from merchants.models import MerchantProduct
 from ecoscore.models import EcoInventProcess, ProductEcoMapping
 from ecoscore.services import EcoScoreCalculationService
 from ecoscore.mapping_data import get_ecoinvent_mapping
+from ecoscore.regions import GLOBAL_LOCATION, location_for_product
+from ecoscore.signatures import product_attributes, signature_for_product
 
 
 class Command(BaseCommand):
@@ -44,6 +46,7 @@ class Command(BaseCommand):
         self.stdout.write('Starting EcoScore calculation...')
         
         calculation_service = EcoScoreCalculationService()
+        self.signature_cache = calculation_service.signature_cache
         processed_count = 0
         success_count = 0
         error_count = 0
@@ -89,8 +92,8 @@ class Command(BaseCommand):
             
             # Handle category filter
             elif category:
-                products = Product.objects.filter(category__name__icontains=category)
-                merchant_products = MerchantProduct.objects.filter(category__icontains=category)
+                products = Product.objects.filter(category__name__icontains=category).select_related('category', 'subcategory')
+                merchant_products = MerchantProduct.objects.filter(category__icontains=category).select_related('merchant')
                 
                 self.stdout.write(f'Processing {products.count()} products and {merchant_products.count()} merchant products in category "{category}"')
                 
@@ -105,7 +108,7 @@ class Command(BaseCommand):
                         error_count += 1
                     processed_count += 1
                 
-                for merchant_product in merchant_products:
+                for merchant_product in self._group_by_location(merchant_products):
                     try:
                         self._process_merchant_product(merchant_product, calculation_service, force)
                         success_count += 1
@@ -118,8 +121,8 @@ class Command(BaseCommand):
             
             # Process all products
             else:
-                products = Product.objects.all()
-                merchant_products = MerchantProduct.objects.all()
+                products = Product.objects.select_related('category', 'subcategory')
+                merchant_products = MerchantProduct.objects.select_related('merchant')
                 
                 self.stdout.write(f'Processing {products.count()} products and {merchant_products.count()} merchant products')
                 
@@ -137,7 +140,7 @@ class Command(BaseCommand):
                     if processed_count % 10 == 0:
                         self.stdout.write(f'Processed {processed_count} products...')
                 
-                for merchant_product in merchant_products:
+                for merchant_product in self._group_by_location(merchant_products):
                     try:
                         self._process_merchant_product(merchant_product, calculation_service, force)
                         success_count += 1
@@ -163,6 +166,10 @@ class Command(BaseCommand):
         self.stdout.write(f'Total processed: {processed_count}')
         self.stdout.write(f'Successful: {success_count}')
         self.stdout.write(f'Errors: {error_count}')
+        self.stdout.write(
+            f'Distinct attribute signatures: {len(self.signature_cache)} '
+            f'({self.signature_cache.hits} shared lookups reused)'
+        )
         
         if error_count > 0:
             self.stdout.write(
@@ -207,37 +214,72 @@ class Command(BaseCommand):
                 self.style.WARNING(f'⚠ Could not calculate EcoScore for merchant product "{merchant_product.name}"')
             )
     
+    def _group_by_location(self, merchant_products):
+        """
+        Yield merchant products one location after the other so each
+        regional process variant is resolved and solved once per run
+        """
+        groups = {}
+        for merchant_product in merchant_products:
+            groups.setdefault(location_for_product(merchant_product), []).append(merchant_product)
+        
+        for location in sorted(groups):
+            self.stdout.write(f'Location {location}: {len(groups[location])} merchant products')
+            yield from groups[location]
+    
+    def _resolve_ecoinvent_process(self, signature, attributes, product_name):
+        """Resolve the ecoinvent process once per attribute signature"""
+        return self.signature_cache.resolve(
+            signature, 'process',
+            lambda: self._lookup_ecoinvent_process(signature, attributes, product_name)
+        )
+    
+    def _lookup_ecoinvent_process(self, signature, attributes, product_name):
+        """Find the ecoinvent process for a signature not seen in this run"""
+        # Reuse the mapping of an equivalent product from an earlier run;
+        # signatures include the rules version, so rule edits are not bypassed.
+        # Mappings older than signatures have none and are never shared, nor
+        # are manual overrides, which belong to their own product.
+        shared_mapping = ProductEcoMapping.objects.filter(
+            attribute_signature=signature, is_manual_override=False
+        ).select_related('ecoinvent_process').first()
+        if shared_mapping:
+            return shared_mapping.ecoinvent_process
+        
+        # Get ecoinvent mapping data
+        mapping_data = get_ecoinvent_mapping(**attributes)
+        if not mapping_data:
+            return None
+        
+        # Get or create ecoinvent process
+        ecoinvent_process, created = EcoInventProcess.objects.get_or_create(
+            code=mapping_data['code'],
+            location=GLOBAL_LOCATION,
+            defaults={
+                'name': mapping_data['name'],
+                'category': mapping_data['category'],
+                'subcategory': mapping_data.get('subcategory', ''),
+                'unit': mapping_data['unit'],
+                'description': f"Auto-created for {product_name}",
+                'is_active': True
+            }
+        )
+        return ecoinvent_process
+    
     def _create_product_mapping(self, product):
         """Create ecoinvent mapping for a Product"""
         try:
-            # Get ecoinvent mapping data
-            mapping_data = get_ecoinvent_mapping(
-                product_name=product.name,
-                category=product.category.name,
-                subcategory=product.subcategory.name if product.subcategory else '',
-                tags=product.tags or [],
-                is_eco_friendly=product.is_eco_friendly
+            signature = signature_for_product(product)
+            ecoinvent_process = self._resolve_ecoinvent_process(
+                signature, product_attributes(product), product.name
             )
             
-            if not mapping_data:
+            if not ecoinvent_process:
                 self.stdout.write(
                     self.style.WARNING(f'No ecoinvent mapping found for product "{product.name}"')
                 )
                 return
             
-            # Get or create ecoinvent process
-            ecoinvent_process, created = EcoInventProcess.objects.get_or_create(
-                code=mapping_data['code'],
-                defaults={
-                    'name': mapping_data['name'],
-                    'category': mapping_data['category'],
-                    'subcategory': mapping_data.get('subcategory', ''),
-                    'unit': mapping_data['unit'],
-                    'description': f"Auto-created for {product.name}",
-                    'is_active': True
-                }
-            )
-            
             # Create product mapping
             ProductEcoMapping.objects.create(
                 product=product,
@@ -245,6 +287,7 @@ class Command(BaseCommand):
                 mapping_confidence=0.8,  # Default confidence
                 functional_unit='per item',
                 functional_unit_value=1.0,
+                attribute_signature=signature,
                 mapping_notes=f"Auto-mapped based on product category and attributes"
             )
             
@@ -258,34 +301,17 @@ class Command(BaseCommand):
     def _create_merchant_product_mapping(self, merchant_product):
         """Create ecoinvent mapping for a MerchantProduct"""
         try:
-            # Get ecoinvent mapping data
-            mapping_data = get_ecoinvent_mapping(
-                product_name=merchant_product.name,
-                category=merchant_product.category,
-                subcategory=merchant_product.subcategory or '',
-                tags=merchant_product.tags or [],
-                is_eco_friendly=merchant_product.is_eco_friendly
+            signature = signature_for_product(merchant_product)
+            ecoinvent_process = self._resolve_ecoinvent_process(
+                signature, product_attributes(merchant_product), merchant_product.name
             )
             
-            if not mapping_data:
+            if not ecoinvent_process:
                 self.stdout.write(
                     self.style.WARNING(f'No ecoinvent mapping found for merchant product "{merchant_product.name}"')
                 )
                 return
             
-            # Get or create ecoinvent process
-            ecoinvent_process, created = EcoInventProcess.objects.get_or_create(
-                code=mapping_data['code'],
-                defaults={
-                    'name': mapping_data['name'],
-                    'category': mapping_data['category'],
-                    'subcategory': mapping_data.get('subcategory', ''),
-                    'unit': mapping_data['unit'],
-                    'description': f"Auto-created for {merchant_product.name}",
-                    'is_active': True
-                }
-            )
-            
             # Create product mapping
             ProductEcoMapping.objects.create(
                 merchant_product=merchant_product,
@@ -293,6 +319,7 @@ class Command(BaseCommand):
                 mapping_confidence=0.8,  # Default confidence
                 functional_unit='per item',
                 functional_unit_value=1.0,
+                attribute_signature=signature,
                 mapping_notes=f"Auto-mapped based on product category and attributes"
             )
             
@@ -0,0 +1,39 @@
+"""
+Management command to validate (and optionally version-bump) the mapping rules
+"""
+from django.core.management.base import BaseCommand, CommandError
+from ecoscore.rule_store import MappingRulesError, bump_rules_version, load_matcher, rule_store
+
+
+class Command(BaseCommand):
+    help = 'Validate the ecoinvent mapping rule document and optionally bump its version'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bump',
+            action='store_true',
+            help='Increment the version counter so running workers reload the rules',
+        )
+
+    def handle(self, *args, **options):
+        path = rule_store.path
+        self.stdout.write(f'Checking mapping rules at {path}...')
+
+        try:
+            matcher = load_matcher(path)
+        except (OSError, MappingRulesError) as e:
+            raise CommandError(f'Invalid mapping rules: {e}')
+
+        process_count = sum(1 for _ in matcher.process_entries())
+        self.stdout.write(
+            f'Version {matcher.version}: {len(matcher.category_rules)} category rules, '
+            f'{process_count} ecoinvent processes'
+        )
+
+        if options['bump']:
+            new_version = bump_rules_version(path)
+            self.stdout.write(
+                self.style.SUCCESS(f'Bumped mapping rules to version {new_version}')
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS('Mapping rules are valid'))
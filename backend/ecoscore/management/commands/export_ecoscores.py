@@ -0,0 +1,111 @@
+"""
+Management command to export EcoScores as CSV or JSON-lines for partners
+"""
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from ecoscore.exports import (
+    DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, ExportError, export_watermark, parse_watermark, stream_export
+)
+
+
+class Command(BaseCommand):
+    help = 'Stream every EcoScore (grade, score, impact, process, benchmark) to a CSV or JSON-lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output',
+            type=str,
+            help='Output file path, or - for stdout (a .gz suffix enables compression)',
+        )
+        parser.add_argument(
+            '--format',
+            choices=EXPORT_FORMATS,
+            help='Export format (detected from the file extension by default, csv otherwise)',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Gzip the output',
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Only export scores calculated after this ISO 8601 datetime',
+        )
+        parser.add_argument(
+            '--watermark-file',
+            type=str,
+            help='File holding the last export watermark; read as --since and updated on success',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Rows fetched from the database per round trip (default {DEFAULT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        output = options['output']
+        compress = options['gzip'] or output.lower().endswith('.gz')
+        file_format = options.get('format') or self._detect_format(output)
+        watermark_file = options.get('watermark_file')
+
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be a positive integer')
+
+        since_value = options.get('since')
+        if not since_value and watermark_file and os.path.exists(watermark_file):
+            with open(watermark_file, 'r', encoding='utf-8') as handle:
+                since_value = handle.read().strip()
+
+        try:
+            since = parse_watermark(since_value)
+            watermark = export_watermark()
+            chunks = stream_export(
+                file_format, since=since, until=watermark,
+                compress=compress, chunk_size=options['chunk_size'],
+            )
+        except ExportError as e:
+            raise CommandError(str(e))
+
+        # Progress goes to stderr so stdout can carry the export itself
+        self.stderr.write(
+            f'Exporting EcoScores ({file_format}{", gzip" if compress else ""})'
+            f'{f" since {since.isoformat()}" if since else ""}...'
+        )
+
+        if output == '-':
+            stream = sys.stdout.buffer
+            written = self._write(stream, chunks, compress)
+            stream.flush()
+        else:
+            tmp_path = f'{output}.part'
+            with open(tmp_path, 'wb') as stream:
+                written = self._write(stream, chunks, compress)
+            os.replace(tmp_path, output)
+
+        if watermark_file:
+            with open(watermark_file, 'w', encoding='utf-8') as handle:
+                handle.write(watermark.isoformat() + '\n')
+
+        self.stderr.write(
+            self.style.SUCCESS(f'Exported {written} bytes; watermark {watermark.isoformat()}')
+        )
+
+    def _write(self, stream, chunks, compress):
+        written = 0
+        for chunk in chunks:
+            data = chunk if compress else chunk.encode('utf-8')
+            stream.write(data)
+            written += len(data)
+        return written
+
+    def _detect_format(self, output):
+        name = output.lower()
+        if name.endswith('.gz'):
+            name = name[:-3]
+        if name.endswith('.jsonl') or name.endswith('.ndjson'):
+            return 'jsonl'
+        return 'csv'
@@ -0,0 +1,87 @@
+"""
+Management command to import an ecoinvent process catalog from CSV or JSON-lines
+"""
+from django.core.management.base import BaseCommand, CommandError
+from ecoscore.importers import (
+    DEFAULT_BATCH_SIZE, detect_format, open_catalog, iter_catalog_rows, import_processes
+)
+
+
+class Command(BaseCommand):
+    help = 'Stream an ecoinvent process catalog (CSV or JSON-lines) and upsert it on code and location'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            type=str,
+            help='Path to the catalog file (.csv, .jsonl, optionally .gz compressed)',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='Catalog format (detected from the file extension by default)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Rows validated and written per batch (default {DEFAULT_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the catalog without writing to the database',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options.get('format') or detect_format(path)
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        if batch_size < 1:
+            raise CommandError('--batch-size must be a positive integer')
+
+        self.stdout.write(
+            f'Importing ecoinvent processes from {path} ({file_format})'
+            f'{" [dry run]" if dry_run else ""}...'
+        )
+
+        try:
+            handle = open_catalog(path)
+        except OSError as e:
+            raise CommandError(f'Could not open {path}: {e}')
+
+        with handle:
+            stats = import_processes(
+                iter_catalog_rows(handle, file_format),
+                batch_size=batch_size,
+                dry_run=dry_run,
+                progress=self._report_progress,
+            )
+
+        # Summary
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write('Ecoinvent Import Summary:')
+        self.stdout.write(f'Rows processed: {stats["processed"]}')
+        self.stdout.write(f'Created: {stats["created"]}')
+        self.stdout.write(f'Updated: {stats["updated"]}')
+        self.stdout.write(f'Invalid: {stats["invalid"]}')
+
+        for message in stats['errors']:
+            self.stdout.write(self.style.WARNING(f'  {message}'))
+
+        if stats['invalid'] > 0:
+            self.stdout.write(
+                self.style.WARNING(f'Completed with {stats["invalid"]} invalid rows')
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS('Ecoinvent import completed successfully!')
+            )
+
+    def _report_progress(self, stats):
+        self.stdout.write(
+            f'Processed {stats["processed"]} rows '
+            f'({stats["created"]} created, {stats["updated"]} updated, {stats["invalid"]} invalid)...'
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecoscore', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productecomapping',
+            name='attribute_signature',
+            field=models.CharField(blank=True, db_index=True, help_text='Normalized attribute hash shared by equivalent products', max_length=40),
+        ),
+    ]
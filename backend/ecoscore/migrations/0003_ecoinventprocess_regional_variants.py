@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecoscore', '0002_productecomapping_attribute_signature'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ecoinventprocess',
+            name='code',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='ecoinventprocess',
+            name='name',
+            field=models.CharField(max_length=200),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ecoinventprocess',
+            unique_together={('code', 'location'), ('name', 'location')},
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecoscore', '0003_ecoinventprocess_regional_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ecoscore',
+            index=models.Index(fields=['calculation_date', 'id'], name='ecoscore_calc_date_id_idx'),
+        ),
+    ]
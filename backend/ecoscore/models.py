@@ -3,18 +3,20 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from products.models import Product
 from merchants.models import MerchantProduct
 
+from ecoswitch_backend.query_cache import CachedQuerySet
+
 
 class EcoInventProcess(models.Model):
     """
     Ecoinvent database process mapping
     """
-    name = models.CharField(max_length=200, unique=True)
-    code = models.CharField(max_length=100, unique=True)
+    name = models.CharField(max_length=200)
+    code = models.CharField(max_length=100, db_index=True)
     category = models.CharField(max_length=100)
     subcategory = models.CharField(max_length=100, blank=True)
     unit = models.CharField(max_length=50)
     description = models.TextField(blank=True)
-    location = models.CharField(max_length=100, default='GLO')  # Global
+    location = models.CharField(max_length=100, default='GLO')  # Global, or a regional code such as IN / IN-MH
     is_active = models.BooleanField(default=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
@@ -22,10 +24,17 @@ class EcoInventProcess(models.Model):
     
     class Meta:
         ordering = ['category', 'name']
+        # Regional variants share the code of their global process
+        unique_together = [
+            ['code', 'location'],
+            ['name', 'location'],
+        ]
         verbose_name = 'Ecoinvent Process'
         verbose_name_plural = 'Ecoinvent Processes'
     
     def __str__(self):
+        if self.location and self.location != 'GLO':
+            return f"{self.name} ({self.code}, {self.location})"
         return f"{self.name} ({self.code})"
 
 
@@ -43,6 +52,10 @@ class ProductEcoMapping(models.Model):
         help_text="Confidence level of the mapping (0.0 to 1.0)"
     )
     mapping_notes = models.TextField(blank=True, help_text="Notes about the mapping decision")
+    attribute_signature = models.CharField(
+        max_length=40, blank=True, db_index=True,
+        help_text="Normalized attribute hash shared by equivalent products"
+    )
     functional_unit = models.CharField(max_length=100, help_text="e.g., 'per kg', 'per item', 'per use'")
     functional_unit_value = models.FloatField(help_text="Value of the functional unit")
     
@@ -85,6 +98,8 @@ class EcoScoreBenchmark(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CachedQuerySet.as_manager()
+    
     class Meta:
         ordering = ['category', 'subcategory']
     
@@ -137,6 +152,10 @@ class EcoScore(models.Model):
             ['merchant_product', 'calculation_version']
         ]
         ordering = ['-calculation_date']
+        indexes = [
+            # Incremental exports walk (calculation_date, id) from a watermark
+            models.Index(fields=['calculation_date', 'id'], name='ecoscore_calc_date_id_idx'),
+        ]
     
     def __str__(self):
         product_name = self.product.name if self.product else self.merchant_product.name
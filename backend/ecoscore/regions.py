@@ -0,0 +1,111 @@
+"""
+Location codes used to pick regional ecoinvent process variants
+
+Ecoinvent tags datasets with ISO 3166 locations (``IN``, ``IN-MH`` …) and
+``GLO`` for the global average. Merchants record their state as free text,
+so it is normalized here before looking up variants.
+"""
+from typing import List, Optional
+
+
+GLOBAL_LOCATION = 'GLO'
+COUNTRY_LOCATION = 'IN'
+
+INDIAN_STATE_CODES = {
+    'andaman and nicobar islands': 'IN-AN',
+    'andhra pradesh': 'IN-AP',
+    'arunachal pradesh': 'IN-AR',
+    'assam': 'IN-AS',
+    'bihar': 'IN-BR',
+    'chandigarh': 'IN-CH',
+    'chhattisgarh': 'IN-CT',
+    'dadra and nagar haveli and daman and diu': 'IN-DH',
+    'delhi': 'IN-DL',
+    'goa': 'IN-GA',
+    'gujarat': 'IN-GJ',
+    'haryana': 'IN-HR',
+    'himachal pradesh': 'IN-HP',
+    'jammu and kashmir': 'IN-JK',
+    'jharkhand': 'IN-JH',
+    'karnataka': 'IN-KA',
+    'kerala': 'IN-KL',
+    'ladakh': 'IN-LA',
+    'lakshadweep': 'IN-LD',
+    'madhya pradesh': 'IN-MP',
+    'maharashtra': 'IN-MH',
+    'manipur': 'IN-MN',
+    'meghalaya': 'IN-ML',
+    'mizoram': 'IN-MZ',
+    'nagaland': 'IN-NL',
+    'odisha': 'IN-OR',
+    'puducherry': 'IN-PY',
+    'punjab': 'IN-PB',
+    'rajasthan': 'IN-RJ',
+    'sikkim': 'IN-SK',
+    'tamil nadu': 'IN-TN',
+    'telangana': 'IN-TG',
+    'tripura': 'IN-TR',
+    'uttar pradesh': 'IN-UP',
+    'uttarakhand': 'IN-UT',
+    'west bengal': 'IN-WB',
+}
+
+STATE_ALIASES = {
+    'new delhi': 'delhi',
+    'nct of delhi': 'delhi',
+    'orissa': 'odisha',
+    'pondicherry': 'puducherry',
+    'uttaranchal': 'uttarakhand',
+}
+
+
+def location_for_state(state: Optional[str]) -> Optional[str]:
+    """
+    Ecoinvent location code for an Indian state name or code
+
+    Returns:
+        Code such as ``IN-MH``, or None if the state is unknown
+    """
+    if not state:
+        return None
+
+    text = ' '.join(state.replace('&', 'and').lower().split())
+    if text.upper() in INDIAN_STATE_CODES.values():
+        return text.upper()
+    if text.upper().startswith('IN-'):
+        return None
+
+    text = STATE_ALIASES.get(text, text)
+    return INDIAN_STATE_CODES.get(text)
+
+
+def location_candidates(location: Optional[str]) -> List[str]:
+    """
+    Locations to try for a regional lookup, most specific first
+
+    ``IN-MH`` resolves to ``['IN-MH', 'IN', 'GLO']``; anything unknown to ``['GLO']``.
+    """
+    if not location or location == GLOBAL_LOCATION:
+        return [GLOBAL_LOCATION]
+
+    candidates = [location]
+    if '-' in location:
+        country = location.split('-', 1)[0]
+        candidates.append(country)
+    candidates.append(GLOBAL_LOCATION)
+    return candidates
+
+
+def location_for_product(product) -> str:
+    """
+    Location of a Product or MerchantProduct
+
+    Catalog products are not tied to a merchant and use the global average,
+    as do merchants outside India.
+    """
+    merchant = getattr(product, 'merchant', None)
+    if merchant is None:
+        return GLOBAL_LOCATION
+    if (merchant.country or 'India').strip().lower() not in ('india', 'in'):
+        return GLOBAL_LOCATION
+    return location_for_state(merchant.state) or COUNTRY_LOCATION
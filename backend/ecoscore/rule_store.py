@@ -0,0 +1,229 @@
+"""
+Versioned on-disk store for ecoinvent mapping rules
+
+The rules live in a JSON document (``ecoscore/data/mapping_rules.json`` by
+default) instead of Python module globals. They are read and compiled into a
+``CompiledMatcher`` on first use, and every worker re-checks the file at most
+once per ``ECOSCORE_MAPPING_RULES_CHECK_INTERVAL`` seconds, swapping in a new
+matcher when the document's ``version`` counter changes.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_RULES_PATH = Path(__file__).resolve().parent / 'data' / 'mapping_rules.json'
+DEFAULT_CHECK_INTERVAL = 5.0
+VERSION_PATTERN = re.compile(r'"version"\s*:\s*\d+')
+
+
+class MappingRulesError(ValueError):
+    """Raised when a mapping rule document is malformed"""
+
+
+def group_key_for_category(category_name: str) -> str:
+    """Ecoinvent mapping group used for a matched rule category"""
+    return category_name.lower().replace(' & ', '_').replace(' ', '_')
+
+
+class CompiledMatcher:
+    """
+    Immutable, pre-lowercased form of a mapping rule document
+    """
+
+    def __init__(self, document: Dict):
+        try:
+            self.version = int(document['version'])
+            self.ecoinvent_mappings = document['ecoinvent_mappings']
+            self.category_rules = document['category_rules']
+            self.eco_friendly_impact_factor = float(document.get('eco_friendly_impact_factor', 1.0))
+
+            self._name_rules = tuple(
+                (
+                    tuple(keyword.lower() for keyword in rule['keywords']),
+                    self.ecoinvent_mappings[rule['group']][rule['mapping']],
+                )
+                for rule in document.get('name_rules', [])
+            )
+
+            self._category_rules = tuple(
+                (
+                    tuple(keyword.lower() for keyword in rule['keywords']),
+                    rule['default_mapping'],
+                    tuple((key.lower(), value) for key, value in rule['subcategory_mappings'].items()),
+                    self.ecoinvent_mappings.get(group_key_for_category(name)),
+                )
+                for name, rule in self.category_rules.items()
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise MappingRulesError(f"Invalid mapping rule document: {e!r}")
+
+    def process_entries(self):
+        """Yield (group, mapping_key, data) for every ecoinvent process in the rules"""
+        for group, mappings in self.ecoinvent_mappings.items():
+            for mapping_key, data in mappings.items():
+                yield group, mapping_key, data
+
+    def match(self, product_name: str, category: str, subcategory: str = '',
+              tags: Optional[List[str]] = None, is_eco_friendly: bool = True) -> Optional[Dict]:
+        """
+        Resolve product attributes to ecoinvent mapping data
+
+        Returns:
+            A copy of the ecoinvent mapping data or None
+        """
+        product_name_lower = product_name.lower()
+        category_lower = category.lower()
+        subcategory_lower = (subcategory or '').lower()
+        tags_lower = [tag.lower() for tag in (tags or [])]
+
+        # Direct product name matching first
+        for keywords, data in self._name_rules:
+            if all(keyword in product_name_lower for keyword in keywords):
+                return dict(data)
+
+        # Find matching category
+        for keywords, default_mapping, subcategory_mappings, group in self._category_rules:
+            if any(keyword in category_lower for keyword in keywords):
+                break
+        else:
+            return None
+
+        mapping_key = default_mapping
+        for sub_key, map_key in subcategory_mappings:
+            if (sub_key in subcategory_lower or
+                    sub_key in product_name_lower or
+                    any(sub_key in tag for tag in tags_lower)):
+                mapping_key = map_key
+                break
+
+        if not group or mapping_key not in group:
+            return None
+
+        ecoinvent_data = dict(group[mapping_key])
+
+        # Adjust for eco-friendly products
+        if is_eco_friendly and 'organic' not in mapping_key and 'eco' not in mapping_key:
+            ecoinvent_data['default_impact'] *= self.eco_friendly_impact_factor
+
+        return ecoinvent_data
+
+
+class MappingRuleStore:
+    """
+    Lazily loads the rule document and hot-reloads it on version changes
+    """
+
+    def __init__(self, path=None, check_interval: Optional[float] = None):
+        self._path = path
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._matcher: Optional[CompiledMatcher] = None
+        self._file_stamp: Optional[Tuple[int, int]] = None
+        self._next_check = 0.0
+
+    @property
+    def path(self) -> Path:
+        return Path(self._path or getattr(settings, 'ECOSCORE_MAPPING_RULES_PATH', DEFAULT_RULES_PATH))
+
+    @property
+    def check_interval(self) -> float:
+        if self._check_interval is not None:
+            return self._check_interval
+        return float(getattr(settings, 'ECOSCORE_MAPPING_RULES_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL))
+
+    def get_matcher(self) -> CompiledMatcher:
+        """Return the current matcher, loading or reloading it when needed"""
+        matcher = self._matcher
+        if matcher is not None and time.monotonic() < self._next_check:
+            return matcher
+
+        with self._lock:
+            if self._matcher is None or time.monotonic() >= self._next_check:
+                self._refresh()
+            return self._matcher
+
+    def reload(self) -> CompiledMatcher:
+        """Force a re-read of the rule document"""
+        with self._lock:
+            self._file_stamp = None
+            self._refresh(force=True)
+            return self._matcher
+
+    def _refresh(self, force: bool = False):
+        self._next_check = time.monotonic() + self.check_interval
+        path = self.path
+
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            if self._matcher is None:
+                raise MappingRulesError(f"Mapping rules not found at {path}: {e}")
+            logger.error(f"Mapping rules at {path} are unavailable, keeping version {self._matcher.version}: {e}")
+            return
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._file_stamp and self._matcher is not None:
+            return
+
+        try:
+            matcher = load_matcher(path)
+        except (OSError, MappingRulesError) as e:
+            if self._matcher is None:
+                raise
+            logger.error(f"Could not reload mapping rules from {path}, keeping version {self._matcher.version}: {e}")
+            return
+
+        self._file_stamp = stamp
+        if force or self._matcher is None or matcher.version != self._matcher.version:
+            if self._matcher is not None:
+                logger.info(f"Reloaded mapping rules: version {self._matcher.version} -> {matcher.version}")
+            self._matcher = matcher
+
+
+def read_rules_document(path) -> Dict:
+    """Read the raw rule document"""
+    with open(path, 'r', encoding='utf-8') as handle:
+        try:
+            return json.load(handle)
+        except ValueError as e:
+            raise MappingRulesError(f"Invalid JSON in {path}: {e}")
+
+
+def bump_rules_version(path) -> int:
+    """
+    Increment the document's version counter in place, keeping its layout
+
+    Returns:
+        The new version number
+    """
+    with open(path, 'r', encoding='utf-8') as handle:
+        text = handle.read()
+
+    new_version = int(json.loads(text)['version']) + 1
+    text, count = VERSION_PATTERN.subn(f'"version": {new_version}', text, count=1)
+    if not count:
+        raise MappingRulesError(f"No version counter found in {path}")
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as handle:
+        handle.write(text)
+    os.replace(tmp_path, path)
+    return new_version
+
+
+def load_matcher(path) -> CompiledMatcher:
+    """Read and compile the rule document at ``path``"""
+    return CompiledMatcher(read_rules_document(path))
+
+
+rule_store = MappingRuleStore()
@@ -2,7 +2,7 @@
 EcoScore calculation services using Brightway2 and ecoinvent data
 """
 import logging
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, List, Tuple
 from decimal import Decimal
 from django.utils import timezone
 from django.db import transaction
@@ -11,11 +11,22 @@ from .models import (
     EcoInventProcess, ProductEcoMapping, EcoScoreBenchmark, 
     EcoScore, EcoScoreHistory
 )
+from .regions import GLOBAL_LOCATION, location_candidates, location_for_product
+from .signatures import SignatureCache, signature_for_product
+from ecoswitch_backend.versions import bump_version
 from products.models import Product
 from merchants.models import MerchantProduct
 
 logger = logging.getLogger(__name__)
 
+# Part of the cached EcoScore stats' key; every calculation retires them
+STATS_VERSION_KEY = 'ecoscore:stats:version'
+
+
+def bump_stats_version():
+    """Retire the cached EcoScore stats"""
+    bump_version(STATS_VERSION_KEY)
+
 
 class LCACalculationService:
     """
@@ -25,18 +36,27 @@ class LCACalculationService:
     def __init__(self):
         self.method = ('IPCC 2013', 'climate change', 'GWP 100a')
         self.database_name = 'ecoinvent 3.9'
+        # Scores per functional unit keyed by (code, location, method);
+        # LCA results scale linearly with the functional unit
+        self._unit_impacts: Dict[Tuple[str, str, Tuple[str, ...]], float] = {}
         
-    def calculate_impact(self, ecoinvent_code: str, functional_unit: float = 1.0) -> float:
+    def calculate_impact(self, ecoinvent_code: str, functional_unit: float = 1.0,
+                         location: str = GLOBAL_LOCATION) -> float:
         """
         Calculate environmental impact for a given ecoinvent process
         
         Args:
             ecoinvent_code: Ecoinvent process code
             functional_unit: Functional unit multiplier
+            location: Ecoinvent location of the process variant (GLO, IN, IN-MH ...)
             
         Returns:
             Impact value in kg CO2-eq
         """
+        key = (ecoinvent_code, location, self.method)
+        if key in self._unit_impacts:
+            return self._unit_impacts[key] * functional_unit
+        
         try:
             # Import brightway2 components
             from brightway2 import Database, LCA
@@ -45,27 +65,53 @@ class LCACalculationService:
             db = Database(self.database_name)
             
             # Get the process
-            process = db.get(ecoinvent_code)
+            process = self._get_activity(db, ecoinvent_code, location)
             if not process:
-                logger.error(f"Process {ecoinvent_code} not found in {self.database_name}")
-                return 0.0
-            
-            # Create LCA calculation
-            lca = LCA({process: functional_unit}, self.method)
-            lca.lci()  # Life Cycle Inventory
-            lca.lcia()  # Life Cycle Impact Assessment
-            
-            return float(lca.score)
+                logger.error(f"Process {ecoinvent_code} ({location}) not found in {self.database_name}")
+                unit_impact = 0.0
+            else:
+                # Create LCA calculation
+                lca = LCA({process: 1.0}, self.method)
+                lca.lci()  # Life Cycle Inventory
+                lca.lcia()  # Life Cycle Impact Assessment
+                unit_impact = float(lca.score)
             
         except Exception as e:
-            logger.error(f"Error calculating impact for {ecoinvent_code}: {str(e)}")
-            return 0.0
+            logger.error(f"Error calculating impact for {ecoinvent_code} ({location}): {str(e)}")
+            unit_impact = 0.0
+        
+        self._unit_impacts[key] = unit_impact
+        return unit_impact * functional_unit
     
-    def get_impact_with_fallback(self, ecoinvent_code: str, functional_unit: float = 1.0) -> float:
+    def _get_activity(self, db, ecoinvent_code: str, location: str):
+        """
+        Find the brightway activity for a process code in a location
+        
+        Regional datasets carry the same name as the global one and differ
+        by their location field.
+        """
+        process = db.get(ecoinvent_code)
+        if not process or location == GLOBAL_LOCATION or process.get('location') == location:
+            return process
+        
+        for candidate in db.search(process['name'], filter={'location': location}, limit=25):
+            if candidate['name'] == process['name'] and candidate.get('location') == location:
+                return candidate
+        return None
+    
+    def get_impact_with_fallback(self, ecoinvent_code: str, functional_unit: float = 1.0,
+                                 locations: Optional[List[str]] = None) -> float:
         """
         Get impact with fallback to default values if calculation fails
+        
+        ``locations`` are tried in order (e.g. IN-MH, IN, GLO) before
+        falling back to the default values.
         """
-        impact = self.calculate_impact(ecoinvent_code, functional_unit)
+        impact = 0.0
+        for location in locations or [GLOBAL_LOCATION]:
+            impact = self.calculate_impact(ecoinvent_code, functional_unit, location)
+            if impact != 0.0:
+                break
         
         # Fallback values based on product type (in kg CO2-eq)
         fallback_impacts = {
@@ -96,8 +142,36 @@ class EcoScoreCalculationService:
     Service for calculating and normalizing EcoScores
     """
     
-    def __init__(self):
+    def __init__(self, signature_cache: Optional[SignatureCache] = None):
         self.lca_service = LCACalculationService()
+        self.signature_cache = signature_cache if signature_cache is not None else SignatureCache()
+        self._process_variants: Dict[Tuple[str, str], EcoInventProcess] = {}
+    
+    def resolve_process_variant(self, process: EcoInventProcess, location: str) -> EcoInventProcess:
+        """
+        Pick the most specific active variant of a process for a location
+        
+        Args:
+            process: Mapped (usually global) ecoinvent process
+            location: Location of the product, e.g. IN-MH
+            
+        Returns:
+            The IN-MH, IN or GLO variant sharing the process code, or the
+            mapped process itself when no variant exists
+        """
+        key = (process.code, location)
+        if key not in self._process_variants:
+            candidates = location_candidates(location)
+            variants = {
+                variant.location: variant
+                for variant in EcoInventProcess.objects.filter(
+                    code=process.code, location__in=candidates, is_active=True
+                )
+            }
+            self._process_variants[key] = next(
+                (variants[candidate] for candidate in candidates if candidate in variants), process
+            )
+        return self._process_variants[key]
     
     def normalize_impact(self, impact: float, benchmark: EcoScoreBenchmark) -> float:
         """
@@ -158,7 +232,7 @@ class EcoScoreCalculationService:
                 subcategory = product.subcategory
             
             # Try to find exact match first
-            benchmark = EcoScoreBenchmark.objects.filter(
+            benchmark = EcoScoreBenchmark.objects.cached().filter(
                 category__iexact=category,
                 subcategory__iexact=subcategory or '',
                 is_active=True
@@ -168,7 +242,7 @@ class EcoScoreCalculationService:
                 return benchmark
             
             # Try category-only match
-            benchmark = EcoScoreBenchmark.objects.filter(
+            benchmark = EcoScoreBenchmark.objects.cached().filter(
                 category__iexact=category,
                 subcategory='',
                 is_active=True
@@ -178,7 +252,7 @@ class EcoScoreCalculationService:
                 return benchmark
             
             # Try partial category match
-            benchmark = EcoScoreBenchmark.objects.filter(
+            benchmark = EcoScoreBenchmark.objects.cached().filter(
                 category__icontains=category,
                 is_active=True
             ).first()
@@ -199,7 +273,7 @@ class EcoScoreCalculationService:
             }
             
             mapped_category = category_mapping.get(category, category)
-            benchmark = EcoScoreBenchmark.objects.filter(
+            benchmark = EcoScoreBenchmark.objects.cached().filter(
                 category__iexact=mapped_category,
                 is_active=True
             ).first()
@@ -234,17 +308,27 @@ class EcoScoreCalculationService:
                 logger.warning(f"No ecoinvent mapping found for product: {product.name}")
                 return None
             
+            # Products with the same attribute signature share the benchmark
+            # lookup and the unit impact of their ecoinvent process
+            signature = signature_for_product(product)
+            
             # Get benchmark
-            benchmark = self.get_benchmark_for_product(product)
+            benchmark = self.signature_cache.resolve(
+                signature, 'benchmark', lambda: self.get_benchmark_for_product(product)
+            )
             if not benchmark:
                 logger.warning(f"No benchmark found for product: {product.name}")
                 return None
             
-            # Calculate raw impact
-            raw_impact = self.lca_service.get_impact_with_fallback(
-                mapping.ecoinvent_process.code,
-                mapping.functional_unit_value
+            # Calculate raw impact with the regional variant of the process
+            process = self.resolve_process_variant(mapping.ecoinvent_process, location_for_product(product))
+            unit_impact = self.signature_cache.resolve(
+                signature, f'unit_impact:{process.code}:{process.location}',
+                lambda: self.lca_service.get_impact_with_fallback(
+                    process.code, 1.0, locations=location_candidates(process.location)
+                )
             )
+            raw_impact = unit_impact * mapping.functional_unit_value
             
             # Apply manual override if exists
             if mapping.is_manual_override and mapping.manual_impact_override:
@@ -273,10 +357,10 @@ class EcoScoreCalculationService:
                     raw_impact=raw_impact,
                     impact_unit='kg CO2-eq',
                     normalized_impact=normalized_impact,
-                    ecoinvent_process=mapping.ecoinvent_process,
+                    ecoinvent_process=process,
                     benchmark=benchmark,
                     is_manual_override=mapping.is_manual_override,
-                    calculation_notes=f"Calculated using {mapping.ecoinvent_process.name}"
+                    calculation_notes=f"Calculated using {process.name} ({process.location})"
                 )
                 
                 # Update product fields
@@ -285,6 +369,8 @@ class EcoScoreCalculationService:
                 # Create history record if score changed
                 self._create_history_record(product, score_value, score_grade)
                 
+                transaction.on_commit(bump_stats_version)
+                
                 logger.info(f"Calculated EcoScore for {product.name}: {score_grade} ({score_value})")
                 return ecoscore
                 
@@ -302,9 +388,9 @@ class EcoScoreCalculationService:
     def _get_product_mapping(self, product) -> Optional[ProductEcoMapping]:
         """Get ecoinvent mapping for a product"""
         if isinstance(product, Product):
-            return ProductEcoMapping.objects.filter(product=product).first()
+            return ProductEcoMapping.objects.filter(product=product).select_related('ecoinvent_process').first()
         else:
-            return ProductEcoMapping.objects.filter(merchant_product=product).first()
+            return ProductEcoMapping.objects.filter(merchant_product=product).select_related('ecoinvent_process').first()
     
     def _update_product_ecoscore_fields(self, product, score_value: float, score_grade: str):
         """Update product's EcoScore fields"""
@@ -0,0 +1,138 @@
+"""
+Normalized attribute signatures for sharing EcoScore work between listings
+
+Many merchants list essentially the same item. Products whose name tokens,
+category, subcategory, tags and eco flag normalize to the same signature
+share one resolved ecoinvent mapping, benchmark and unit impact.
+
+The version of the mapping rule document is part of every signature, so a
+mapping resolved under older rules is not reused once the rules change.
+"""
+import hashlib
+import re
+from typing import Dict, Iterable, List, Optional
+
+from products.models import Product
+
+from .rule_store import rule_store
+
+
+SIGNATURE_LENGTH = 40
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+STOPWORDS = {
+    'a', 'an', 'and', 'by', 'for', 'in', 'of', 'on', 'or', 'pack', 'pcs',
+    'piece', 'pieces', 'set', 'the', 'to', 'with',
+}
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """Lowercase, tokenize and drop stopwords and bare numbers"""
+    tokens = set()
+    for token in TOKEN_PATTERN.findall((text or '').lower()):
+        if token in STOPWORDS or token.isdigit() or len(token) < 2:
+            continue
+        tokens.add(token)
+    return sorted(tokens)
+
+
+def attribute_signature(name: str, category: str, subcategory: str = '',
+                        tags: Optional[Iterable[str]] = None, is_eco_friendly: bool = True,
+                        rules_version: Optional[int] = None) -> str:
+    """
+    Build the signature for a set of product attributes
+
+    Args:
+        rules_version: Version of the mapping rules the signature resolves under
+
+    Returns:
+        40 character hex digest
+    """
+    normalized_tags = sorted({' '.join(normalize_tokens(tag)) for tag in (tags or []) if tag})
+    parts = [
+        ' '.join(normalize_tokens(name)),
+        (category or '').strip().lower(),
+        (subcategory or '').strip().lower(),
+        ','.join(tag for tag in normalized_tags if tag),
+        '1' if is_eco_friendly else '0',
+    ]
+    if rules_version is not None:
+        parts.append(f'rules:{rules_version}')
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def product_attributes(product) -> Dict:
+    """Matching attributes of a Product or MerchantProduct"""
+    if isinstance(product, Product):
+        category = product.category.name
+        subcategory = product.subcategory.name if product.subcategory else ''
+    else:
+        category = product.category
+        subcategory = product.subcategory or ''
+
+    return {
+        'product_name': product.name,
+        'category': category,
+        'subcategory': subcategory,
+        'tags': product.tags or [],
+        'is_eco_friendly': product.is_eco_friendly,
+    }
+
+
+def signature_for_product(product) -> str:
+    """Attribute signature of a Product or MerchantProduct under the current mapping rules"""
+    attributes = product_attributes(product)
+    return attribute_signature(
+        attributes['product_name'],
+        attributes['category'],
+        attributes['subcategory'],
+        attributes['tags'],
+        attributes['is_eco_friendly'],
+        rules_version=rule_store.get_matcher().version,
+    )
+
+
+class SignatureCache:
+    """
+    In-process cache of per-signature results for a batch run
+
+    Each entry is a plain dict that callers fill lazily, e.g. with the
+    resolved ecoinvent process, the benchmark and the unit impact.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Dict] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, signature):
+        return signature in self._entries
+
+    def entry(self, signature: str) -> Dict:
+        """Return the (possibly empty) entry for a signature"""
+        entry = self._entries.get(signature)
+        if entry is None:
+            entry = self._entries[signature] = {}
+        return entry
+
+    def resolve(self, signature: str, key: str, resolver):
+        """
+        Return ``entry[key]`` for the signature, computing it once with ``resolver``
+        """
+        entry = self.entry(signature)
+        if key in entry:
+            self.hits += 1
+            return entry[key]
+
+        self.misses += 1
+        value = entry[key] = resolver()
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -1,3 +1,355 @@
-from django.test import TestCase
+"""
+Tests for the EcoScore app
+"""
+import gzip
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ecoswitch_backend.tiered_cache import tiered_cache
+from ecoswitch_backend.versions import version_cache
+from merchants.models import MerchantProduct, MerchantProfile
+
+from .exports import ExportError, export_watermark, parse_watermark, stream_export
+from .importers import import_processes
+from .management.commands.calculate_ecoscores import Command as CalculateEcoScoresCommand
+from .models import EcoInventProcess, EcoScore, EcoScoreBenchmark, ProductEcoMapping
+from .regions import location_candidates, location_for_product, location_for_state
+from .services import EcoScoreCalculationService
+from .signatures import SignatureCache, attribute_signature, product_attributes, signature_for_product
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ecoscore-tests'},
+    'versions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ecoscore-tests-versions'},
+}
+
+
+def catalog_rows(*rows):
+    return list(enumerate(rows, start=2))
+
+
+def create_merchant(username='merchant', state='Maharashtra'):
+    user = get_user_model().objects.create_user(username=username, email=f'{username}@example.com')
+    return MerchantProfile.objects.create(
+        user=user, business_name='Green Goods', business_type='retail', business_description='Shop',
+        contact_person='Owner', phone_number='+919876543210', email=f'{username}@example.com',
+        address='Street', city='Pune', state=state, postal_code='411001',
+    )
+
+
+def create_merchant_product(merchant, sku, name='Bamboo Toothbrush', **values):
+    values = {'category': 'Personal Care', 'brand': 'Leaf', 'tags': ['bamboo'], 'price': 99, **values}
+    return MerchantProduct.objects.create(merchant=merchant, sku=sku, name=name, description='Brush', **values)
+
+
+def process_row(code, name, location='', **values):
+    row = {'code': code, 'name': name, 'category': 'Packaging', 'unit': 'kg', 'location': location}
+    row.update(values)
+    return row
+
+
+class ImportProcessesTests(TestCase):
+    def test_rows_are_created_then_updated_in_place(self):
+        stats = import_processes(catalog_rows(
+            process_row('P1', 'Bamboo fibre'),
+            process_row('P2', 'Recycled PET'),
+        ))
+        self.assertEqual((stats['created'], stats['updated'], stats['invalid']), (2, 0, 0))
+        original = EcoInventProcess.objects.get(code='P1')
+
+        stats = import_processes(catalog_rows(
+            process_row('P1', 'Bamboo fibre, bleached', is_active='no'),
+            process_row('P3', 'Glass bottle'),
+        ))
+        self.assertEqual((stats['created'], stats['updated']), (1, 1))
+        updated = EcoInventProcess.objects.get(code='P1')
+        self.assertEqual(updated.pk, original.pk)
+        self.assertEqual(updated.name, 'Bamboo fibre, bleached')
+        self.assertFalse(updated.is_active)
+        self.assertEqual(EcoInventProcess.objects.count(), 3)
+
+    def test_regional_variant_is_a_separate_process(self):
+        import_processes(catalog_rows(
+            process_row('P1', 'Electricity'),
+            process_row('P1', 'Electricity', location='IN'),
+        ))
+        self.assertEqual(
+            sorted(EcoInventProcess.objects.filter(code='P1').values_list('location', flat=True)),
+            ['GLO', 'IN'],
+        )
+
+    def test_last_duplicate_in_a_chunk_wins(self):
+        stats = import_processes(catalog_rows(
+            process_row('P1', 'First name'),
+            process_row('P1', 'Second name'),
+        ))
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(EcoInventProcess.objects.get(code='P1').name, 'Second name')
+
+    def test_invalid_rows_are_skipped(self):
+        stats = import_processes(catalog_rows(
+            process_row('P1', ''),
+            process_row('P2', 'Cotton', is_active='maybe'),
+            {'__error__': 'malformed JSON'},
+            process_row('P3', 'Jute'),
+        ))
+        self.assertEqual((stats['processed'], stats['created'], stats['invalid']), (4, 1, 3))
+        self.assertEqual(len(stats['errors']), 3)
+        self.assertEqual(list(EcoInventProcess.objects.values_list('code', flat=True)), ['P3'])
+
+    def test_name_taken_by_another_code_is_rejected(self):
+        import_processes(catalog_rows(process_row('P1', 'Steel')))
+
+        stats = import_processes(catalog_rows(
+            process_row('P2', 'Steel'),
+            process_row('P3', 'Aluminium'),
+        ))
+        self.assertEqual((stats['created'], stats['invalid']), (1, 1))
+        self.assertFalse(EcoInventProcess.objects.filter(code='P2').exists())
+
+    def test_dry_run_writes_nothing(self):
+        stats = import_processes(catalog_rows(process_row('P1', 'Steel')), dry_run=True)
+        self.assertEqual((stats['processed'], stats['created']), (1, 0))
+        self.assertFalse(EcoInventProcess.objects.exists())
+
+    def test_rows_are_written_in_batches(self):
+        chunks = []
+        stats = import_processes(
+            catalog_rows(*(process_row(f'P{i}', f'Process {i}') for i in range(5))),
+            batch_size=2,
+            progress=lambda running: chunks.append(running['processed']),
+        )
+        self.assertEqual(chunks, [2, 4, 5])
+        self.assertEqual(stats['created'], 5)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SignatureSharingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        merchant = create_merchant()
+        cls.listing = create_merchant_product(merchant, 'BT-1', name='Bamboo Toothbrush - Pack of 4')
+        cls.duplicate = create_merchant_product(merchant, 'BT-2', name='toothbrush, BAMBOO')
+        cls.shared_process = EcoInventProcess.objects.create(
+            code='toothbrush_shared', name='Toothbrush, shared', category='Personal Care', unit='item',
+        )
+
+    def lookup(self, product):
+        command = CalculateEcoScoresCommand()
+        command.signature_cache = SignatureCache()
+        return command._resolve_ecoinvent_process(
+            signature_for_product(product), product_attributes(product), product.name,
+        )
+
+    def map_listing(self, **values):
+        values = {'attribute_signature': signature_for_product(self.listing), **values}
+        return ProductEcoMapping.objects.create(
+            merchant_product=self.listing, ecoinvent_process=self.shared_process, mapping_confidence=0.8,
+            functional_unit='per item', functional_unit_value=1.0, **values,
+        )
+
+    def test_equivalent_attributes_share_a_signature(self):
+        self.assertEqual(
+            attribute_signature('Bamboo Toothbrush - Pack of 4', 'Personal Care', tags=['Zero Waste', 'bamboo']),
+            attribute_signature('toothbrush bamboo', ' personal care', tags=['bamboo', 'zero  waste']),
+        )
+        self.assertEqual(signature_for_product(self.listing), signature_for_product(self.duplicate))
+
+    def test_attributes_and_rules_version_change_the_signature(self):
+        signature = attribute_signature('Bamboo toothbrush', 'Personal Care', rules_version=1)
+        self.assertNotEqual(signature, attribute_signature('Bamboo toothbrush', 'Home', rules_version=1))
+        self.assertNotEqual(
+            signature, attribute_signature('Bamboo toothbrush', 'Personal Care', is_eco_friendly=False, rules_version=1)
+        )
+        self.assertNotEqual(signature, attribute_signature('Bamboo toothbrush', 'Personal Care', rules_version=2))
+
+    def test_signature_cache_resolves_each_key_once(self):
+        cache = SignatureCache()
+        calls = []
+        for _ in range(3):
+            value = cache.resolve('signature', 'benchmark', lambda: calls.append(1) or 'resolved')
+        self.assertEqual((value, len(calls), cache.hits, cache.misses), ('resolved', 1, 2, 1))
+
+    def test_equivalent_listing_reuses_the_stored_mapping(self):
+        self.map_listing()
+        self.assertEqual(self.lookup(self.duplicate), self.shared_process)
+
+    def test_manual_overrides_and_unsigned_mappings_are_not_shared(self):
+        mapping = self.map_listing(is_manual_override=True, manual_impact_override=0.01)
+        self.assertEqual(self.lookup(self.duplicate).code, 'toothbrush_bamboo')
+
+        # Mappings made before signatures existed keep an empty one
+        mapping.is_manual_override = False
+        mapping.attribute_signature = ''
+        mapping.save()
+        self.assertEqual(self.lookup(self.duplicate).code, 'toothbrush_bamboo')
+
+
+class RegionalVariantTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.global_process = EcoInventProcess.objects.create(
+            code='electricity', name='Electricity', category='Energy', unit='kWh',
+        )
+        cls.india_process = EcoInventProcess.objects.create(
+            code='electricity', name='Electricity', category='Energy', unit='kWh', location='IN',
+        )
+        cls.maharashtra_process = EcoInventProcess.objects.create(
+            code='electricity', name='Electricity', category='Energy', unit='kWh', location='IN-MH',
+        )
+
+    def test_state_names_resolve_to_location_codes(self):
+        self.assertEqual(location_for_state(' maharashtra '), 'IN-MH')
+        self.assertEqual(location_for_state('Orissa'), location_for_state('Odisha'))
+        self.assertEqual(location_for_state('in-mh'), 'IN-MH')
+        self.assertIsNone(location_for_state('Atlantis'))
+        self.assertIsNone(location_for_state(''))
+
+    def test_candidates_go_from_state_to_country_to_global(self):
+        self.assertEqual(location_candidates('IN-MH'), ['IN-MH', 'IN', 'GLO'])
+        self.assertEqual(location_candidates('IN'), ['IN', 'GLO'])
+        self.assertEqual(location_candidates(None), ['GLO'])
+
+    def test_product_location_follows_its_merchant(self):
+        merchant = create_merchant()
+        product = create_merchant_product(merchant, 'BT-1')
+        self.assertEqual(location_for_product(product), 'IN-MH')
+
+        merchant.state = 'Unknown'
+        self.assertEqual(location_for_product(product), 'IN')
+        merchant.country = 'Germany'
+        self.assertEqual(location_for_product(product), 'GLO')
+
+    def test_most_specific_active_variant_is_picked(self):
+        service = EcoScoreCalculationService()
+        self.assertEqual(service.resolve_process_variant(self.global_process, 'IN-MH'), self.maharashtra_process)
+        self.assertEqual(service.resolve_process_variant(self.global_process, 'IN-KA'), self.india_process)
+        self.assertEqual(service.resolve_process_variant(self.global_process, 'GLO'), self.global_process)
+
+        EcoInventProcess.objects.filter(location__startswith='IN').update(is_active=False)
+        service = EcoScoreCalculationService()
+        self.assertEqual(service.resolve_process_variant(self.global_process, 'IN-MH'), self.global_process)
+
+
+class EcoScoreExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        merchant = create_merchant()
+        process = EcoInventProcess.objects.create(code='toothbrush', name='Toothbrush', category='Personal Care', unit='item')
+        benchmark = EcoScoreBenchmark.objects.create(
+            category='Personal Care', benchmark_impact=1.0, benchmark_unit='kg CO2-eq', source='Test',
+        )
+        cls.now = timezone.now()
+        cls.scores = []
+        for index, age in enumerate([60, 30, 1]):
+            product = create_merchant_product(merchant, f'BT-{index}', name=f'Toothbrush {index}')
+            score = EcoScore.objects.create(
+                merchant_product=product, score_value=80.0, score_grade='A', raw_impact=0.2,
+                impact_unit='kg CO2-eq', normalized_impact=0.2, ecoinvent_process=process, benchmark=benchmark,
+            )
+            EcoScore.objects.filter(pk=score.pk).update(calculation_date=cls.now - timedelta(minutes=age))
+            cls.scores.append(score)
+        cls.admin = get_user_model().objects.create_user(username='admin', is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def exported_ids(self, **options):
+        chunks = stream_export('jsonl', **options)
+        return [json.loads(line)['ecoscore_id'] for line in ''.join(chunks).splitlines()]
+
+    @override_settings(ECOSCORE_EXPORT_WATERMARK_LAG=120)
+    def test_watermark_lags_behind_the_start_of_the_export(self):
+        self.assertEqual(export_watermark(self.now), self.now - timedelta(seconds=120))
+
+    def test_watermarks_bound_the_export(self):
+        ids = [score.pk for score in self.scores]
+        self.assertEqual(self.exported_ids(), ids)
+        self.assertEqual(self.exported_ids(since=self.now - timedelta(minutes=45)), ids[1:])
+        self.assertEqual(self.exported_ids(until=self.now - timedelta(minutes=5)), ids[:2])
+
+    def test_csv_export_starts_with_a_header_and_can_be_gzipped(self):
+        lines = ''.join(stream_export('csv')).splitlines()
+        self.assertTrue(lines[0].startswith('ecoscore_id,product_id,merchant_product_id,product_name'))
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(gzip.decompress(b''.join(stream_export('csv', compress=True))).decode().splitlines(), lines)
+
+    def test_invalid_parameters_are_rejected(self):
+        with self.assertRaises(ExportError):
+            parse_watermark('yesterday')
+        with self.assertRaises(ExportError):
+            stream_export('xml')
+        self.assertEqual(parse_watermark('2024-01-01T02:00:00'), datetime(2024, 1, 1, 2, tzinfo=dt_timezone.utc))
+
+    def test_view_stops_at_the_watermark_it_returns(self):
+        response = self.client.get('/api/ecoscore/ecoscores/export/', {'output': 'jsonl'})
+        self.assertEqual(response.status_code, 200)
+
+        # The score written a minute ago may still be committing and is left for the next export
+        watermark = parse_watermark(response['X-Export-Watermark'])
+        self.assertLess(watermark, self.now - timedelta(minutes=1))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['ecoscore_id'] for line in lines], [score.pk for score in self.scores[:2]])
+
+        # Once the lag has passed, it goes out with the export that follows
+        with self.settings(ECOSCORE_EXPORT_WATERMARK_LAG=0):
+            response = self.client.get(
+                '/api/ecoscore/ecoscores/export/', {'output': 'jsonl', 'since': response['X-Export-Watermark']},
+            )
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['ecoscore_id'] for line in lines], [self.scores[2].pk])
+
+    def test_view_is_for_admins_and_rejects_a_bad_watermark(self):
+        response = self.client.get('/api/ecoscore/ecoscores/export/', {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/ecoscore/ecoscores/export/').status_code, 401)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class StatsCacheTests(TestCase):
+    url = '/api/ecoscore/ecoscores/stats/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.merchant = create_merchant()
+        cls.product = create_merchant_product(cls.merchant, 'BT-1')
+        process = EcoInventProcess.objects.create(code='toothbrush', name='Toothbrush', category='Personal Care', unit='item')
+        EcoScoreBenchmark.objects.create(
+            category='Personal Care', benchmark_impact=1.0, benchmark_unit='kg CO2-eq', source='Test',
+        )
+        ProductEcoMapping.objects.create(
+            merchant_product=cls.product, ecoinvent_process=process, mapping_confidence=0.9,
+            functional_unit='per item', functional_unit_value=1.0,
+        )
+
+    def setUp(self):
+        cache.clear()
+        version_cache.clear()
+        tiered_cache.clear_local()
+
+    def stats(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return data['total_products'], data['products_with_ecoscore']
+
+    def test_stats_are_recomputed_only_after_a_calculation_commits(self):
+        self.assertEqual(self.stats(), (1, 0))
+
+        # Product saves alone leave the cached statistics in place
+        create_merchant_product(self.merchant, 'BT-2')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.stats(), (1, 0))
+
+        # Without brightway2 the calculation uses the fallback impact
+        with self.captureOnCommitCallbacks(execute=True), self.assertLogs('ecoscore.services', 'WARNING'):
+            self.assertIsNotNone(EcoScoreCalculationService().calculate_product_ecoscore(self.product))
+        self.assertEqual(self.stats(), (2, 1))
@@ -4,7 +4,8 @@ Views for EcoScore app
 from rest_framework import generics, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
+from django.http import StreamingHttpResponse
 from django.db.models import Avg, Count, Q
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -22,12 +23,21 @@ from .serializers import (
     ProductEcoScoreSummarySerializer, MerchantProductEcoScoreSummarySerializer,
     EcoScoreLeaderboardSerializer, EcoScoreStatsSerializer
 )
-from .services import EcoScoreCalculationService, EcoScoreGamificationService
+from .services import STATS_VERSION_KEY, EcoScoreCalculationService, EcoScoreGamificationService
+from .exports import ExportError, export_filename, export_watermark, parse_watermark, stream_export
+from ecoswitch_backend.tiered_cache import tiered_cache
+from ecoswitch_backend.versions import get_version
 from products.models import Product
 from merchants.models import MerchantProduct
 
 User = get_user_model()
 
+STATS_CACHE_KEY_PREFIX = 'ecoscore:stats'
+# Retired by every EcoScore calculation; product counts catch up on expiry
+STATS_CACHE_TIMEOUT = 300
+# Expired stats are still served for this long while one request recomputes them
+STATS_STALE_TIMEOUT = 900
+
 
 class EcoInventProcessViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for EcoInventProcess"""
@@ -56,6 +66,63 @@ class EcoInventProcessViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(categories)
 
 
+def stats_cache_key() -> str:
+    return f"{STATS_CACHE_KEY_PREFIX}:{get_version(STATS_VERSION_KEY)}"
+
+
+def compute_ecoscore_stats():
+    """EcoScore statistics over every product; several full scans, so served through the cache"""
+    # Basic stats
+    total_products = Product.objects.count() + MerchantProduct.objects.count()
+    products_with_ecoscore = EcoScore.objects.values('product', 'merchant_product').distinct().count()
+    
+    # Average EcoScore
+    avg_ecoscore = EcoScore.objects.aggregate(avg=Avg('score_value'))['avg'] or 0
+    
+    # Grade distribution
+    grade_distribution = {}
+    for grade in ['A', 'B', 'C', 'D', 'E']:
+        count = EcoScore.objects.filter(score_grade=grade).count()
+        grade_distribution[grade] = count
+    
+    # Category breakdown
+    category_breakdown = {}
+    for score in EcoScore.objects.select_related('benchmark'):
+        category = score.benchmark.category
+        if category not in category_breakdown:
+            category_breakdown[category] = {'count': 0, 'avg_score': 0}
+        category_breakdown[category]['count'] += 1
+    
+    # Calculate average scores per category
+    for category in category_breakdown:
+        avg_score = EcoScore.objects.filter(
+            benchmark__category=category
+        ).aggregate(avg=Avg('score_value'))['avg'] or 0
+        category_breakdown[category]['avg_score'] = round(avg_score, 1)
+    
+    # Top performing categories
+    top_categories = sorted(
+        category_breakdown.items(),
+        key=lambda x: x[1]['avg_score'],
+        reverse=True
+    )[:5]
+    
+    # Recent calculations (last 7 days)
+    recent_calculations = EcoScore.objects.filter(
+        calculation_date__gte=timezone.now() - timedelta(days=7)
+    ).count()
+    
+    return {
+        'total_products': total_products,
+        'products_with_ecoscore': products_with_ecoscore,
+        'average_ecoscore': round(avg_ecoscore, 1),
+        'grade_distribution': grade_distribution,
+        'category_breakdown': category_breakdown,
+        'top_performing_categories': [cat[0] for cat in top_categories],
+        'recent_calculations': recent_calculations
+    }
+
+
 class EcoScoreViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for EcoScore"""
     queryset = EcoScore.objects.all()
@@ -80,58 +147,47 @@ class EcoScoreViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get EcoScore statistics"""
-        # Basic stats
-        total_products = Product.objects.count() + MerchantProduct.objects.count()
-        products_with_ecoscore = EcoScore.objects.values('product', 'merchant_product').distinct().count()
-        
-        # Average EcoScore
-        avg_ecoscore = EcoScore.objects.aggregate(avg=Avg('score_value'))['avg'] or 0
-        
-        # Grade distribution
-        grade_distribution = {}
-        for grade in ['A', 'B', 'C', 'D', 'E']:
-            count = EcoScore.objects.filter(score_grade=grade).count()
-            grade_distribution[grade] = count
+        stats_data = tiered_cache.get_or_set(
+            stats_cache_key(), compute_ecoscore_stats, STATS_CACHE_TIMEOUT, STATS_STALE_TIMEOUT,
+        )
         
-        # Category breakdown
-        category_breakdown = {}
-        for score in EcoScore.objects.select_related('benchmark'):
-            category = score.benchmark.category
-            if category not in category_breakdown:
-                category_breakdown[category] = {'count': 0, 'avg_score': 0}
-            category_breakdown[category]['count'] += 1
-        
-        # Calculate average scores per category
-        for category in category_breakdown:
-            avg_score = EcoScore.objects.filter(
-                benchmark__category=category
-            ).aggregate(avg=Avg('score_value'))['avg'] or 0
-            category_breakdown[category]['avg_score'] = round(avg_score, 1)
+        serializer = EcoScoreStatsSerializer(stats_data)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """
+        Stream every EcoScore as CSV or JSON-lines for partner dumps
         
-        # Top performing categories
-        top_categories = sorted(
-            category_breakdown.items(),
-            key=lambda x: x[1]['avg_score'],
-            reverse=True
-        )[:5]
+        Query params: ``output`` (csv | jsonl), ``gzip`` (1 to compress) and
+        ``since`` (ISO 8601 watermark for incremental exports). The upper
+        bound of the export, a few minutes before it started so that no
+        late-committed score is skipped, is returned in
+        ``X-Export-Watermark``; pass it as ``since`` next time.
+        """
+        file_format = request.query_params.get('output', 'csv')
+        compress = request.query_params.get('gzip', '').lower() in ('1', 'true', 'yes')
         
-        # Recent calculations (last 7 days)
-        recent_calculations = EcoScore.objects.filter(
-            calculation_date__gte=timezone.now() - timedelta(days=7)
-        ).count()
+        try:
+            since = parse_watermark(request.query_params.get('since'))
+            watermark = export_watermark()
+            chunks = stream_export(file_format, since=since, until=watermark, compress=compress)
+        except ExportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        stats_data = {
-            'total_products': total_products,
-            'products_with_ecoscore': products_with_ecoscore,
-            'average_ecoscore': round(avg_ecoscore, 1),
-            'grade_distribution': grade_distribution,
-            'category_breakdown': category_breakdown,
-            'top_performing_categories': [cat[0] for cat in top_categories],
-            'recent_calculations': recent_calculations
-        }
+        if compress:
+            content_type = 'application/gzip'
+        elif file_format == 'csv':
+            content_type = 'text/csv; charset=utf-8'
+        else:
+            content_type = 'application/x-ndjson; charset=utf-8'
         
-        serializer = EcoScoreStatsSerializer(stats_data)
-        return Response(serializer.data)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="{export_filename(file_format, compress)}"'
+        )
+        response['X-Export-Watermark'] = watermark.isoformat()
+        return response
 
 
 class ProductEcoScoreViewSet(viewsets.ReadOnlyModelViewSet):
@@ -0,0 +1,161 @@
+"""
+Content-addressed storage for uploaded product media
+
+Files saved through ``ContentAddressedStorage`` are named after the SHA-256
+of their content, whatever name they were uploaded under:
+``blobs/3f/3fa2...c1.jpg``. The upload is hashed while it is copied to a
+temporary file, which is then moved into place, or dropped when a blob with
+the same content already exists. Repeated uploads, duplicated products and
+the thumbnails made from them all point to one shared file.
+
+Deleting or changing a row never deletes the blob it used, since other rows
+may use it too. The gc_media command removes blobs nothing references,
+counting both the file fields and the columns that copy a blob's URL
+(``DENORMALIZED_URL_FIELDS``).
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from typing import Iterable, List, Optional, Set
+from urllib.parse import unquote, urlsplit
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+logger = logging.getLogger(__name__)
+
+
+BLOB_DIR = 'blobs'
+TEMP_DIR = f'{BLOB_DIR}/tmp'
+
+# Columns keeping the URL of a product image, copied when the row was written
+DENORMALIZED_URL_FIELDS = [
+    ('catalog.CatalogEntry', 'primary_image'),
+    ('customers.OrderItem', 'product_image'),
+    ('customers.CustomerWishlist', 'product_image'),
+    ('customers.CustomerRecommendation', 'product_image'),
+    ('customers.CartItem', 'product_image'),
+]
+
+
+def blob_name(digest: str, extension: str) -> str:
+    return f'{BLOB_DIR}/{digest[:2]}/{digest}{extension}'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage naming every file after the hash of its content
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # _save chooses the final name; an existing blob is reused, not renamed
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+        temp_dir = self.path(TEMP_DIR)
+        os.makedirs(temp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(suffix=extension, dir=temp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode('utf-8')
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+
+            name = blob_name(digest.hexdigest(), extension)
+            path = self.path(name)
+            try:
+                # Same content stored before: keep that blob, made fresh again
+                # so that gc_media spares it until the new row is saved
+                os.utime(path)
+                os.remove(temp_path)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                # Atomic: concurrent uploads of the same content both end up here
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+
+content_storage = ContentAddressedStorage()
+
+
+def content_addressed_fields() -> List:
+    """File fields of installed models stored in ``ContentAddressedStorage``"""
+    return [
+        field
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(getattr(field, 'storage', None), ContentAddressedStorage)
+    ]
+
+
+def storage_name(url: str, storage: ContentAddressedStorage = content_storage) -> Optional[str]:
+    """Name of the stored file a (relative or absolute) media URL points to"""
+    path = urlsplit(url).path
+    base_path = urlsplit(storage.base_url).path
+    if not path.startswith(base_path):
+        return None
+    return unquote(path[len(base_path):])
+
+
+def referenced_blobs() -> Set[str]:
+    """
+    Names stored in the content-addressed file fields of all rows, and of the
+    files whose URL a denormalized column still shows
+    """
+    names = set()
+    for field in content_addressed_fields():
+        names.update(
+            field.model.objects.exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+            .values_list(field.name, flat=True).distinct().iterator()
+        )
+    for model_label, field_name in DENORMALIZED_URL_FIELDS:
+        urls = (
+            apps.get_model(model_label).objects.exclude(**{field_name: ''})
+            .values_list(field_name, flat=True).distinct().iterator()
+        )
+        names.update(name for name in map(storage_name, urls) if name)
+    return names
+
+
+def collect_garbage(referenced: Iterable[str], min_age: float, dry_run: bool = False,
+                    storage: ContentAddressedStorage = content_storage) -> List[str]:
+    """
+    Delete the blobs (and leftover temporary files) not in ``referenced``
+
+    Files younger than ``min_age`` seconds are kept: an upload is stored
+    before the row pointing to it is saved.
+
+    Returns:
+        Names of the deleted (with ``dry_run``, deletable) files
+    """
+    referenced = set(referenced)
+    cutoff = time.time() - min_age
+    root = storage.path(BLOB_DIR)
+    deleted = []
+    for directory, _, files in os.walk(root):
+        for file_name in files:
+            path = os.path.join(directory, file_name)
+            name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+            if name in referenced or os.path.getmtime(path) > cutoff:
+                continue
+            if not dry_run:
+                os.remove(path)
+            deleted.append(name)
+    logger.info(f"Media garbage collection {'found' if dry_run else 'deleted'} {len(deleted)} files")
+    return deleted
+
@@ -0,0 +1,198 @@
+"""
+Keyset (cursor) pagination over named, index-backed sorts
+"""
+import base64
+import json
+from collections import OrderedDict
+from decimal import Decimal
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+DEFAULT_MAX_PAGE_SIZE = 100
+DEFAULT_COUNT_LIMIT = 1000
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Opaque, URL safe cursor for the sort key values of the last row"""
+    payload = json.dumps([_to_json(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> List:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError):
+        raise NotFound('Invalid cursor')
+    if not isinstance(values, list):
+        raise NotFound('Invalid cursor')
+    return values
+
+
+def _to_json(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def keyset_filter(ordering: Sequence[str], values: Sequence) -> Q:
+    """
+    Rows strictly after ``values`` in ``ordering``
+
+    For ``('-price', '-id')`` and ``(10, 7)`` this is
+    ``price < 10 OR (price = 10 AND id < 7)``.
+    """
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        term = Q(**{f'{name}__{lookup}': values[position]})
+        for previous_field, previous_value in zip(ordering[:position], values[:position]):
+            term &= Q(**{previous_field.lstrip('-'): previous_value})
+        condition |= term
+    return condition
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a whitelist of named sorts
+
+    Each sort maps to an ordering ending in a unique field (normally ``id``)
+    so the cursor identifies a single row, and every ordering is expected to
+    be backed by an index. Pages are fetched with ``WHERE key > cursor``
+    instead of ``OFFSET``, and the total is counted only up to
+    ``count_limit`` rows.
+    """
+    sorts: Dict[str, Tuple[str, ...]] = {}
+    default_sort: Optional[str] = None
+    sort_query_param = 'sort'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = None
+    max_page_size = DEFAULT_MAX_PAGE_SIZE
+    count_limit = DEFAULT_COUNT_LIMIT
+
+    def get_sort(self, request) -> str:
+        sort = request.query_params.get(self.sort_query_param) or self.default_sort
+        if sort not in self.sorts:
+            raise ValidationError({
+                self.sort_query_param: f"Unknown sort '{sort}'. Choose one of: {', '.join(self.sorts)}"
+            })
+        return sort
+
+    def get_page_size(self, request) -> int:
+        page_size = self.page_size or settings.REST_FRAMEWORK.get('PAGE_SIZE') or 20
+        requested = request.query_params.get(self.page_size_query_param)
+        if requested:
+            try:
+                page_size = int(requested)
+            except ValueError:
+                raise ValidationError({self.page_size_query_param: 'Must be an integer'})
+        return max(1, min(page_size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.sort = self.get_sort(request)
+        self.ordering = self.sorts[self.sort]
+        self.page_size_value = self.get_page_size(request)
+        self.count, self.count_is_exact = self.approximate_count(queryset)
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != len(self.ordering):
+                raise NotFound('Invalid cursor')
+            queryset = queryset.filter(keyset_filter(self.ordering, values))
+
+        rows = list(queryset[:self.page_size_value + 1])
+        self.has_next = len(rows) > self.page_size_value
+        rows = rows[:self.page_size_value]
+        self.next_values = self.cursor_values(rows[-1]) if self.has_next else None
+        return rows
+
+    def approximate_count(self, queryset) -> Tuple[int, bool]:
+        """Count matching rows, stopping once ``count_limit`` is exceeded"""
+        count = queryset.order_by()[:self.count_limit + 1].count()
+        if count > self.count_limit:
+            return self.count_limit, False
+        return count, True
+
+    def cursor_values(self, row) -> List:
+        values = []
+        for field in self.ordering:
+            value = row
+            for part in field.lstrip('-').split('__'):
+                value = getattr(value, part)
+            values.append(value)
+        return values
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encode_cursor(self.next_values))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('count_is_exact', self.count_is_exact),
+            ('sort', self.sort),
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+
+class RankedIdPagination(KeysetPagination):
+    """
+    Pagination over an externally ranked list of ids (e.g. full-text search)
+
+    The cursor is the position in the ranking, which is already bounded by
+    the search backend's result limit.
+    """
+
+    def paginate_ranked(self, queryset, ranked_ids: Sequence[int], request, sort: str):
+        self.request = request
+        self.sort = sort
+        self.page_size_value = self.get_page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        start = 0
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != 1 or not isinstance(values[0], int) or values[0] < 0:
+                raise NotFound('Invalid cursor')
+            start = values[0]
+
+        # Walk the ranking until a full page of rows passes the filters
+        rank = {product_id: position for position, product_id in enumerate(ranked_ids)}
+        rows = []
+        position = start
+        while len(rows) <= self.page_size_value and position < len(ranked_ids):
+            window = ranked_ids[position:position + self.page_size_value + 1]
+            found = {row.pk: row for row in queryset.filter(pk__in=window)}
+            for row_id in window:
+                position += 1
+                if row_id in found:
+                    rows.append(found[row_id])
+                    if len(rows) > self.page_size_value:
+                        break
+
+        self.has_next = len(rows) > self.page_size_value
+        rows = rows[:self.page_size_value]
+        self.next_values = [rank[rows[-1].pk] + 1] if self.has_next else None
+
+        # Search backends stop at count_limit ids, so a full ranking is a lower bound
+        self.count = queryset.count()
+        self.count_is_exact = len(ranked_ids) < self.count_limit
+        return rows
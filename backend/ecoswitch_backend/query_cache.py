@@ -0,0 +1,225 @@
+"""
+Opt-in query result cache with table-level invalidation
+
+Querysets of models whose manager is built from ``CachedQuerySet`` can be
+marked with ``.cached()``. Their rows are then read through the cache, keyed
+on the compiled SQL, its parameters and the current version of every table
+the query reads (joins and subqueries included).
+
+Every INSERT, UPDATE and DELETE that goes through Django's database
+connections bumps the version of the table it writes, whether it comes from
+``save()``, ``update()``, bulk operations or raw SQL. Only the tables of
+models with a ``CachedQuerySet`` manager are tracked, and queries reading any
+other table are not cached. Inside a transaction the versions are bumped
+once, when the transaction commits, so other processes cannot cache rows they
+read before the commit; until then the transaction itself reads the tables it
+wrote from the database. A rollback drops the pending bumps along with the
+writes. No view or helper needs its own invalidation.
+"""
+import hashlib
+import re
+from typing import Dict, Iterable, Set
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.sql.query import Query
+
+from .versions import bump_version, get_versions
+
+KEY_PREFIX = 'query_cache'
+TABLE_VERSION_KEY_PREFIX = f'{KEY_PREFIX}:table:'
+DEFAULT_TIMEOUT = 300
+
+# Table written by a statement, with or without identifier quotes
+WRITE_STATEMENT = re.compile(
+    r'^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM|REPLACE\s+INTO)\s+[`"\[]?(\w+)',
+    re.IGNORECASE,
+)
+
+
+_cached_tables = None
+
+
+def cached_tables() -> Set[str]:
+    """Tables of installed models with a manager built from ``CachedQuerySet``"""
+    global _cached_tables
+    if _cached_tables is None:
+        _cached_tables = {
+            model._meta.db_table
+            for model in apps.get_models()
+            if any(issubclass(manager._queryset_class, CachedQuerySet) for manager in model._meta.managers)
+        }
+    return _cached_tables
+
+
+def table_version_key(table: str) -> str:
+    return f'{TABLE_VERSION_KEY_PREFIX}{table}'
+
+
+def table_versions(tables: Iterable[str]) -> Dict[str, int]:
+    """Current version of each table"""
+    keys = {table_version_key(table): table for table in tables}
+    return {keys[key]: version for key, version in get_versions(keys).items()}
+
+
+def bump_tables(tables: Iterable[str]):
+    """Retire every cached result read from ``tables``"""
+    for table in set(tables):
+        bump_version(table_version_key(table))
+
+
+def written_table(sql: str):
+    match = WRITE_STATEMENT.match(sql)
+    return match.group(1) if match else None
+
+
+class PendingBumps:
+    """on_commit callback bumping the tracked tables a transaction wrote"""
+
+    def __init__(self, hooks):
+        self.tables = set()
+        # The connection's list of on_commit hooks this callback was queued in
+        self.hooks = hooks
+
+    def __call__(self):
+        tables, self.tables = self.tables, set()
+        bump_tables(tables)
+
+
+def pending_bumps(connection):
+    """The current transaction's queued ``PendingBumps``, if there is one"""
+    pending = getattr(connection, 'query_cache_pending', None)
+    if pending is None:
+        return None
+    hooks = connection.run_on_commit
+    if hooks is not pending.hooks:
+        # Django replaces the list on commit, on rollback and when a
+        # savepoint rolls back; only in the last case can it still be queued
+        if not any(func is pending for _, func, _ in hooks):
+            connection.query_cache_pending = None
+            return None
+        pending.hooks = hooks
+    return pending
+
+
+def uncommitted_tables(connection) -> Set[str]:
+    """Tracked tables written by the connection's current transaction"""
+    pending = pending_bumps(connection)
+    return pending.tables if pending is not None else set()
+
+
+def invalidate_on_write(execute, sql, params, many, context):
+    """Database execute wrapper bumping the version of the table written"""
+    result = execute(sql, params, many, context)
+    table = written_table(sql)
+    if table in cached_tables():
+        connection = context['connection']
+        if connection.in_atomic_block:
+            # One callback per transaction, whatever number of statements
+            pending = pending_bumps(connection)
+            if pending is None:
+                pending = connection.query_cache_pending = PendingBumps(connection.run_on_commit)
+                transaction.on_commit(pending, using=connection.alias)
+            pending.tables.add(table)
+        else:
+            bump_tables([table])
+    return result
+
+
+def install_write_tracking(sender, connection, **kwargs):
+    if invalidate_on_write not in connection.execute_wrappers:
+        connection.execute_wrappers.append(invalidate_on_write)
+
+
+connection_created.connect(install_write_tracking, dispatch_uid=f'{KEY_PREFIX}:write_tracking')
+
+
+def query_tables(query: Query) -> Set[str]:
+    """Tables read by ``query``, including those of its subqueries"""
+    tables = {alias.table_name for alias in query.alias_map.values()}
+    if query.model is not None:
+        tables.add(query.model._meta.db_table)
+    nodes = [query.where, *query.annotations.values(), *query.combined_queries]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, Query):
+            tables |= query_tables(node)
+            continue
+        inner = getattr(node, 'query', None)
+        if isinstance(inner, Query):
+            nodes.append(inner)
+        if hasattr(node, 'get_source_expressions'):
+            nodes.extend(expression for expression in node.get_source_expressions() if expression is not None)
+        else:
+            nodes.extend(getattr(node, 'children', ()))
+    return tables
+
+
+class CachedQuerySet(models.QuerySet):
+    """
+    QuerySet whose results can be read through the cache with ``.cached()``
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_timeout = None
+        self._use_cache = False
+
+    def cached(self, timeout: int = None):
+        """
+        Read this queryset's rows through the cache
+
+        Args:
+            timeout: Seconds to keep the rows (QUERY_CACHE_TIMEOUT by default)
+        """
+        clone = self._chain()
+        clone._use_cache = True
+        clone._cache_timeout = timeout
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._use_cache = self._use_cache
+        clone._cache_timeout = self._cache_timeout
+        return clone
+
+    def _cache_key(self):
+        """Cache key of this queryset's rows, or None when it cannot be cached"""
+        compiler = self.query.chain().get_compiler(using=self.db)
+        try:
+            sql, params = compiler.as_sql()
+        except EmptyResultSet:
+            return None
+        tables = query_tables(compiler.query)
+        if not tables <= cached_tables() or tables & uncommitted_tables(connections[self.db]):
+            # Writes to the table would not retire the entry, or this
+            # transaction wrote rows other readers cannot see yet
+            return None
+        versions = table_versions(tables)
+        signature = '|'.join([
+            self.db,
+            self._iterable_class.__name__,
+            repr(self._fields),
+            sql,
+            repr(params),
+            *(f'{table}={version}' for table, version in sorted(versions.items())),
+        ])
+        return f'{KEY_PREFIX}:{hashlib.sha1(signature.encode("utf-8")).hexdigest()}'
+
+    def _fetch_all(self):
+        if self._use_cache and self._result_cache is None:
+            key = self._cache_key()
+            if key is not None:
+                rows = cache.get(key)
+                if rows is None:
+                    rows = list(self._iterable_class(self))
+                    timeout = self._cache_timeout
+                    if timeout is None:
+                        timeout = getattr(settings, 'QUERY_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+                    cache.set(key, rows, timeout)
+                self._result_cache = rows
+        super()._fetch_all()
@@ -0,0 +1,237 @@
+"""
+Response cache for public read-only endpoints, with ETag and Last-Modified
+
+A cached view names the models its responses are built from. Each model has
+a version (see ``versions``), bumped whenever one of its rows is saved or deleted
+(see ``watch_models``), and the versions are part of every response's cache
+key: a change retires all responses built from that model at once, in every
+process, without finding them. Entries are also keyed on the normalized
+URL, the negotiated media type and the caller's scope (shared for public
+data, per user otherwise).
+
+Entries are read through ``tiered_cache``, so a popular response that
+expires is rebuilt by a single caller while the others are served the
+expired entry; views whose output also depends on the clock turn that off
+with a stale window of 0. Responses carry a strong ETag and a Last-Modified
+date, the last change to any of their models (for clock-dependent views,
+when the entry was built); a client repeating a request with If-None-Match
+(or If-Modified-Since) gets a 304 straight from the cache entry, without
+the view running.
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+from typing import Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, urlencode
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .tiered_cache import tiered_cache
+from .versions import bump_version, get_versions, version_cache
+
+KEY_PREFIX = 'response_cache'
+VERSION_KEY_PREFIX = f'{KEY_PREFIX}:version:'
+DEFAULT_TIMEOUT = 300
+
+CACHEABLE_METHODS = ('GET', 'HEAD')
+
+
+def version_key(model) -> str:
+    return f'{VERSION_KEY_PREFIX}{model._meta.label_lower}'
+
+
+def modified_key(model) -> str:
+    return f'{version_key(model)}:modified'
+
+
+def bump_versions(*models):
+    """Retire every cached response built from ``models``"""
+    now = time.time()
+    for model in models:
+        bump_version(version_key(model))
+        version_cache.set(modified_key(model), now, None)
+
+
+def last_modified(models: Iterable) -> Optional[int]:
+    """When one of ``models`` last changed, None if no change was recorded"""
+    times = version_cache.get_many([modified_key(model) for model in models]).values()
+    return int(max(times)) if times else None
+
+
+def _bump_sender_version(sender, **kwargs):
+    bump_versions(sender)
+
+
+def watch_models(*models):
+    """Bump a model's version whenever one of its rows is saved or deleted"""
+    for model in models:
+        uid = f'{KEY_PREFIX}:{model._meta.label_lower}'
+        post_save.connect(_bump_sender_version, sender=model, dispatch_uid=uid)
+        post_delete.connect(_bump_sender_version, sender=model, dispatch_uid=uid)
+
+
+def normalized_url(request) -> str:
+    """Path plus the non-empty query parameters in a stable order"""
+    params = sorted(
+        (name, value)
+        for name in request.query_params
+        for value in request.query_params.getlist(name)
+        if value != ''
+    )
+    return f'{request.path}?{urlencode(params)}' if params else request.path
+
+
+def cache_scope(request, public: bool) -> str:
+    if public:
+        return 'public'
+    user = request.user
+    return f'user:{user.pk}' if user.is_authenticated else 'anon'
+
+
+def accepted_media_type(request) -> str:
+    return getattr(request, 'accepted_media_type', '') or ''
+
+
+def response_cache_key(request, models: Iterable, public: bool) -> str:
+    keys = [version_key(model) for model in models]
+    versions = get_versions(keys)
+    signature = '|'.join([
+        normalized_url(request),
+        cache_scope(request, public),
+        accepted_media_type(request),
+        *(f'{key}={versions[key]}' for key in keys),
+    ])
+    return f'{KEY_PREFIX}:{hashlib.sha1(signature.encode("utf-8")).hexdigest()}'
+
+
+def make_entry(request, data, modified: Optional[int] = None) -> Dict:
+    """
+    Cache entry for response data; the ETag covers the negotiated media type
+
+    ``modified`` is when the data last changed, the current time by default.
+    """
+    body = json.dumps(data, cls=JSONEncoder, separators=(',', ':'))
+    digest = hashlib.sha1(f'{accepted_media_type(request)}\n{body}'.encode('utf-8')).hexdigest()
+    if modified is None:
+        modified = int(time.time())
+    return {'data': data, 'etag': f'"{digest}"', 'last_modified': modified}
+
+
+def is_not_modified(request, entry: Dict) -> bool:
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or entry['etag'] in etags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and entry['last_modified'] <= if_modified_since
+
+
+def add_validators(response, entry: Dict, public: bool):
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    # Clients may store the response but must revalidate before reusing it
+    patch_cache_control(response, no_cache=True, **({} if public else {'private': True}))
+    patch_vary_headers(response, ['Accept'] if public else ['Accept', 'Authorization'])
+    return response
+
+
+def cached_response(request, models: Iterable, build: Callable[[], Response],
+                    public: bool = True, timeout: Optional[int] = None,
+                    stale_timeout: Optional[int] = None) -> Response:
+    """
+    Serve ``build()``'s response from the cache, or a 304 when the client has it
+
+    Args:
+        request: DRF request, already authenticated
+        models: Models the response is built from
+        build: Runs the view; called only on a cache miss
+        public: Whether the response is the same for every caller
+        timeout: Seconds to keep the response (RESPONSE_CACHE_TIMEOUT by default)
+        stale_timeout: Further seconds an expired response is served while
+            one caller rebuilds it (``timeout`` by default); 0 for views whose
+            output depends on the clock, which then also date their
+            responses by when they were built
+
+    Returns:
+        Response with ETag and Last-Modified headers
+    """
+    if request.method not in CACHEABLE_METHODS:
+        return build()
+
+    built = {}
+
+    if timeout is None:
+        timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+    if stale_timeout is None:
+        # The key changes with the model versions, so an expired entry is
+        # still correct and can be served while one caller rebuilds it
+        stale_timeout = timeout
+
+    def build_entry():
+        # Read before building, so a change made meanwhile dates the entry later
+        modified = last_modified(models) if stale_timeout else None
+        response = built['response'] = build()
+        if response.status_code != status.HTTP_200_OK:
+            return None
+        return make_entry(request, response.data, modified)
+
+    key = response_cache_key(request, models, public)
+    entry = tiered_cache.get_or_set(key, build_entry, timeout, stale_timeout=stale_timeout)
+    if entry is None:
+        return built['response']
+
+    if is_not_modified(request, entry):
+        return add_validators(Response(status=status.HTTP_304_NOT_MODIFIED), entry, public)
+    response = built.get('response') or Response(entry['data'])
+    return add_validators(response, entry, public)
+
+
+def cache_response(*models, public: bool = True, timeout: Optional[int] = None,
+                   stale_timeout: Optional[int] = None):
+    """
+    Cache a function view's responses; place it below ``@api_view``
+
+    The view's models must also be passed to ``watch_models`` (normally in
+    the app's signals module) so that changes retire the cached responses.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            return cached_response(
+                request, models, lambda: view(request, *args, **kwargs), public, timeout, stale_timeout,
+            )
+        return wrapped
+    return decorator
+
+
+class CachedResponseMixin:
+    """
+    Caches the list and retrieve responses of a read-only viewset
+
+    Set ``cache_models`` to the models the responses are built from, and
+    ``cache_stale_timeout`` to 0 when they also depend on the clock.
+    """
+    cache_models = ()
+    cache_public = True
+    cache_timeout = None
+    cache_stale_timeout = None
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request, self.cache_models,
+            lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs),
+            self.cache_public, self.cache_timeout, self.cache_stale_timeout,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(
+            request, self.cache_models,
+            lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs),
+            self.cache_public, self.cache_timeout, self.cache_stale_timeout,
+        )
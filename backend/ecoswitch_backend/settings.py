@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'products',
     'ecommerce',
     'ecoscore',
+    'catalog',
 ]
 
 MIDDLEWARE = [
@@ -82,6 +83,49 @@ DATABASES = {
     }
 }
 
+# Cache
+# Versioned caches (API responses, query results, browse facets, catalog
+# indexes) rely on a cache shared by every process: Redis when CACHE_URL is
+# set, otherwise files under CACHE_DIR. ecoswitch_backend.tiered_cache keeps
+# hot entries in process memory in front of it. Their version counters and
+# locks live in the 'versions' alias, which is never culled
+# (ecoswitch_backend.versions); on Redis its keys have no expiry, so use a
+# maxmemory policy that only evicts keys with one (e.g. volatile-lru).
+CACHE_URL = config('CACHE_URL', default='')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'ecoswitch',
+        },
+        'versions': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'ecoswitch-versions',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / config('CACHE_DIR', default='.cache'),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+        'versions': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / config('VERSIONS_CACHE_DIR', default='.versions-cache'),
+            # One small file per counter or lock; never cull them
+            'OPTIONS': {'MAX_ENTRIES': 10 ** 9},
+        },
+    }
+
+# Seconds a cached API response is kept (ecoswitch_backend.response_cache)
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Seconds a .cached() query result is kept (ecoswitch_backend.query_cache)
+QUERY_CACHE_TIMEOUT = config('QUERY_CACHE_TIMEOUT', default=300, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -200,6 +244,16 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# EcoScore mapping rules (reloaded by workers when the document's version changes)
+ECOSCORE_MAPPING_RULES_PATH = BASE_DIR / config(
+    'ECOSCORE_MAPPING_RULES_PATH', default='ecoscore/data/mapping_rules.json'
+)
+ECOSCORE_MAPPING_RULES_CHECK_INTERVAL = config('ECOSCORE_MAPPING_RULES_CHECK_INTERVAL', default=5.0, cast=float)
+
+# Seconds an export watermark trails the export start, longer than any
+# transaction writing EcoScores (ecoscore.exports)
+ECOSCORE_EXPORT_WATERMARK_LAG = config('ECOSCORE_EXPORT_WATERMARK_LAG', default=300, cast=int)
+
 # Logging
 # Ensure logs directory exists for file handler
 LOG_DIR = BASE_DIR / 'logs'
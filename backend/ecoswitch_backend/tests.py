@@ -0,0 +1,372 @@
+"""
+Tests for keyset pagination, versions, the tiered, query and response caches
+and content-addressed media storage
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils.http import http_date, parse_http_date
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from customers.models import CustomerProfile
+from ecommerce.models import Brand, Category, Coupon
+from ecoscore.models import EcoInventProcess
+
+from .content_storage import BLOB_DIR, collect_garbage, content_storage, storage_name
+from .pagination import KeysetPagination, encode_cursor, keyset_filter
+from .query_cache import table_version_key
+from .response_cache import bump_versions, modified_key
+from .tiered_cache import TieredCache, tiered_cache
+from .versions import bump_version, get_version, get_versions, version_cache
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'backend-tests'},
+    'versions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'backend-tests-versions'},
+}
+
+
+class ProcessPagination(KeysetPagination):
+    sorts = {
+        'name': ('name', 'id'),
+        'category_desc': ('-category', '-id'),
+    }
+    default_sort = 'name'
+    page_size = 3
+    count_limit = 5
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Few distinct categories, so pages end in the middle of ties
+        for i in range(8):
+            EcoInventProcess.objects.create(
+                code=f'P{i}', name=f'Process {7 - i}', category=f'Category {i % 3}', unit='kg',
+            )
+
+    def paginate(self, params):
+        paginator = ProcessPagination()
+        request = Request(APIRequestFactory().get('/processes/', params))
+        rows = paginator.paginate_queryset(EcoInventProcess.objects.all(), request)
+        return paginator, rows
+
+    def walk(self, sort):
+        ids = []
+        params = {'sort': sort}
+        while True:
+            paginator, rows = self.paginate(params)
+            self.assertLessEqual(len(rows), 3)
+            ids.extend(row.pk for row in rows)
+            if not paginator.has_next:
+                return ids
+            params['cursor'] = encode_cursor(paginator.next_values)
+
+    def test_following_cursors_visits_every_row_once_in_order(self):
+        for sort, ordering in ProcessPagination.sorts.items():
+            with self.subTest(sort=sort):
+                expected = list(EcoInventProcess.objects.order_by(*ordering).values_list('pk', flat=True))
+                self.assertEqual(self.walk(sort), expected)
+
+    def test_cursor_keeps_its_place_when_rows_are_added_before_it(self):
+        paginator, first_page = self.paginate({'sort': 'name'})
+        EcoInventProcess.objects.create(code='P-new', name='Process 0 (new)', category='Category 0', unit='kg')
+
+        _, second_page = self.paginate({'sort': 'name', 'cursor': encode_cursor(paginator.next_values)})
+        self.assertEqual(
+            [row.name for row in first_page + second_page],
+            ['Process 0', 'Process 1', 'Process 2', 'Process 3', 'Process 4', 'Process 5'],
+        )
+
+    def test_keyset_filter_breaks_ties_on_later_fields(self):
+        process = EcoInventProcess.objects.order_by('-category', '-id')[1]
+        after = EcoInventProcess.objects.filter(
+            keyset_filter(('-category', '-id'), (process.category, process.pk))
+        ).order_by('-category', '-id')
+        expected = list(EcoInventProcess.objects.order_by('-category', '-id'))[2:]
+        self.assertEqual(list(after), expected)
+
+    def test_count_stops_at_the_limit(self):
+        paginator, _ = self.paginate({})
+        self.assertEqual((paginator.count, paginator.count_is_exact), (5, False))
+
+    def test_bad_sort_and_cursor_are_rejected(self):
+        with self.assertRaises(ValidationError):
+            self.paginate({'sort': 'price'})
+        with self.assertRaises(NotFound):
+            self.paginate({'cursor': 'not-a-cursor'})
+        with self.assertRaises(NotFound):
+            self.paginate({'cursor': encode_cursor(['Process 1'])})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        version_cache.clear()
+        user = get_user_model().objects.create_user(username='customer', email='customer@example.com')
+        self.profile = CustomerProfile.objects.create(user=user, city='Pune')
+
+    def cached_city(self):
+        return CustomerProfile.objects.cached().get(pk=self.profile.pk).city
+
+    def test_rows_are_read_through_the_cache(self):
+        self.assertEqual(self.cached_city(), 'Pune')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cached_city(), 'Pune')
+
+    def test_any_write_to_the_table_retires_cached_rows(self):
+        self.cached_city()
+
+        CustomerProfile.objects.filter(pk=self.profile.pk).update(city='Delhi')
+        self.assertEqual(self.cached_city(), 'Delhi')
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {CustomerProfile._meta.db_table} SET city = %s WHERE id = %s', ['Mumbai', self.profile.pk]
+            )
+        self.assertEqual(self.cached_city(), 'Mumbai')
+
+    def test_transaction_reads_its_own_writes_and_retires_on_commit(self):
+        self.cached_city()
+
+        with transaction.atomic():
+            CustomerProfile.objects.filter(pk=self.profile.pk).update(city='Delhi')
+            self.assertEqual(self.cached_city(), 'Delhi')
+        self.assertEqual(self.cached_city(), 'Delhi')
+
+        try:
+            with transaction.atomic():
+                CustomerProfile.objects.filter(pk=self.profile.pk).update(city='Chennai')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(self.cached_city(), 'Delhi')
+
+    def test_queries_joining_untracked_tables_are_not_cached(self):
+        queryset = CustomerProfile.objects.select_related('user').cached()
+        list(queryset.filter(pk=self.profile.pk))
+        with self.assertNumQueries(1):
+            list(queryset.filter(pk=self.profile.pk))
+
+    def test_each_transaction_bumps_a_table_once(self):
+        key = table_version_key(CustomerProfile._meta.db_table)
+        version = get_version(key)
+        with transaction.atomic():
+            for city in ('Delhi', 'Mumbai', 'Chennai'):
+                CustomerProfile.objects.filter(pk=self.profile.pk).update(city=city)
+            self.assertEqual(get_version(key), version)
+        self.assertEqual(get_version(key), version + 1)
+
+        try:
+            with transaction.atomic():
+                CustomerProfile.objects.filter(pk=self.profile.pk).update(city='Pune')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(get_version(key), version + 1)
+
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ResponseCacheTests(TestCase):
+    url = '/api/ecommerce/categories/'
+
+    def setUp(self):
+        cache.clear()
+        version_cache.clear()
+        tiered_cache.clear_local()
+        Category.objects.create(name='Home', slug='home')
+
+    def names(self, response):
+        data = response.json()
+        rows = data['results'] if isinstance(data, dict) else data
+        return [row['name'] for row in rows]
+
+    def test_repeated_request_is_served_from_cache_with_validators(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_saving_a_row_retires_cached_responses(self):
+        first = self.client.get(self.url)
+        Category.objects.create(name='Garden', slug='garden')
+
+        second = self.client.get(self.url)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertIn('Garden', self.names(second))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_bulk_writes_are_retired_by_bumping_versions(self):
+        self.client.get(self.url)
+        Category.objects.update(name='Living')
+        self.assertIn('Home', self.names(self.client.get(self.url)))
+
+        bump_versions(Category)
+        self.assertEqual(self.names(self.client.get(self.url)), ['Living'])
+
+    def test_versions_of_other_models_leave_responses_alone(self):
+        first = self.client.get(self.url)
+        Brand.objects.create(name='Leaf', slug='leaf')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url)['ETag'], first['ETag'])
+
+    def test_last_modified_is_the_last_data_change(self):
+        version_cache.set(modified_key(Category), 1_600_000_000.5, None)
+        first = self.client.get(self.url)
+        self.assertEqual(first['Last-Modified'], http_date(1_600_000_000))
+
+        # A rebuilt entry keeps the date as long as the data is unchanged
+        cache.clear()
+        tiered_cache.clear_local()
+        self.assertEqual(self.client.get(self.url)['Last-Modified'], first['Last-Modified'])
+        not_modified = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_clock_dependent_views_are_dated_when_built(self):
+        version_cache.set(modified_key(Coupon), 1_600_000_000, None)
+        response = self.client.get('/api/ecommerce/coupons/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(parse_http_date(response['Last-Modified']), int(time.time()) - 5)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class VersionTests(TestCase):
+    def setUp(self):
+        version_cache.clear()
+
+    def test_missing_counters_are_seeded_from_the_clock(self):
+        before = time.time_ns()
+        version = get_version('tests:a')
+        self.assertGreaterEqual(version, before)
+        self.assertEqual(get_version('tests:a'), version)
+        self.assertEqual(bump_version('tests:a'), version + 1)
+
+    def test_a_lost_counter_comes_back_newer(self):
+        version = bump_version('tests:a')
+        version_cache.clear()
+        self.assertGreater(get_version('tests:a'), version)
+        self.assertEqual(set(get_versions(['tests:a', 'tests:b'])), {'tests:a', 'tests:b'})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        version_cache.clear()
+        self.cache = TieredCache()
+        self.calls = []
+
+    def compute(self, value='value'):
+        def compute():
+            self.calls.append(value)
+            return value
+        return compute
+
+    def test_values_are_computed_once_and_kept_locally(self):
+        self.assertEqual(self.cache.get_or_set('key', self.compute(), 60), 'value')
+        cache.clear()
+        self.assertEqual(self.cache.get_or_set('key', self.compute('other'), 60), 'value')
+        self.assertEqual(self.calls, ['value'])
+
+        # Other processes only see the shared backend
+        self.assertEqual(TieredCache().get_or_set('key', self.compute('other'), 60), 'other')
+
+    def test_none_is_not_cached(self):
+        self.assertIsNone(self.cache.get_or_set('key', self.compute(None), 60))
+        self.assertIsNone(self.cache.get_or_set('key', self.compute(None), 60))
+        self.assertEqual(self.calls, [None, None])
+
+    def test_stale_value_is_served_while_another_caller_recomputes(self):
+        self.cache.get_or_set('key', self.compute('old'), 0, stale_timeout=60)
+        version_cache.add('key:computing', 1)
+        self.assertEqual(self.cache.get_or_set('key', self.compute('new'), 60), 'old')
+
+        version_cache.delete('key:computing')
+        self.assertEqual(self.cache.get_or_set('key', self.compute('new'), 60), 'new')
+        self.assertEqual(self.calls, ['old', 'new'])
+
+    def test_concurrent_misses_compute_once(self):
+        def slow():
+            time.sleep(0.1)
+            self.calls.append('value')
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get_or_set('key', slow, 60)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((results, self.calls), (['value'] * 4, ['value']))
+
+
+class ContentStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def blob_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(directory, file_name), content_storage.location).replace(os.sep, '/')
+            for directory, _, files in os.walk(content_storage.path(BLOB_DIR))
+            for file_name in files
+        )
+
+    def backdate(self, *names):
+        past = time.time() - 3600
+        for name in names:
+            os.utime(content_storage.path(name), (past, past))
+
+    def test_same_content_is_stored_once_under_its_hash(self):
+        digest = hashlib.sha256(b'leaf').hexdigest()
+        first = content_storage.save('product_images/leaf.PNG', ContentFile(b'leaf'))
+        second = content_storage.save('product_images/copy.png', ContentFile(b'leaf'))
+        other = content_storage.save('product_images/leaf.png', ContentFile(b'stem'))
+
+        self.assertEqual(first, f'blobs/{digest[:2]}/{digest}.png')
+        self.assertEqual(second, first)
+        self.assertNotEqual(other, first)
+        self.assertEqual(self.blob_files(), sorted([first, other]))
+        with content_storage.open(first, 'rb') as blob:
+            self.assertEqual(blob.read(), b'leaf')
+
+    def test_urls_map_back_to_stored_names(self):
+        self.assertEqual(storage_name('http://testserver/media/blobs/ab/ab12.jpg'), 'blobs/ab/ab12.jpg')
+        self.assertEqual(storage_name('/media/blobs/ab/a%20b.jpg'), 'blobs/ab/a b.jpg')
+        self.assertIsNone(storage_name('https://cdn.example.com/images/ab12.jpg'))
+
+    def test_garbage_collection_spares_referenced_and_recent_files(self):
+        kept = content_storage.save('a.png', ContentFile(b'kept'))
+        orphan = content_storage.save('b.png', ContentFile(b'orphan'))
+        self.backdate(kept, orphan)
+        recent = content_storage.save('c.png', ContentFile(b'recent'))
+
+        self.assertEqual(collect_garbage({kept}, min_age=60, dry_run=True), [orphan])
+        self.assertEqual(self.blob_files(), sorted([kept, orphan, recent]))
+        self.assertEqual(collect_garbage({kept}, min_age=60), [orphan])
+        self.assertEqual(self.blob_files(), sorted([kept, recent]))
+
+        # Storing an old blob's content again makes it recent
+        self.backdate(kept)
+        content_storage.save('d.png', ContentFile(b'kept'))
+        self.assertEqual(collect_garbage(set(), min_age=60), [])
@@ -0,0 +1,186 @@
+"""
+Two-level cache with single-flight recomputation and stale-while-revalidate
+
+Values live in the shared cache backend (Redis or the file cache, see
+CACHES) and, for a few seconds, in a bounded in-process LRU in front of it,
+so the hottest keys are served without leaving the process.
+
+``get_or_set`` protects expensive computations from stampedes:
+
+- A missing value is computed by one caller at a time. Threads of the same
+  process wait for the one computing it, other processes wait on a lock
+  key in the versions cache, and all of them pick up its result.
+- A value past its ``timeout`` but within ``stale_timeout`` is still
+  served. The first caller to notice recomputes it; everyone else gets the
+  stale value instead of waiting or piling onto the database.
+
+The in-process copies are not told about changes made elsewhere, so keys
+should embed a version (bumped on change) rather than rely on ``delete``
+when other processes must see a change at once.
+"""
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from django.core.cache import cache
+
+from .versions import version_cache
+
+logger = logging.getLogger(__name__)
+
+
+LOCAL_MAX_ENTRIES = 1000
+LOCAL_TIMEOUT = 10
+LOCK_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+
+
+class TieredCache:
+    """
+    Bounded in-process LRU in front of the shared cache backend
+    """
+
+    def __init__(self, backend=cache, lock_backend=None, local_max_entries: int = LOCAL_MAX_ENTRIES,
+                 local_timeout: float = LOCAL_TIMEOUT, lock_timeout: float = LOCK_TIMEOUT):
+        self.backend = backend
+        # Locks must not be culled along with values (see ecoswitch_backend.versions)
+        self.lock_backend = lock_backend or version_cache
+        self.local_max_entries = local_max_entries
+        self.local_timeout = local_timeout
+        self.lock_timeout = lock_timeout
+        # {key: (local expiry, pickled entry)}; entries are pickled so callers never share objects
+        self._local: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._flights: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def get_or_set(self, key: str, compute: Callable[[], Any], timeout: float, stale_timeout: float = 0) -> Any:
+        """
+        Cached value of ``key``, computed by ``compute()`` when missing or stale
+
+        Args:
+            key: Cache key
+            compute: Builds the value; a None result is returned but not cached
+            timeout: Seconds the value is fresh
+            stale_timeout: Further seconds the value may be served while one
+                caller recomputes it
+
+        Returns:
+            The cached or computed value
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            now = time.time()
+            if now < entry['fresh_until']:
+                return entry['value']
+            if now < entry['stale_until']:
+                if self._acquire(key):
+                    try:
+                        return self._compute(key, compute, timeout, stale_timeout)
+                    finally:
+                        self._release(key)
+                return entry['value']
+        return self._compute_once(key, compute, timeout, stale_timeout)
+
+    def delete(self, key: str):
+        """Drop ``key`` here and from the shared backend (other processes may keep it briefly)"""
+        with self._lock:
+            self._local.pop(key, None)
+        self.backend.delete(key)
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def _lookup(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            record = self._local.get(key)
+            if record is not None:
+                if now < record[0]:
+                    self._local.move_to_end(key)
+                    return pickle.loads(record[1])
+                del self._local[key]
+
+        entry = self.backend.get(key)
+        if entry is not None and now < entry['stale_until']:
+            self._store_local(key, entry)
+            return entry
+        return None
+
+    def _store_local(self, key: str, entry: Dict):
+        expires = min(entry['stale_until'], time.time() + self.local_timeout)
+        payload = pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[key] = (expires, payload)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+
+    def _compute(self, key: str, compute: Callable[[], Any], timeout: float, stale_timeout: float) -> Any:
+        started = time.time()
+        value = compute()
+        if value is None:
+            return None
+        entry = {'value': value, 'fresh_until': started + timeout, 'stale_until': started + timeout + stale_timeout}
+        self.backend.set(key, entry, timeout + stale_timeout)
+        self._store_local(key, entry)
+        return value
+
+    def _compute_once(self, key: str, compute: Callable[[], Any], timeout: float, stale_timeout: float) -> Any:
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            if self._acquire(key):
+                try:
+                    # The previous holder may have stored it while we waited
+                    entry = self._lookup(key)
+                    if entry is not None and time.time() < entry['fresh_until']:
+                        return entry['value']
+                    return self._compute(key, compute, timeout, stale_timeout)
+                finally:
+                    self._release(key)
+
+            if time.monotonic() >= deadline:
+                logger.warning(f"Gave up waiting for {key} to be computed elsewhere")
+                return self._compute(key, compute, timeout, stale_timeout)
+            self._wait(key)
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry['value']
+
+    def _lock_key(self, key: str) -> str:
+        return f'{key}:computing'
+
+    def _acquire(self, key: str) -> bool:
+        """Become the one caller, across threads and processes, computing ``key``"""
+        with self._lock:
+            if key in self._flights:
+                return False
+            self._flights[key] = threading.Event()
+        if self.lock_backend.add(self._lock_key(key), 1, self.lock_timeout):
+            return True
+        self._end_flight(key)
+        return False
+
+    def _release(self, key: str):
+        self.lock_backend.delete(self._lock_key(key))
+        self._end_flight(key)
+
+    def _end_flight(self, key: str):
+        with self._lock:
+            flight = self._flights.pop(key, None)
+        if flight is not None:
+            flight.set()
+
+    def _wait(self, key: str):
+        with self._lock:
+            flight = self._flights.get(key)
+        if flight is not None:
+            flight.wait(self.lock_timeout)
+        else:
+            time.sleep(POLL_INTERVAL)
+
+
+tiered_cache = TieredCache()
@@ -14,6 +14,7 @@ urlpatterns = [
     path('api/products/', include('products.urls')),
     path('api/ecommerce/', include('ecommerce.urls')),
     path('api/ecoscore/', include('ecoscore.urls')),
+    path('api/catalog/', include('catalog.urls')),
 ]
 
 if settings.DEBUG:
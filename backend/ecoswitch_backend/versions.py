@@ -0,0 +1,56 @@
+"""
+Version counters and locks shared by every process
+
+Cached values are retired by bumping a version that is part of their keys
+(response, query and facet caches, the category tree, catalog indexes,
+recommendations). These counters and the single-flight locks of
+``tiered_cache`` live in their own cache alias (``VERSIONS_CACHE``), which
+holds small keys and is never culled: evicting a counter along with the
+cached values could bring back a version some entry was cached under. The
+product view counts buffered by ``products.trending`` are kept there too.
+
+A counter that is missing anyway (first use, or a cleared cache) starts at
+``time.time_ns()``, newer than any value it can have had before, and
+readers seed it the same way, so every process agrees on it.
+
+Counters and locks are only atomic across processes on Redis (``CACHE_URL``);
+with the file cache, two processes bumping at the same instant may both
+store the same value.
+"""
+import time
+from typing import Dict, Iterable
+
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+VERSIONS_CACHE = 'versions'
+
+# Like django.core.cache.cache: the current thread's connection to the alias
+version_cache = ConnectionProxy(caches, VERSIONS_CACHE)
+
+
+def get_versions(keys: Iterable[str]) -> Dict[str, int]:
+    """Current value of each counter, seeding missing ones"""
+    keys = list(keys)
+    versions = version_cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        initial = time.time_ns()
+        for key in missing:
+            # Another process may seed it first; everyone then reads its value
+            version_cache.add(key, initial, None)
+        versions.update(version_cache.get_many(missing))
+    return versions
+
+
+def get_version(key: str) -> int:
+    return get_versions([key])[key]
+
+
+def bump_version(key: str) -> int:
+    """Advance a counter by one, retiring everything cached under its current value"""
+    try:
+        return version_cache.incr(key)
+    except ValueError:
+        version_cache.add(key, time.time_ns(), None)
+        return version_cache.incr(key)
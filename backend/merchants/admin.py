@@ -18,6 +18,7 @@ class MerchantProductAdmin(admin.ModelAdmin):
     search_fields = ('name', 'merchant__business_name', 'brand', 'sku')
     raw_id_fields = ('merchant',)
     readonly_fields = ('created_at', 'updated_at')
+    exclude = ('normalized_tags',)  # Synced from tags on save
 
 
 @admin.register(MerchantOrder)
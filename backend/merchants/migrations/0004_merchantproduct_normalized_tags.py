@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_tag_product_normalized_tags'),
+        ('merchants', '0003_merchantproduct_ecoscore_calculation_version_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='merchantproduct',
+            name='normalized_tags',
+            field=models.ManyToManyField(blank=True, related_name='merchant_products', to='products.tag'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merchants', '0004_merchantproduct_normalized_tags'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='merchantproduct',
+            index=models.Index(fields=['is_active', 'created_at', 'id'], name='mproduct_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='merchantproduct',
+            index=models.Index(fields=['is_active', 'price', 'id'], name='mproduct_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='merchantproduct',
+            index=models.Index(fields=['is_active', 'ecoscore_value', 'id'], name='mproduct_active_ecoscore_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='merchantproduct',
+            index=models.Index(fields=['is_active', 'name', 'id'], name='mproduct_active_name_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:24
+
+from django.db import migrations, models
+import ecoswitch_backend.content_storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merchants', '0006_merchantproduct_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='merchantproduct',
+            name='primary_image',
+            field=models.ImageField(blank=True, storage=ecoswitch_backend.content_storage.ContentAddressedStorage(), upload_to='product_images/'),
+        ),
+    ]
@@ -2,6 +2,9 @@ from django.db import models
 from django.conf import settings
 from django.core.validators import RegexValidator
 
+from ecoswitch_backend.content_storage import content_storage
+from ecoswitch_backend.query_cache import CachedQuerySet
+
 
 class MerchantProfile(models.Model):
     """
@@ -63,11 +66,13 @@ class MerchantProduct(models.Model):
     # Product Details
     brand = models.CharField(max_length=100)
     tags = models.JSONField(default=list, blank=True)
+    normalized_tags = models.ManyToManyField('products.Tag', related_name='merchant_products', blank=True)  # Synced from tags on save
     specifications = models.JSONField(default=dict, blank=True)
     
     # Images
-    primary_image = models.ImageField(upload_to='product_images/', blank=True)
+    primary_image = models.ImageField(upload_to='product_images/', storage=content_storage, blank=True)
     additional_images = models.JSONField(default=list, blank=True)
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)  # Derivatives of primary_image (products.thumbnails)
     
     # Inventory
     stock_quantity = models.PositiveIntegerField(default=0)
@@ -102,8 +107,17 @@ class MerchantProduct(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CachedQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
+        # Back the named sorts of shop browsing (see customers.pagination)
+        indexes = [
+            models.Index(fields=['is_active', 'created_at', 'id'], name='mproduct_active_created_idx'),
+            models.Index(fields=['is_active', 'price', 'id'], name='mproduct_active_price_idx'),
+            models.Index(fields=['is_active', 'ecoscore_value', 'id'], name='mproduct_active_ecoscore_idx'),
+            models.Index(fields=['is_active', 'name', 'id'], name='mproduct_active_name_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.merchant.business_name}"
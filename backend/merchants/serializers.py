@@ -1,4 +1,6 @@
 from rest_framework import serializers
+
+from products.thumbnails import ThumbnailSrcsetField
 from .models import MerchantProfile, MerchantProduct, MerchantOrder, OrderItem, MerchantAnalytics
 
 
@@ -21,10 +23,12 @@ class MerchantProductSerializer(serializers.ModelSerializer):
     Serializer for merchant products
     """
     merchant_business_name = serializers.CharField(source='merchant.business_name', read_only=True)
+    normalized_tags = serializers.SlugRelatedField(many=True, read_only=True, slug_field='name')
+    primary_image_srcset = ThumbnailSrcsetField('primary_image')
     
     class Meta:
         model = MerchantProduct
-        fields = '__all__'
+        exclude = ('thumbnails',)
         read_only_fields = ('merchant', 'created_at', 'updated_at')
 
 
@@ -0,0 +1,31 @@
+"""
+Signal handlers for merchant products
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from customers.browse import invalidate_facets
+from products.tags import sync_tags
+from products.thumbnails import schedule_thumbnails
+from .models import MerchantProduct
+
+
+@receiver(post_save, sender=MerchantProduct)
+def sync_merchant_product_tags(sender, instance, raw=False, **kwargs):
+    """Link a saved merchant product to the normalized form of its tags"""
+    if not raw:
+        sync_tags(instance)
+
+
+@receiver(post_save, sender=MerchantProduct)
+@receiver(post_delete, sender=MerchantProduct)
+def invalidate_merchant_product_facets(sender, instance, **kwargs):
+    """Shop facet counts change with any merchant product"""
+    invalidate_facets()
+
+
+@receiver(post_save, sender=MerchantProduct)
+def update_merchant_product_thumbnails(sender, instance, raw=False, **kwargs):
+    """Make thumbnails of a new or replaced primary image"""
+    if not raw:
+        schedule_thumbnails(instance)
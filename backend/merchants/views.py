@@ -11,6 +11,7 @@ from .serializers import (
     MerchantProfileSerializer, MerchantProductSerializer, MerchantOrderSerializer,
     OrderItemSerializer, MerchantAnalyticsSerializer
 )
+from products.tags import filter_by_tags
 
 
 class MerchantProfileViewSet(viewsets.ModelViewSet):
@@ -54,6 +55,11 @@ class MerchantProductViewSet(viewsets.ModelViewSet):
         if category:
             queryset = queryset.filter(category__iexact=category)
         
+        # Filter by tags (every tag must match)
+        tags = self.request.query_params.getlist('tag')
+        if tags:
+            queryset = filter_by_tags(queryset, tags)
+        
         # Filter by status
         is_active = self.request.query_params.get('is_active', None)
         if is_active is not None:
@@ -132,6 +138,7 @@ class MerchantProductViewSet(viewsets.ModelViewSet):
             tags=original_product.tags,
             specifications=original_product.specifications,
             primary_image=original_product.primary_image,
+            thumbnails=original_product.thumbnails,  # Same image file, same derivatives
             additional_images=original_product.additional_images,
             stock_quantity=0,  # Start with 0 stock
             min_order_quantity=original_product.min_order_quantity,
@@ -158,7 +165,7 @@ class MerchantProductViewSet(viewsets.ModelViewSet):
         Get all categories used by merchant products
         """
         merchant_profile = get_object_or_404(MerchantProfile, user=self.request.user)
-        categories = MerchantProduct.objects.filter(merchant=merchant_profile).values_list('category', flat=True).distinct()
+        categories = MerchantProduct.objects.filter(merchant=merchant_profile).values_list('category', flat=True).order_by('category').distinct().cached()
         return Response({'categories': list(categories)})
     
     @action(detail=False, methods=['get'])
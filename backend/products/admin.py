@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Category, Subcategory, Brand, Product, ProductReview, ProductImage, ProductVariant, ProductRecommendation
+from .models import (
+    Category, Subcategory, Brand, Tag, Product, ProductReview, ProductViewCount,
+    ProductImage, ProductVariant, ProductRecommendation, ProductSimilarity
+)
 
 
 @admin.register(Category)
@@ -29,6 +32,13 @@ class BrandAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
 
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'created_at')
+    search_fields = ('name',)
+    readonly_fields = ('created_at',)
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'brand', 'category', 'price', 'stock_quantity', 'is_active', 'is_featured', 'created_at')
@@ -36,7 +46,12 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ('name', 'description', 'sku', 'brand__name', 'category__name')
     prepopulated_fields = {'slug': ('name',)}
     raw_id_fields = ('brand', 'category', 'subcategory')
-    readonly_fields = ('created_at', 'updated_at')
+    # Rating summary and trending score are maintained by products.ratings and products.trending
+    readonly_fields = (
+        'created_at', 'updated_at', 'trending_score', 'avg_rating', 'rating_sum', 'rating_count',
+        'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+    )
+    exclude = ('normalized_tags',)  # Synced from tags on save
 
 
 @admin.register(ProductReview)
@@ -48,6 +63,14 @@ class ProductReviewAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
 
 
+@admin.register(ProductViewCount)
+class ProductViewCountAdmin(admin.ModelAdmin):
+    list_display = ('product', 'date', 'count')
+    list_filter = ('date',)
+    search_fields = ('product__name',)
+    raw_id_fields = ('product',)
+
+
 @admin.register(ProductImage)
 class ProductImageAdmin(admin.ModelAdmin):
     list_display = ('product', 'alt_text', 'sort_order', 'created_at')
@@ -74,3 +97,10 @@ class ProductRecommendationAdmin(admin.ModelAdmin):
     raw_id_fields = ('user', 'product')
     readonly_fields = ('created_at',)
 
+
+@admin.register(ProductSimilarity)
+class ProductSimilarityAdmin(admin.ModelAdmin):
+    list_display = ('product', 'rank', 'similar_product', 'score', 'created_at')
+    search_fields = ('product__name', 'similar_product__name')
+    raw_id_fields = ('product', 'similar_product')
+    readonly_fields = ('created_at',)
@@ -0,0 +1,49 @@
+"""
+Management command to build the normalized tag index for existing products
+"""
+from django.core.management.base import BaseCommand
+from merchants.models import MerchantProduct
+from products.models import Product
+from products.tags import sync_tags
+
+
+class Command(BaseCommand):
+    help = 'Link every Product and MerchantProduct to the normalized form of its JSON tags'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Products loaded per batch (default 500)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+
+        for label, model in (('products', Product), ('merchant products', MerchantProduct)):
+            self.stdout.write(f'Backfilling tags for {label}...')
+            processed, changed = self._backfill(model, batch_size)
+            self.stdout.write(f'{processed} {label} checked, {changed} updated')
+
+        self.stdout.write(self.style.SUCCESS('Tag backfill completed successfully!'))
+
+    def _backfill(self, model, batch_size):
+        processed = 0
+        changed = 0
+        last_id = 0
+        while True:
+            batch = list(
+                model.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .only('id', 'tags')
+                .prefetch_related('normalized_tags')[:batch_size]
+            )
+            if not batch:
+                return processed, changed
+
+            for instance in batch:
+                if sync_tags(instance):
+                    changed += 1
+            processed += len(batch)
+            last_id = batch[-1].id
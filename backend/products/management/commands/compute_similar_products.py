@@ -0,0 +1,58 @@
+"""
+Management command to precompute content-based similar products
+"""
+from django.core.management.base import BaseCommand, CommandError
+from products.similarity import DEFAULT_BLOCK_SIZE, DEFAULT_MIN_SCORE, DEFAULT_TOP_K, compute_similar_products
+
+
+class Command(BaseCommand):
+    help = 'Store the TF-IDF nearest neighbours of every active product (run after catalog changes, e.g. nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=DEFAULT_TOP_K,
+            help=f'Neighbours kept per product (default {DEFAULT_TOP_K})',
+        )
+        parser.add_argument(
+            '--block-size',
+            type=int,
+            default=DEFAULT_BLOCK_SIZE,
+            help=f'Products compared against the catalog per block (default {DEFAULT_BLOCK_SIZE})',
+        )
+        parser.add_argument(
+            '--min-score',
+            type=float,
+            default=DEFAULT_MIN_SCORE,
+            help=f'Minimum cosine similarity of a stored neighbour (default {DEFAULT_MIN_SCORE:g})',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Worker processes computing blocks in parallel (default 1)',
+        )
+
+    def handle(self, *args, **options):
+        if options['top_k'] < 1:
+            raise CommandError('--top-k must be at least 1')
+        if options['block_size'] < 1:
+            raise CommandError('--block-size must be at least 1')
+        if not 0 <= options['min_score'] <= 1:
+            raise CommandError('--min-score must be between 0 and 1')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
+        self.stdout.write('Computing similar products...')
+        result = compute_similar_products(
+            top_k=options['top_k'],
+            block_size=options['block_size'],
+            min_score=options['min_score'],
+            workers=options['workers'],
+        )
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write(self.style.SUCCESS('Similar products updated'))
+        self.stdout.write(f'Products processed: {result["products"]}')
+        self.stdout.write(f'Neighbours stored: {result["neighbours"]}')
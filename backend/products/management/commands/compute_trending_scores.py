@@ -0,0 +1,49 @@
+"""
+Management command to recompute time-decayed product trending scores
+"""
+from django.core.management.base import BaseCommand, CommandError
+from products.trending import HALF_LIFE_DAYS, WINDOW_DAYS, compute_trending_scores, prune_view_counts
+
+
+class Command(BaseCommand):
+    help = 'Score products from recent sales, reviews and views (run on a schedule, e.g. hourly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--half-life',
+            type=float,
+            default=HALF_LIFE_DAYS,
+            help=f'Days after which activity counts half (default {HALF_LIFE_DAYS:g})',
+        )
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=WINDOW_DAYS,
+            help=f'Ignore activity older than this many days (default {WINDOW_DAYS})',
+        )
+        parser.add_argument(
+            '--prune-views',
+            action='store_true',
+            help='Delete daily view counts older than the window afterwards',
+        )
+
+    def handle(self, *args, **options):
+        if options['half_life'] <= 0:
+            raise CommandError('--half-life must be positive')
+        if options['window'] < 1:
+            raise CommandError('--window must be at least 1 day')
+
+        self.stdout.write('Computing trending scores...')
+        result = compute_trending_scores(half_life_days=options['half_life'], window_days=options['window'])
+
+        pruned = 0
+        if options['prune_views']:
+            pruned = prune_view_counts(window_days=options['window'])
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write(self.style.SUCCESS('Trending scores updated'))
+        self.stdout.write(f'Buffered views flushed: {result["views"]}')
+        self.stdout.write(f'Products scored: {result["scored"]}')
+        self.stdout.write(f'Products reset to zero: {result["reset"]}')
+        if options['prune_views']:
+            self.stdout.write(f'Daily view counts pruned: {pruned}')
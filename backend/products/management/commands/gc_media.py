@@ -0,0 +1,40 @@
+"""
+Management command to delete product media files no row references
+"""
+from django.core.management.base import BaseCommand, CommandError
+from ecoswitch_backend.content_storage import collect_garbage, referenced_blobs
+from products.thumbnails import referenced_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Delete content-addressed image blobs and thumbnails that no product references any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            type=float,
+            default=24,
+            help='Keep files younger than this many hours, which may belong to uploads in progress (default: 24)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the files that would be deleted without deleting them',
+        )
+
+    def handle(self, *args, **options):
+        if options['min_age'] < 0:
+            raise CommandError('--min-age cannot be negative')
+
+        self.stdout.write('Collecting referenced media...')
+        referenced = referenced_blobs() | referenced_derivatives()
+        deleted = collect_garbage(referenced, min_age=options['min_age'] * 3600, dry_run=options['dry_run'])
+
+        if options['dry_run']:
+            for name in deleted:
+                self.stdout.write(f'  {name}')
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write(self.style.SUCCESS('Media garbage collection completed'))
+        self.stdout.write(f'Referenced files: {len(referenced)}')
+        self.stdout.write(f"{'Deletable' if options['dry_run'] else 'Deleted'} files: {len(deleted)}")
@@ -0,0 +1,48 @@
+"""
+Management command to make thumbnails of existing product images
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from products.thumbnails import TARGETS, backfill_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Make the WebP/JPEG thumbnails of product images that do not have current ones (run after imports)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            action='append',
+            choices=sorted(TARGETS),
+            help='Image field to process: merchant, product or shop (repeatable; default all)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes resizing images in parallel (default: number of CPUs)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate thumbnails that are already current',
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
+        self.stdout.write('Generating thumbnails...')
+        results = backfill_thumbnails(
+            target_names=options['target'],
+            workers=options['workers'],
+            force=options['force'],
+        )
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write(self.style.SUCCESS('Thumbnails updated'))
+        for target_name, counts in results.items():
+            self.stdout.write(
+                f'{target_name}: {counts["written"]} of {counts["images"]} images, {counts["failed"]} failed'
+            )
@@ -0,0 +1,25 @@
+"""
+Management command to recompute product rating summaries from reviews
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from ecommerce.models import Product as EcommerceProduct, ProductReview as EcommerceProductReview
+from products.models import Product, ProductReview
+from products.ratings import rebuild_rating_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute rating_sum, rating_count, the star histogram and avg_rating for every product'
+
+    def handle(self, *args, **options):
+        summaries = (
+            ('products', Product, ProductReview, {}),
+            ('ecommerce products', EcommerceProduct, EcommerceProductReview, {'is_approved': True}),
+        )
+        for label, product_model, review_model, review_filters in summaries:
+            self.stdout.write(f'Rebuilding rating summaries for {label}...')
+            with transaction.atomic():
+                updated = rebuild_rating_summaries(product_model, review_model, **review_filters)
+            self.stdout.write(f'{updated} {label} updated')
+
+        self.stdout.write(self.style.SUCCESS('Rating summaries rebuilt successfully!'))
@@ -0,0 +1,23 @@
+"""
+Management command to rebuild the product full-text search index
+"""
+from django.core.management.base import BaseCommand
+from products.search import get_search_backend, reset_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index from the products table'
+
+    def handle(self, *args, **options):
+        reset_search_backend()
+        backend = get_search_backend()
+
+        if not backend.stored_index:
+            self.stdout.write(
+                self.style.WARNING(f'Search backend {backend.name} keeps no stored index, nothing to rebuild')
+            )
+            return
+
+        self.stdout.write(f'Rebuilding product search index ({backend.name})...')
+        count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} products'))
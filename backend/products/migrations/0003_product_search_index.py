@@ -0,0 +1,52 @@
+from django.db import migrations
+
+
+FTS_TABLE = 'products_product_fts'
+
+
+def create_search_index(apps, schema_editor):
+    """Create and fill the FTS5 index on SQLite; other databases need no table"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if not cursor.fetchone()[0]:
+            return
+
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "name, brand, tags, description, "
+        "tokenize = 'porter unicode61 remove_diacritics 2')"
+    )
+
+    Product = apps.get_model('products', 'Product')
+    rows = []
+    for product in Product.objects.select_related('brand').iterator(chunk_size=500):
+        tags = product.tags or []
+        if isinstance(tags, (list, tuple)):
+            tags = ' '.join(str(tag) for tag in tags)
+        rows.append([product.pk, product.name, product.brand.name, str(tags), product.description or ''])
+
+    if rows:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, brand, tags, description) VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_ecoscore_calculation_version_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
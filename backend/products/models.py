@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 
+from ecoswitch_backend.content_storage import content_storage
+
 
 class Category(models.Model):
     """
@@ -66,7 +68,43 @@ class Brand(models.Model):
         return self.name
 
 
-class Product(models.Model):
+class Tag(models.Model):
+    """
+    Normalized tag shared by catalog and merchant products
+    """
+    name = models.CharField(max_length=100, unique=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+class RatingSummary(models.Model):
+    """
+    Review rating counters kept current by products.ratings
+    """
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    avg_rating = models.FloatField(default=0.0)  # rating_sum / rating_count, 0 without reviews
+    
+    class Meta:
+        abstract = True
+    
+    @property
+    def rating_histogram(self):
+        return {rating: getattr(self, f'rating_{rating}') for rating in range(1, 6)}
+
+
+class Product(RatingSummary):
     """
     Main product model
     """
@@ -88,12 +126,14 @@ class Product(models.Model):
     # Product Details
     sku = models.CharField(max_length=100, unique=True)
     tags = models.JSONField(default=list, blank=True)
+    normalized_tags = models.ManyToManyField(Tag, related_name='products', blank=True)  # Synced from tags on save
     specifications = models.JSONField(default=dict, blank=True)
     features = models.JSONField(default=list, blank=True)
     
     # Images
-    primary_image = models.ImageField(upload_to='product_images/')
+    primary_image = models.ImageField(upload_to='product_images/', storage=content_storage)
     additional_images = models.JSONField(default=list, blank=True)
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)  # Derivatives of primary_image (products.thumbnails)
     
     # Inventory
     stock_quantity = models.PositiveIntegerField(default=0)
@@ -131,6 +171,9 @@ class Product(models.Model):
     is_featured = models.BooleanField(default=False)
     is_bestseller = models.BooleanField(default=False)
     
+    # Time-decayed sales, review and view activity (see products.trending)
+    trending_score = models.FloatField(default=0.0)
+    
     # SEO
     meta_title = models.CharField(max_length=200, blank=True)
     meta_description = models.TextField(blank=True)
@@ -141,6 +184,17 @@ class Product(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        # Back the named sorts of product search (see products.pagination)
+        indexes = [
+            models.Index(fields=['is_active', 'created_at', 'id'], name='product_active_created_idx'),
+            models.Index(fields=['is_active', 'price', 'id'], name='product_active_price_idx'),
+            models.Index(fields=['is_active', 'ecoscore_value', 'id'], name='product_active_ecoscore_idx'),
+            models.Index(fields=['is_active', 'sustainability_score', 'id'], name='product_active_sustain_idx'),
+            models.Index(fields=['is_active', 'name', 'id'], name='product_active_name_idx'),
+            models.Index(fields=['is_active', 'avg_rating', 'id'], name='product_active_rating_idx'),
+            models.Index(fields=['is_active', 'trending_score', 'id'], name='product_active_trending_idx'),
+            models.Index(fields=['category', 'is_active', 'trending_score'], name='product_category_trending_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -179,12 +233,28 @@ class ProductReview(models.Model):
         return f"{self.product.name} - {self.user.email} - {self.rating} stars"
 
 
+class ProductViewCount(models.Model):
+    """
+    Daily product detail views, an input to the trending score
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='view_counts')
+    date = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['product', 'date']
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f"{self.product.name} - {self.date}: {self.count} views"
+
+
 class ProductImage(models.Model):
     """
     Additional product images
     """
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='product_images/')
+    image = models.ImageField(upload_to='product_images/', storage=content_storage)
     alt_text = models.CharField(max_length=200, blank=True)
     sort_order = models.PositiveIntegerField(default=0)
     
@@ -260,3 +330,25 @@ class ProductRecommendation(models.Model):
 
 
 
+
+
+class ProductSimilarity(models.Model):
+    """
+    Precomputed content-based neighbours of a product (see products.similarity)
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similarities')
+    similar_product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()  # Cosine similarity, 0.0 to 1.0
+    rank = models.PositiveSmallIntegerField()
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['product', 'similar_product']
+        ordering = ['product', 'rank']
+        indexes = [
+            models.Index(fields=['product', 'rank'], name='product_similarity_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name} ~ {self.similar_product.name} ({self.score:.2f})"
@@ -0,0 +1,22 @@
+"""
+Pagination for product listings
+"""
+from ecoswitch_backend.pagination import RankedIdPagination
+
+
+class ProductSearchPagination(RankedIdPagination):
+    """
+    Named sorts for product search, each backed by an index on Product
+    """
+    sorts = {
+        'newest': ('-created_at', '-id'),
+        'price_asc': ('price', 'id'),
+        'price_desc': ('-price', '-id'),
+        'ecoscore': ('-ecoscore_value', '-id'),
+        'sustainability': ('-sustainability_score', '-id'),
+        'rating': ('-avg_rating', '-id'),
+        'name': ('name', 'id'),
+    }
+    default_sort = 'newest'
+    relevance_sort = 'relevance'
+    max_page_size = 50
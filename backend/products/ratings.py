@@ -0,0 +1,124 @@
+"""
+Denormalized rating summaries on products
+
+Each product carries ``rating_sum``, ``rating_count``, a ``rating_1`` ..
+``rating_5`` histogram and the derived ``avg_rating``. Review signals apply
+each change as a single ``UPDATE`` of F-expressions, so concurrent reviews
+never lose increments; ``rebuild_rating_summaries`` recomputes everything
+from the reviews when the counters have drifted (bulk updates, raw SQL).
+"""
+from typing import Optional, Tuple
+
+from django.db.models import (
+    Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When
+)
+from django.db.models.functions import Cast, Coalesce
+
+from ecoswitch_backend.response_cache import bump_versions
+
+
+RATING_VALUES = range(1, 6)
+
+# (product_id, rating) of a review as it counts towards a summary
+RatingEntry = Tuple[int, int]
+
+
+def histogram_field(rating: int) -> str:
+    return f'rating_{rating}'
+
+
+def average_expression(sum_delta: int = 0, count_delta: int = 0):
+    """
+    ``avg_rating`` from the stored sum and count plus pending deltas
+
+    In an UPDATE the right hand side sees the row's old values, so the
+    deltas keep this consistent with the counters updated alongside it.
+    """
+    count = F('rating_count') + count_delta
+    return Case(
+        When(**{'rating_count__gt': -count_delta}, then=(
+            Cast(F('rating_sum') + sum_delta, FloatField()) / Cast(count, FloatField())
+        )),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def stored_rating_entry(review_model, review_id, **review_filters) -> Optional[RatingEntry]:
+    """
+    Entry of a review as currently stored, read before a save overwrites it
+
+    Returns None for unsaved reviews and ones not matching ``review_filters``.
+    """
+    if review_id is None:
+        return None
+    row = review_model.objects.filter(pk=review_id, **review_filters).values_list('product_id', 'rating').first()
+    return tuple(row) if row else None
+
+
+def apply_rating_change(product_model, before: Optional[RatingEntry], after: Optional[RatingEntry]):
+    """
+    Move one review's contribution from ``before`` to ``after``
+
+    Either side is None when the review did not count (new, deleted or,
+    for moderated reviews, unapproved).
+    """
+    if before == after:
+        return
+
+    deltas = {}
+    for entry, sign in ((before, -1), (after, 1)):
+        if entry is None:
+            continue
+        product_id, rating = entry
+        delta = deltas.setdefault(product_id, {'sum': 0, 'count': 0, 'histogram': {}})
+        delta['sum'] += sign * rating
+        delta['count'] += sign
+        field = histogram_field(rating)
+        delta['histogram'][field] = delta['histogram'].get(field, 0) + sign
+
+    for product_id, delta in deltas.items():
+        updates = {
+            field: F(field) + change
+            for field, change in delta['histogram'].items() if change
+        }
+        if delta['sum'] or delta['count']:
+            updates['rating_sum'] = F('rating_sum') + delta['sum']
+            updates['rating_count'] = F('rating_count') + delta['count']
+            updates['avg_rating'] = average_expression(delta['sum'], delta['count'])
+        if updates:
+            product_model.objects.filter(pk=product_id).update(**updates)
+    # The updates bypass post_save, so retire cached product responses here
+    bump_versions(product_model)
+
+
+def rebuild_rating_summaries(product_model, review_model, **review_filters) -> int:
+    """
+    Recompute every product's rating summary from its reviews
+
+    Args:
+        product_model: Product model carrying the summary fields
+        review_model: Review model with ``product`` and ``rating``
+        review_filters: Restrict the reviews that count, e.g. is_approved=True
+
+    Returns:
+        Number of products updated
+    """
+    reviews = review_model.objects.filter(product=OuterRef('pk'), **review_filters).order_by().values('product')
+
+    def aggregate(queryset, expression):
+        return Coalesce(
+            Subquery(queryset.annotate(value=expression).values('value'), output_field=IntegerField()),
+            Value(0),
+        )
+
+    updates = {
+        'rating_sum': aggregate(reviews, Sum('rating')),
+        'rating_count': aggregate(reviews, Count('id')),
+    }
+    for rating in RATING_VALUES:
+        updates[histogram_field(rating)] = aggregate(reviews.filter(rating=rating), Count('id'))
+
+    updated = product_model.objects.update(**updates)
+    product_model.objects.update(avg_rating=average_expression())
+    return updated
@@ -0,0 +1,261 @@
+"""
+Full-text search over products
+
+``get_search_backend()`` picks the implementation for the default database:
+an FTS5 index on SQLite, ranked with BM25, and a tsvector/SearchRank
+backend on PostgreSQL. Other databases (or SQLite builds without FTS5) fall
+back to the ``icontains`` scan. Every backend returns product ids best
+match first, optionally among the rows of a filtered product queryset, so
+filters apply before the result limit; the index is kept in sync by
+``products.signals``.
+"""
+import logging
+import re
+from typing import Iterable, List, Optional
+
+from django.db import DatabaseError, connection
+from django.db.models import Q
+
+from .models import Product
+from .tags import normalize_tag
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_RESULT_LIMIT = 1000
+
+FTS_TABLE = 'products_product_fts'
+
+# BM25 column weights: name, brand, tags, description
+FTS_WEIGHTS = (10.0, 6.0, 4.0, 1.0)
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def product_document(product: Product) -> dict:
+    """Text indexed for a product"""
+    tags = product.tags or []
+    if isinstance(tags, (list, tuple)):
+        tags = ' '.join(str(tag) for tag in tags)
+    return {
+        'name': product.name,
+        'brand': product.brand.name if product.brand_id else '',
+        'tags': str(tags),
+        'description': product.description or '',
+    }
+
+
+class SearchBackend:
+    """
+    Interface for product full-text search backends
+    """
+    name = 'base'
+    # Whether the backend keeps its own index that must be kept in sync
+    stored_index = False
+
+    def is_available(self) -> bool:
+        return True
+
+    def search(self, query: str, limit: int = DEFAULT_RESULT_LIMIT, queryset=None) -> List[int]:
+        """
+        Return matching product ids, best match first
+
+        Args:
+            query: User input
+            limit: Maximum number of ids
+            queryset: Product queryset the matches are restricted to
+        """
+        raise NotImplementedError
+
+    def index_products(self, products: Iterable[Product]):
+        """Add or refresh index entries for the given products"""
+
+    def remove_products(self, product_ids: Iterable[int]):
+        """Drop index entries for deleted products"""
+
+    def rebuild(self) -> int:
+        """Rebuild the whole index, returning the number of indexed products"""
+        return 0
+
+
+class BasicSearchBackend(SearchBackend):
+    """
+    Unindexed ``icontains`` search, ordered by name matches first
+    """
+    name = 'basic'
+
+    def search(self, query: str, limit: int = DEFAULT_RESULT_LIMIT, queryset=None) -> List[int]:
+        matches = Product.objects.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(brand__name__icontains=query) |
+            Q(normalized_tags__name=normalize_tag(query))
+        ).distinct()
+        if queryset is not None:
+            matches = matches.filter(id__in=queryset.order_by().values('pk'))
+        name_matches = list(
+            matches.filter(name__icontains=query).values_list('id', flat=True)[:limit]
+        )
+        seen = set(name_matches)
+        other_matches = [
+            product_id for product_id in matches.exclude(id__in=seen).values_list('id', flat=True)[:limit]
+        ]
+        return (name_matches + other_matches)[:limit]
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """
+    FTS5 virtual table keyed by product id (rowid), ranked with bm25()
+    """
+    name = 'sqlite-fts5'
+    stored_index = True
+
+    def __init__(self):
+        self._available = None
+
+    def is_available(self) -> bool:
+        if self._available is None:
+            with connection.cursor() as cursor:
+                self._available = FTS_TABLE in connection.introspection.table_names(cursor)
+        return self._available
+
+    def build_match_query(self, query: str) -> str:
+        """
+        Turn user input into an FTS5 query: every token must match, the
+        last one as a prefix so results update while typing
+        """
+        tokens = TOKEN_PATTERN.findall(query.lower())
+        if not tokens:
+            return ''
+        terms = [f'"{token}"' for token in tokens]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, query: str, limit: int = DEFAULT_RESULT_LIMIT, queryset=None) -> List[int]:
+        match = self.build_match_query(query)
+        if not match:
+            return []
+
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+        params = [match]
+        if queryset is not None:
+            # Filter inside the ranked query so the limit counts matching rows only
+            subquery, subquery_params = queryset.order_by().values('pk').query.sql_with_params()
+            sql += f" AND rowid IN ({subquery})"
+            params.extend(subquery_params)
+        with connection.cursor() as cursor:
+            cursor.execute(f"{sql} ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s", [*params, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    def index_products(self, products: Iterable[Product]):
+        rows = []
+        for product in products:
+            document = product_document(product)
+            rows.append([
+                product.pk, document['name'], document['brand'],
+                document['tags'], document['description'],
+            ])
+        if not rows:
+            return
+
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [[row[0]] for row in rows])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, brand, tags, description) "
+                f"VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+
+    def remove_products(self, product_ids: Iterable[int]):
+        params = [[product_id] for product_id in product_ids]
+        if params:
+            with connection.cursor() as cursor:
+                cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", params)
+
+    def rebuild(self) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+        count = 0
+        batch = []
+        for product in Product.objects.select_related('brand').iterator(chunk_size=500):
+            batch.append(product)
+            if len(batch) >= 500:
+                self.index_products(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self.index_products(batch)
+            count += len(batch)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        return count
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Weighted tsvector ranked with ts_rank
+
+    The vector is computed per query for now; a stored, GIN-indexed
+    tsvector column can replace it without changing callers.
+    """
+    name = 'postgres'
+
+    def search(self, query: str, limit: int = DEFAULT_RESULT_LIMIT, queryset=None) -> List[int]:
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        vector = (
+            SearchVector('name', weight='A') +
+            SearchVector('brand__name', weight='B') +
+            SearchVector('tags', weight='C') +
+            SearchVector('description', weight='D')
+        )
+        search_query = SearchQuery(query, search_type='websearch')
+        products = Product.objects.all()
+        if queryset is not None:
+            products = products.filter(id__in=queryset.order_by().values('pk'))
+        return list(
+            products.annotate(rank=SearchRank(vector, search_query))
+            .filter(rank__gt=0)
+            .order_by('-rank', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteFTS5Backend,
+    'postgresql': PostgresSearchBackend,
+}
+
+_backend: Optional[SearchBackend] = None
+
+
+def get_search_backend() -> SearchBackend:
+    """Search backend for the default database, falling back to ``icontains``"""
+    global _backend
+    if _backend is None:
+        backend_class = SEARCH_BACKENDS.get(connection.vendor, BasicSearchBackend)
+        backend = backend_class()
+        try:
+            available = backend.is_available()
+        except DatabaseError as e:
+            logger.error(f"Search backend {backend.name} unavailable: {e}")
+            available = False
+        if not available:
+            logger.warning(f"Search index {backend.name} not set up, using unindexed search")
+            backend = BasicSearchBackend()
+        _backend = backend
+    return _backend
+
+
+def reset_search_backend():
+    """Forget the selected backend, e.g. after creating the index"""
+    global _backend
+    _backend = None
+
+
+def search_product_ids(query: str, limit: int = DEFAULT_RESULT_LIMIT, queryset=None) -> List[int]:
+    """Product ids matching ``query`` (among ``queryset`` when given), best match first"""
+    return get_search_backend().search(query, limit=limit, queryset=queryset)
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+
+from .thumbnails import ThumbnailSrcsetField
 from .models import (
     Category, Subcategory, Brand, Product, ProductReview,
     ProductImage, ProductVariant, ProductRecommendation
@@ -59,23 +61,16 @@ class ProductSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     subcategory_name = serializers.CharField(source='subcategory.name', read_only=True)
     brand_name = serializers.CharField(source='brand.name', read_only=True)
+    normalized_tags = serializers.SlugRelatedField(many=True, read_only=True, slug_field='name')
     images = ProductImageSerializer(many=True, read_only=True)
     variants = ProductVariantSerializer(many=True, read_only=True)
-    average_rating = serializers.SerializerMethodField()
-    review_count = serializers.SerializerMethodField()
+    average_rating = serializers.FloatField(source='avg_rating', read_only=True)
+    review_count = serializers.IntegerField(source='rating_count', read_only=True)
+    primary_image_srcset = ThumbnailSrcsetField('primary_image')
     
     class Meta:
         model = Product
-        fields = '__all__'
-    
-    def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if reviews:
-            return sum(review.rating for review in reviews) / len(reviews)
-        return 0
-    
-    def get_review_count(self, obj):
-        return obj.reviews.count()
+        exclude = ('thumbnails',)
 
 
 class ProductReviewSerializer(serializers.ModelSerializer):
@@ -0,0 +1,91 @@
+"""
+Signal handlers keeping the product search and tag indexes, the rating
+summaries, image thumbnails and the cached API responses in sync
+"""
+import logging
+
+from django.db import DatabaseError
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from ecoswitch_backend.response_cache import watch_models
+
+from .models import Brand, Category, Product, ProductImage, ProductReview, ProductVariant, Subcategory, Tag
+from .ratings import apply_rating_change, stored_rating_entry
+from .search import get_search_backend
+from .tags import sync_tags
+from .thumbnails import schedule_thumbnails
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Product)
+def sync_product_tags(sender, instance, raw=False, **kwargs):
+    """Link a saved product to the normalized form of its tags"""
+    if not raw:
+        sync_tags(instance)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    """Refresh the search index entry of a saved product"""
+    if raw:
+        return
+    try:
+        get_search_backend().index_products([instance])
+    except DatabaseError as e:
+        logger.error(f"Could not index product {instance.pk}: {e}")
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    """Drop a deleted product from the search index"""
+    try:
+        get_search_backend().remove_products([instance.pk])
+    except DatabaseError as e:
+        logger.error(f"Could not remove product {instance.pk} from the search index: {e}")
+
+
+@receiver(post_save, sender=Brand)
+def reindex_brand_products(sender, instance, created=False, raw=False, **kwargs):
+    """Brand names are indexed with each product, so refresh them on rename"""
+    if raw or created:
+        return
+    try:
+        get_search_backend().index_products(instance.products.select_related('brand'))
+    except DatabaseError as e:
+        logger.error(f"Could not reindex products of brand {instance.pk}: {e}")
+
+
+@receiver(pre_save, sender=ProductReview)
+def remember_review_rating(sender, instance, raw=False, **kwargs):
+    """Note how a review counted before this save"""
+    if not raw:
+        instance._stored_rating_entry = stored_rating_entry(sender, instance.pk)
+
+
+@receiver(post_save, sender=ProductReview)
+def update_rating_summary(sender, instance, raw=False, **kwargs):
+    """Move a saved review's rating into its product's summary"""
+    if raw:
+        return
+    before = getattr(instance, '_stored_rating_entry', None)
+    apply_rating_change(Product, before, (instance.product_id, instance.rating))
+    instance._stored_rating_entry = (instance.product_id, instance.rating)
+
+
+@receiver(post_delete, sender=ProductReview)
+def remove_rating_from_summary(sender, instance, **kwargs):
+    """Take a deleted review's rating out of its product's summary"""
+    apply_rating_change(Product, (instance.product_id, instance.rating), None)
+
+
+@receiver(post_save, sender=Product)
+def update_product_thumbnails(sender, instance, raw=False, **kwargs):
+    """Make thumbnails of a new or replaced primary image"""
+    if not raw:
+        schedule_thumbnails(instance)
+
+
+# Cached API responses built from these models (ecoswitch_backend.response_cache)
+watch_models(Category, Subcategory, Brand, Product, ProductImage, ProductVariant, Tag)
@@ -0,0 +1,206 @@
+"""
+Content-based "similar products" from TF-IDF cosine nearest neighbours
+
+Every product becomes a sparse TF-IDF vector over the words of its name,
+tags, category and description (name and tags weighted up). Rows are L2
+normalized, so a sparse product of a block of rows with the whole matrix
+gives cosine similarities; each block keeps only its top-K neighbours per
+row. Blocks are independent and can be spread over worker processes. The
+neighbours are stored in ``ProductSimilarity`` and read by the ``similar``
+action of the product API.
+"""
+import logging
+import math
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from django.db import transaction
+
+from .models import Product, ProductSimilarity
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_TOP_K = 10
+DEFAULT_BLOCK_SIZE = 512
+DEFAULT_MIN_SCORE = 0.05
+STORE_BATCH_SIZE = 1000
+
+# Term frequency multiplier per document field
+FIELD_WEIGHTS = {
+    'name': 3,
+    'tags': 2,
+    'category': 2,
+    'description': 1,
+}
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+STOP_WORDS = frozenset("""
+a an and are as at be by for from has in is it its of on or that the this to
+was with your you our we all any can will into more most made make very per
+""".split())
+
+# (row, [(neighbour_row, score), ...]) per matrix row, best neighbour first
+Neighbours = List[Tuple[int, List[Tuple[int, float]]]]
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        token for token in TOKEN_PATTERN.findall(str(text or '').lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def product_terms(product: Product) -> Counter:
+    """Weighted term counts of one product"""
+    tags = product.tags if isinstance(product.tags, (list, tuple)) else [product.tags]
+    fields = {
+        'name': product.name,
+        'tags': ' '.join(str(tag) for tag in tags if tag),
+        'category': ' '.join(filter(None, [
+            product.category.name,
+            product.subcategory.name if product.subcategory_id else '',
+        ])),
+        'description': product.description,
+    }
+    terms = Counter()
+    for field, text in fields.items():
+        for token in tokenize(text):
+            terms[token] += FIELD_WEIGHTS[field]
+    return terms
+
+
+def build_tfidf_matrix(documents: List[Counter]) -> sparse.csr_matrix:
+    """
+    Sublinear TF-IDF matrix with L2 normalized rows
+
+    Args:
+        documents: Term counts per product, in row order
+
+    Returns:
+        CSR matrix of shape (len(documents), vocabulary size)
+    """
+    vocabulary: Dict[str, int] = {}
+    indptr = [0]
+    indices = []
+    data = []
+    for terms in documents:
+        for term, count in terms.items():
+            indices.append(vocabulary.setdefault(term, len(vocabulary)))
+            data.append(1.0 + math.log(count))
+        indptr.append(len(indices))
+
+    matrix = sparse.csr_matrix(
+        (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(documents), len(vocabulary)),
+    )
+
+    document_frequency = np.bincount(matrix.indices, minlength=len(vocabulary))
+    idf = np.log((1.0 + len(documents)) / (1.0 + document_frequency)) + 1.0
+    matrix = matrix.multiply(idf.astype(np.float32)).tocsr()
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags((1.0 / norms).astype(np.float32)).dot(matrix).tocsr()
+
+
+def block_neighbours(matrix: sparse.csr_matrix, start: int, stop: int, top_k: int,
+                     min_score: float) -> Neighbours:
+    """Top-K cosine neighbours of rows ``start:stop`` against every row"""
+    scores = matrix[start:stop].dot(matrix.T).tocsr()
+    results = []
+    for offset in range(stop - start):
+        row = start + offset
+        begin, end = scores.indptr[offset], scores.indptr[offset + 1]
+        columns = scores.indices[begin:end]
+        values = scores.data[begin:end]
+
+        keep = (columns != row) & (values >= min_score)
+        columns, values = columns[keep], values[keep]
+        if len(values) > top_k:
+            best = np.argpartition(-values, top_k - 1)[:top_k]
+            columns, values = columns[best], values[best]
+        order = np.lexsort((columns, -values))
+        results.append((row, [(int(columns[i]), round(float(values[i]), 6)) for i in order]))
+    return results
+
+
+# Matrix shared with worker processes through the pool initializer
+_worker_matrix: Optional[sparse.csr_matrix] = None
+
+
+def _init_worker(matrix):
+    global _worker_matrix
+    _worker_matrix = matrix
+
+
+def _worker_block(args):
+    start, stop, top_k, min_score = args
+    return block_neighbours(_worker_matrix, start, stop, top_k, min_score)
+
+
+def nearest_neighbours(matrix: sparse.csr_matrix, top_k: int = DEFAULT_TOP_K,
+                       block_size: int = DEFAULT_BLOCK_SIZE, min_score: float = DEFAULT_MIN_SCORE,
+                       workers: int = 1) -> Iterable[Tuple[int, List[Tuple[int, float]]]]:
+    """Yield the top-K neighbours of every row, one block at a time"""
+    blocks = [
+        (start, min(start + block_size, matrix.shape[0]), top_k, min_score)
+        for start in range(0, matrix.shape[0], block_size)
+    ]
+    if workers <= 1 or len(blocks) <= 1:
+        for start, stop, _, _ in blocks:
+            yield from block_neighbours(matrix, start, stop, top_k, min_score)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(matrix,)) as pool:
+        for results in pool.map(_worker_block, blocks):
+            yield from results
+
+
+def compute_similar_products(top_k: int = DEFAULT_TOP_K, block_size: int = DEFAULT_BLOCK_SIZE,
+                             min_score: float = DEFAULT_MIN_SCORE, workers: int = 1) -> Dict[str, int]:
+    """
+    Rebuild ``ProductSimilarity`` for every active product
+
+    Args:
+        top_k: Neighbours kept per product
+        block_size: Rows multiplied against the whole matrix at once
+        min_score: Drop neighbours with a lower cosine similarity
+        workers: Worker processes for the blocked products
+
+    Returns:
+        Dictionary with the number of products and stored neighbour rows
+    """
+    products = list(
+        Product.objects.filter(is_active=True)
+        .select_related('category', 'subcategory')
+        .only('id', 'name', 'description', 'tags', 'category__name', 'subcategory__name')
+        .order_by('id')
+    )
+    product_ids = [product.pk for product in products]
+    matrix = build_tfidf_matrix([product_terms(product) for product in products])
+    logger.info(f"Similarity matrix: {matrix.shape[0]} products x {matrix.shape[1]} terms, {matrix.nnz} non-zeros")
+
+    # Solve everything before writing, so the table is only locked for the swap
+    rows = [
+        ProductSimilarity(
+            product_id=product_ids[row],
+            similar_product_id=product_ids[neighbour],
+            score=score,
+            rank=rank,
+        )
+        for row, neighbours in nearest_neighbours(matrix, top_k, block_size, min_score, workers)
+        for rank, (neighbour, score) in enumerate(neighbours, start=1)
+    ]
+
+    with transaction.atomic():
+        ProductSimilarity.objects.all().delete()
+        ProductSimilarity.objects.bulk_create(rows, batch_size=STORE_BATCH_SIZE)
+
+    return {'products': len(products), 'neighbours': len(rows)}
@@ -0,0 +1,93 @@
+"""
+Normalized tag index for Product and MerchantProduct
+
+The free-form JSON ``tags`` list stays the editable source. On every save
+it is normalized into ``Tag`` rows linked through ``normalized_tags``, so
+tag filters and counts are indexed joins instead of substring matches on
+serialized JSON.
+"""
+import re
+from typing import Iterable, List
+
+from django.db.models import Count
+
+from .models import Tag
+
+
+MAX_TAG_LENGTH = Tag._meta.get_field('name').max_length
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_tag(value) -> str:
+    """Lowercase a tag and collapse whitespace: ' Eco  Friendly' -> 'eco friendly'"""
+    return WHITESPACE.sub(' ', str(value or '')).strip().lower()[:MAX_TAG_LENGTH]
+
+
+def normalize_tags(values) -> List[str]:
+    """
+    Normalize a tag list (or comma separated string), dropping blanks and duplicates
+    """
+    if not values:
+        return []
+    if isinstance(values, str):
+        values = values.split(',')
+    elif not isinstance(values, (list, tuple, set)):
+        return []
+
+    names = []
+    for value in values:
+        name = normalize_tag(value)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def get_or_create_tags(names: Iterable[str]) -> List[Tag]:
+    """Tag rows for already normalized names, creating missing ones"""
+    names = list(names)
+    if not names:
+        return []
+
+    Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+    return list(Tag.objects.filter(name__in=names))
+
+
+def sync_tags(instance) -> bool:
+    """
+    Point ``instance.normalized_tags`` at its current ``tags``
+
+    Returns:
+        True if the links changed
+    """
+    names = set(normalize_tags(instance.tags))
+    current = {tag.name for tag in instance.normalized_tags.all()}
+    if names == current:
+        return False
+
+    instance.normalized_tags.set(get_or_create_tags(names))
+    return True
+
+
+def filter_by_tags(queryset, tags):
+    """Restrict a Product or MerchantProduct queryset to rows carrying every tag"""
+    for name in normalize_tags(tags):
+        queryset = queryset.filter(normalized_tags__name=name)
+    return queryset
+
+
+def tag_counts(queryset, limit: int = 20) -> List[dict]:
+    """
+    Most common tags among a Product or MerchantProduct queryset
+
+    Returns:
+        List of ``{'name': ..., 'count': ...}`` dicts, most used first
+    """
+    rows = (
+        queryset.order_by()
+        .filter(normalized_tags__isnull=False)
+        .values('normalized_tags__name')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'normalized_tags__name')[:limit]
+    )
+    return [{'name': row['normalized_tags__name'], 'count': row['count']} for row in rows]
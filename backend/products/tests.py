@@ -0,0 +1,452 @@
+"""
+Tests for product search, the tag index, trending scores, similar products,
+the denormalized product summaries, image thumbnails and media garbage
+collection
+"""
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+import numpy as np
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from catalog.models import CatalogEntry
+from ecoswitch_backend.content_storage import content_storage
+from ecoswitch_backend.versions import version_cache
+
+from .models import Brand, Category, Product, ProductReview, ProductSimilarity, ProductViewCount, Tag
+from .ratings import rebuild_rating_summaries
+from .search import get_search_backend, reset_search_backend, search_product_ids
+from .similarity import block_neighbours, build_tfidf_matrix, compute_similar_products, tokenize
+from .tags import filter_by_tags, normalize_tags, tag_counts
+from .thumbnails import TARGETS, backfill_thumbnails, render_thumbnails, thumbnail_srcset, update_thumbnails
+from .trending import compute_trending_scores, flush_view_counts, record_product_view, score_activity
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'products-tests'},
+    'versions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'products-tests-versions'},
+}
+
+
+def create_product(name, category, brand, **values):
+    slug = name.lower().replace(' ', '-')
+    values = {'description': 'Everyday essential', 'price': 100, 'sustainability_score': 5, **values}
+    return Product.objects.create(name=name, slug=slug, sku=slug.upper(), category=category, brand=brand, **values)
+
+
+def image_file(name, size=(1000, 500), color=(40, 120, 60)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        reset_search_backend()
+        cls.home = Category.objects.create(name='Home', slug='home')
+        cls.care = Category.objects.create(name='Personal Care', slug='personal-care')
+        cls.brand = Brand.objects.create(name='Leaf', slug='leaf')
+        cls.toothbrush = create_product('Bamboo Toothbrush', cls.care, cls.brand, price=80)
+        cls.cutlery = create_product(
+            'Travel Cutlery Set', cls.home, cls.brand, price=300, description='Cutlery made of bamboo',
+        )
+        cls.bottle = create_product('Steel Bottle', cls.home, cls.brand, price=500, tags=['bamboo lid'])
+
+    def setUp(self):
+        reset_search_backend()
+
+    def search(self, **params):
+        response = self.client.get('/api/products/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return [product['id'] for product in response.json()['results']]
+
+    def test_sqlite_uses_the_fts_index(self):
+        self.assertEqual(get_search_backend().name, 'sqlite-fts5')
+
+    def test_matches_are_ranked_by_field_weight(self):
+        self.assertEqual(
+            search_product_ids('bamboo'),
+            [self.toothbrush.pk, self.bottle.pk, self.cutlery.pk],
+        )
+
+    def test_last_token_matches_as_a_prefix(self):
+        self.assertEqual(search_product_ids('bamboo tooth'), [self.toothbrush.pk])
+        self.assertEqual(search_product_ids('cutl'), [self.cutlery.pk])
+        self.assertEqual(search_product_ids('  ?! '), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.bottle.name = 'Steel Flask'
+        self.bottle.save()
+        self.assertEqual(search_product_ids('flask'), [self.bottle.pk])
+        self.assertEqual(search_product_ids('bottle'), [])
+
+        self.cutlery.delete()
+        self.assertNotIn(self.cutlery.pk, search_product_ids('bamboo'))
+
+    def test_filters_apply_before_the_result_limit(self):
+        queryset = Product.objects.filter(category=self.home)
+        self.assertEqual(search_product_ids('bamboo', limit=1, queryset=queryset), [self.bottle.pk])
+
+    def test_search_view_combines_query_and_filters(self):
+        self.assertEqual(self.search(q='bamboo'), [self.toothbrush.pk, self.bottle.pk, self.cutlery.pk])
+        self.assertEqual(self.search(q='bamboo', category='home', max_price=400), [self.cutlery.pk])
+        self.assertEqual(self.search(q='bamboo', sort='price_desc'), [self.bottle.pk, self.cutlery.pk, self.toothbrush.pk])
+
+    def test_relevance_sort_needs_a_query(self):
+        response = self.client.get('/api/products/search/', {'sort': 'relevance'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TagIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Home', slug='home')
+        brand = Brand.objects.create(name='Leaf', slug='leaf')
+        cls.brush = create_product('Dish Brush', category, brand, tags=['Zero Waste', ' Bamboo '])
+        cls.straw = create_product('Steel Straw', category, brand, tags=['zero  waste', 'reusable'])
+        cls.bag = create_product('Jute Bag', category, brand, tags='reusable, vegan')
+
+    def tag_names(self, product):
+        return sorted(product.normalized_tags.values_list('name', flat=True))
+
+    def test_tags_are_normalized(self):
+        self.assertEqual(normalize_tags([' Eco  Friendly', 'eco friendly', '', 'Vegan']), ['eco friendly', 'vegan'])
+        self.assertEqual(normalize_tags('a, B ,a'), ['a', 'b'])
+        self.assertEqual(normalize_tags({'not': 'a list'}), [])
+
+    def test_saved_tags_are_linked_to_shared_rows(self):
+        self.assertEqual(self.tag_names(self.brush), ['bamboo', 'zero waste'])
+        self.assertEqual(self.tag_names(self.bag), ['reusable', 'vegan'])
+        self.assertEqual(Tag.objects.count(), 4)
+
+        self.brush.tags = ['Bamboo']
+        self.brush.save()
+        self.assertEqual(self.tag_names(self.brush), ['bamboo'])
+
+    def test_filter_requires_every_tag(self):
+        products = Product.objects.order_by('pk')
+        self.assertEqual(list(filter_by_tags(products, ['Zero Waste'])), [self.brush, self.straw])
+        self.assertEqual(list(filter_by_tags(products, ['zero waste', 'REUSABLE'])), [self.straw])
+        self.assertEqual(list(filter_by_tags(products, [])), [self.brush, self.straw, self.bag])
+
+    def test_counts_are_most_used_first(self):
+        self.assertEqual(tag_counts(Product.objects.all(), limit=3), [
+            {'name': 'reusable', 'count': 2},
+            {'name': 'zero waste', 'count': 2},
+            {'name': 'bamboo', 'count': 1},
+        ])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RatingSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Home', slug='home')
+        brand = Brand.objects.create(name='Leaf', slug='leaf')
+        cls.products = [create_product(f'Bamboo brush {i}', category, brand) for i in range(2)]
+        cls.users = [
+            get_user_model().objects.create_user(username=f'reviewer{i}', email=f'reviewer{i}@example.com')
+            for i in range(3)
+        ]
+
+    def review(self, user, rating, product=None):
+        return ProductReview.objects.create(
+            product=product or self.products[0], user=user, rating=rating, title='Review', comment='Text',
+        )
+
+    def summary(self, product=None):
+        product = Product.objects.get(pk=(product or self.products[0]).pk)
+        histogram = [getattr(product, f'rating_{rating}') for rating in range(1, 6)]
+        return product.rating_count, product.rating_sum, histogram, product.avg_rating
+
+    def test_new_reviews_add_to_the_summary(self):
+        self.review(self.users[0], 5)
+        self.review(self.users[1], 2)
+        self.assertEqual(self.summary(), (2, 7, [0, 1, 0, 0, 1], 3.5))
+
+    def test_changed_rating_moves_between_histogram_buckets(self):
+        review = self.review(self.users[0], 5)
+        self.review(self.users[1], 3)
+
+        review.rating = 1
+        review.save()
+        self.assertEqual(self.summary(), (2, 4, [1, 0, 1, 0, 0], 2.0))
+
+        # Saving again without a change applies no delta
+        review.save()
+        self.assertEqual(self.summary(), (2, 4, [1, 0, 1, 0, 0], 2.0))
+
+    def test_review_moved_to_another_product(self):
+        review = self.review(self.users[0], 4)
+        review.product = self.products[1]
+        review.save()
+        self.assertEqual(self.summary(self.products[0]), (0, 0, [0, 0, 0, 0, 0], 0.0))
+        self.assertEqual(self.summary(self.products[1]), (1, 4, [0, 0, 0, 1, 0], 4.0))
+
+    def test_deleted_review_is_taken_out(self):
+        review = self.review(self.users[0], 4)
+        self.review(self.users[1], 2)
+        review.delete()
+        self.assertEqual(self.summary(), (1, 2, [0, 1, 0, 0, 0], 2.0))
+
+    def test_rebuild_repairs_drifted_counters(self):
+        self.review(self.users[0], 5)
+        self.review(self.users[1], 4)
+        self.review(self.users[2], 4, product=self.products[1])
+        Product.objects.update(rating_count=9, rating_sum=1, rating_5=0, avg_rating=0)
+
+        rebuild_rating_summaries(Product, ProductReview)
+        self.assertEqual(self.summary(self.products[0]), (2, 9, [0, 0, 0, 1, 1], 4.5))
+        self.assertEqual(self.summary(self.products[1]), (1, 4, [0, 0, 0, 1, 0], 4.0))
+
+    def test_search_filters_on_the_stored_average(self):
+        self.review(self.users[0], 5)
+        response = self.client.get('/api/products/search/', {'min_rating': '4.5'})
+        self.assertEqual([product['id'] for product in response.json()['results']], [self.products[0].pk])
+        self.assertEqual(self.client.get('/api/products/search/', {'min_rating': 'high'}).status_code, 400)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Home', slug='home')
+        brand = Brand.objects.create(name='Leaf', slug='leaf')
+        cls.viewed = create_product('Dish Brush', category, brand)
+        cls.reviewed = create_product('Steel Straw', category, brand)
+        cls.quiet = create_product('Jute Bag', category, brand)
+
+    def setUp(self):
+        cache.clear()
+        version_cache.clear()
+        self.today = timezone.localdate()
+
+    def view_counts(self):
+        return sorted(ProductViewCount.objects.values_list('product_id', 'date', 'count'))
+
+    def test_activity_halves_every_half_life(self):
+        activity = {
+            1: {self.today: {'sales': 1, 'reviews': 0, 'views': 0}},
+            2: {self.today - timedelta(days=7): {'sales': 1, 'reviews': 0, 'views': 0}},
+            3: {self.today: {'sales': 0, 'reviews': 0, 'views': 0}},
+        }
+        self.assertEqual(score_activity(activity, self.today, half_life_days=7), {1: 5.0, 2: 2.5})
+
+    def test_detail_views_are_buffered_outside_the_database(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get(f'/api/products/products/{self.viewed.pk}/').status_code, 200)
+        self.assertFalse(ProductViewCount.objects.exists())
+
+        self.assertEqual(flush_view_counts(), 3)
+        self.assertEqual(self.view_counts(), [(self.viewed.pk, self.today, 3)])
+        self.assertEqual(flush_view_counts(), 0)
+
+    def test_flushes_add_to_the_stored_counts(self):
+        yesterday = self.today - timedelta(days=1)
+        record_product_view(self.viewed.pk)
+        record_product_view(self.viewed.pk, day=yesterday)
+        flush_view_counts()
+
+        record_product_view(self.viewed.pk)
+        record_product_view(self.viewed.pk)
+        record_product_view(self.reviewed.pk)
+        self.assertEqual(flush_view_counts(), 3)
+        self.assertEqual(self.view_counts(), sorted([
+            (self.viewed.pk, yesterday, 1), (self.viewed.pk, self.today, 3), (self.reviewed.pk, self.today, 1),
+        ]))
+
+    def test_scores_are_stored_and_reset(self):
+        user = get_user_model().objects.create_user(username='reviewer', email='reviewer@example.com')
+        ProductReview.objects.create(product=self.reviewed, user=user, rating=5, title='Great', comment='Text')
+        record_product_view(self.viewed.pk)
+        Product.objects.filter(pk=self.quiet.pk).update(trending_score=9.0)
+
+        result = compute_trending_scores(today=self.today)
+        self.assertEqual(result, {'views': 1, 'scored': 2, 'reset': 1})
+        self.assertEqual(
+            dict(Product.objects.values_list('pk', 'trending_score')),
+            {self.reviewed.pk: 3.0, self.viewed.pk: 0.2, self.quiet.pk: 0.0},
+        )
+
+        response = self.client.get('/api/products/trending/')
+        self.assertEqual([product['id'] for product in response.json()], [self.reviewed.pk, self.viewed.pk])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SimilarProductTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        kitchen = Category.objects.create(name='Kitchen', slug='kitchen')
+        garden = Category.objects.create(name='Garden', slug='garden')
+        brand = Brand.objects.create(name='Leaf', slug='leaf')
+        cls.bottle = create_product('Steel Water Bottle', kitchen, brand, tags=['steel', 'bottle'])
+        cls.flask = create_product('Steel Flask Bottle', kitchen, brand, tags=['steel'])
+        cls.jar = create_product('Glass Jar', kitchen, brand, description='Jar for the pantry')
+        cls.seeds = create_product('Tomato Seeds', garden, brand, description='Heirloom seeds')
+
+    def test_tokens_skip_stop_words_and_single_letters(self):
+        self.assertEqual(tokenize('The Bottle, 1 L & a Lid for 2'), ['bottle', 'lid'])
+
+    def test_rows_are_unit_vectors_and_neighbours_exclude_the_row(self):
+        matrix = build_tfidf_matrix([{'steel': 3, 'bottle': 3}, {'steel': 2}, {'seeds': 1}, {}])
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        self.assertEqual([round(float(norm), 6) for norm in norms], [1.0, 1.0, 1.0, 0.0])
+
+        neighbours = dict(block_neighbours(matrix, 0, 4, top_k=5, min_score=0.05))
+        self.assertEqual([row for row, score in neighbours[0]], [1])
+        self.assertEqual((neighbours[2], neighbours[3]), ([], []))
+
+    def test_neighbours_are_stored_best_first(self):
+        result = compute_similar_products(top_k=2)
+        self.assertEqual(result['products'], 4)
+        ranked = list(
+            ProductSimilarity.objects.filter(product=self.bottle).values_list('similar_product_id', 'rank')
+        )
+        self.assertEqual(ranked[0], (self.flask.pk, 1))
+        self.assertLessEqual(len(ranked), 2)
+        self.assertFalse(ProductSimilarity.objects.filter(product=self.seeds, similar_product=self.bottle).exists())
+
+        # Each run replaces the previous neighbours
+        self.flask.is_active = False
+        self.flask.save()
+        compute_similar_products(top_k=2)
+        self.assertFalse(ProductSimilarity.objects.filter(similar_product=self.flask).exists())
+
+    def test_similar_action_serves_the_stored_neighbours(self):
+        compute_similar_products()
+        response = self.client.get(f'/api/products/products/{self.bottle.pk}/similar/', {'limit': 1})
+        data = response.json()
+        self.assertEqual(data['product_id'], self.bottle.pk)
+        self.assertEqual([product['id'] for product in data['results']], [self.flask.pk])
+        self.assertGreater(data['results'][0]['similarity_score'], 0)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.category = Category.objects.create(name='Home', slug='home')
+        self.brand = Brand.objects.create(name='Leaf', slug='leaf')
+
+    def test_derivatives_are_written_at_each_width_and_format(self):
+        source_name = content_storage.save('product_images/photo.png', image_file('photo.png'))
+        thumbnails = render_thumbnails(content_storage, source_name)
+
+        self.assertEqual((thumbnails['source'], thumbnails['width'], thumbnails['height']), (source_name, 1000, 500))
+        self.assertEqual(sorted(thumbnails['sizes'], key=int), ['200', '400', '800'])
+        for width, formats in thumbnails['sizes'].items():
+            self.assertEqual(sorted(formats), ['jpeg', 'webp'])
+            with content_storage.open(formats['webp'], 'rb') as derivative:
+                self.assertEqual(Image.open(derivative).size, (int(width), int(width) // 2))
+
+    def test_small_originals_are_not_upscaled(self):
+        source_name = content_storage.save('product_images/icon.png', image_file('icon.png', size=(300, 300)))
+        self.assertEqual(sorted(render_thumbnails(content_storage, source_name)['sizes'], key=int), ['200', '300'])
+
+    def test_current_thumbnails_are_kept_and_build_the_srcset(self):
+        product = create_product('Bamboo Toothbrush', self.category, self.brand, primary_image=image_file('brush.png'))
+        target = TARGETS['product']
+        self.assertEqual(thumbnail_srcset(product.thumbnails, product.primary_image.name, content_storage), {})
+
+        self.assertTrue(update_thumbnails(target, product.pk))
+        self.assertFalse(update_thumbnails(target, product.pk))
+        product.refresh_from_db()
+        srcset = thumbnail_srcset(product.thumbnails, product.primary_image.name, content_storage)
+        self.assertEqual(sorted(srcset), ['jpeg', 'webp'])
+        self.assertTrue(srcset['webp'].endswith(' 800w'))
+
+        # Derivatives of a replaced image are not shown
+        product.primary_image = image_file('other.png', color=(200, 10, 10))
+        product.save()
+        self.assertEqual(thumbnail_srcset(product.thumbnails, product.primary_image.name, content_storage), {})
+
+    def test_backfill_counts_written_and_failed_images(self):
+        create_product('Bamboo Toothbrush', self.category, self.brand, primary_image=image_file('brush.png'))
+        broken = create_product(
+            'Steel Bottle', self.category, self.brand, primary_image=ContentFile(b'not an image', name='bottle.png'),
+        )
+        with self.assertLogs('products.thumbnails', 'WARNING'):
+            results = backfill_thumbnails(['product'])
+        self.assertEqual(results, {'product': {'images': 2, 'written': 1, 'failed': 1}})
+        self.assertEqual(Product.objects.get(pk=broken.pk).thumbnails, {})
+
+        # Only images without current thumbnails are processed again
+        with self.assertLogs('products.thumbnails', 'WARNING'):
+            results = backfill_thumbnails(['product'])
+        self.assertEqual(results, {'product': {'images': 1, 'written': 0, 'failed': 1}})
+
+    def test_rows_showing_the_same_image_share_its_derivatives(self):
+        first = create_product('Bamboo Toothbrush', self.category, self.brand, primary_image=image_file('a.png'))
+        second = create_product('Bamboo Brush', self.category, self.brand, primary_image=image_file('b.png'))
+        self.assertEqual(first.primary_image.name, second.primary_image.name)
+
+        stdout = StringIO()
+        call_command('generate_thumbnails', target=['product'], workers=1, stdout=stdout)
+        self.assertIn('product: 2 of 2 images, 0 failed', stdout.getvalue())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.thumbnails, second.thumbnails)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MediaGarbageCollectionTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        category = Category.objects.create(name='Home', slug='home')
+        brand = Brand.objects.create(name='Leaf', slug='leaf')
+        self.product = create_product('Bamboo Toothbrush', category, brand, primary_image=image_file('brush.png'))
+        update_thumbnails(TARGETS['product'], self.product.pk)
+        self.product.refresh_from_db()
+
+        # An image only a denormalized URL column still shows
+        self.listed = content_storage.save('listed.png', image_file('listed.png', color=(0, 0, 200)))
+        CatalogEntry.objects.create(
+            source='merchant', source_id=1, name='Listed', price=10, category='Home', category_key='home',
+            brand='Leaf', brand_key='leaf', primary_image=content_storage.url(self.listed), created_at=timezone.now(),
+        )
+        self.orphan = content_storage.save('orphan.png', image_file('orphan.png', color=(200, 0, 0)))
+
+        past = timezone.now().timestamp() - 48 * 3600
+        for directory, _, files in os.walk(content_storage.location):
+            for file_name in files:
+                os.utime(os.path.join(directory, file_name), (past, past))
+
+    def gc_media(self, **options):
+        stdout = StringIO()
+        call_command('gc_media', stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_unreferenced_files_are_deleted(self):
+        derivatives = [name for formats in self.product.thumbnails['sizes'].values() for name in formats.values()]
+        output = self.gc_media()
+
+        self.assertIn('Deleted files: 1', output)
+        self.assertFalse(content_storage.exists(self.orphan))
+        for name in [self.product.primary_image.name, self.listed, *derivatives]:
+            self.assertTrue(content_storage.exists(name), name)
+
+    def test_dry_run_lists_without_deleting(self):
+        output = self.gc_media(dry_run=True)
+        self.assertIn(f'  {self.orphan}', output)
+        self.assertIn('Deletable files: 1', output)
+        self.assertTrue(content_storage.exists(self.orphan))
+
+    def test_recent_files_are_kept(self):
+        self.assertIn('Deleted files: 0', self.gc_media(min_age=72))
+        self.assertTrue(content_storage.exists(self.orphan))
@@ -0,0 +1,295 @@
+"""
+Precomputed thumbnails of product images
+
+Product grids show small tiles, so every product image is also stored at a
+few widths (THUMBNAIL_WIDTHS) as WebP and JPEG. Saving an image schedules
+its derivatives on a background thread once the transaction commits; the
+generate_thumbnails command backfills existing media in parallel.
+
+The derivative names are kept in a ``thumbnails`` JSON field on the row
+owning the image, together with the name of the image they were made from,
+so serializers build a srcset without touching storage or the database, and
+ignore derivatives of a replaced image until new ones exist.
+
+Product images and their derivatives live in content-addressed storage
+(ecoswitch_backend.content_storage): rows showing the same image reuse the
+derivatives already made for it, and files no row lists any more are left
+to the gc_media command.
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+from ecoswitch_backend.response_cache import bump_versions
+
+logger = logging.getLogger(__name__)
+
+
+THUMBNAIL_WIDTHS = (200, 400, 800)
+THUMBNAIL_DIR = 'thumbs'
+
+# format: (file extension, Pillow format, save options)
+THUMBNAIL_FORMATS = {
+    'webp': ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+@dataclass(frozen=True)
+class ImageTarget:
+    """
+    An image field whose files get thumbnails
+    """
+    name: str
+    model_label: str
+    field_name: str
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def storage(self):
+        return self.model._meta.get_field(self.field_name).storage
+
+
+TARGETS = {
+    target.name: target for target in (
+        ImageTarget('merchant', 'merchants.MerchantProduct', 'primary_image'),
+        ImageTarget('product', 'products.Product', 'primary_image'),
+        ImageTarget('shop', 'ecommerce.ProductImage', 'image'),
+    )
+}
+
+
+def target_for(model) -> Optional[ImageTarget]:
+    for target in TARGETS.values():
+        if target.model is model:
+            return target
+    return None
+
+
+def derivative_name(source_name: str, width: int, format_name: str) -> str:
+    # The full source name keeps photo.png and photo.jpg apart
+    return f'{THUMBNAIL_DIR}/{source_name}.{width}w.{THUMBNAIL_FORMATS[format_name][0]}'
+
+
+def _encode(image: Image.Image, format_name: str) -> bytes:
+    _, pillow_format, options = THUMBNAIL_FORMATS[format_name]
+    if pillow_format == 'JPEG' and image.mode != 'RGB':
+        # JPEG has no alpha: flatten onto white
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+def render_thumbnails(storage, source_name: str, widths: Iterable[int] = THUMBNAIL_WIDTHS) -> Dict:
+    """
+    Write the derivatives of one stored image
+
+    Widths above the original's are capped at it, so a small original gets
+    a single re-encoded copy at its own width.
+
+    Returns:
+        ``{'source': name, 'width': w, 'height': h, 'sizes': {width: {format: name}}}``
+    """
+    with storage.open(source_name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    sizes = {}
+    for width in sorted({min(width, image.width) for width in widths}):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        sizes[str(width)] = {}
+        for format_name in THUMBNAIL_FORMATS:
+            name = derivative_name(source_name, width, format_name)
+            sizes[str(width)][format_name] = storage.save(name, ContentFile(_encode(resized, format_name)))
+    return {'source': source_name, 'width': image.width, 'height': image.height, 'sizes': sizes}
+
+
+def shared_thumbnails(source_name: str) -> Optional[Dict]:
+    """Derivatives already made of an image by any row showing it"""
+    for target in TARGETS.values():
+        thumbnails = (
+            target.model.objects.filter(thumbnails__source=source_name)
+            .values_list('thumbnails', flat=True).first()
+        )
+        if thumbnails:
+            return thumbnails
+    return None
+
+
+def referenced_derivatives() -> Set[str]:
+    """Names of the derivative files listed by any row"""
+    names = set()
+    for target in TARGETS.values():
+        for thumbnails in target.model.objects.exclude(thumbnails={}).values_list('thumbnails', flat=True).iterator():
+            for formats in thumbnails.get('sizes', {}).values():
+                names.update(formats.values())
+    return names
+
+
+def thumbnail_srcset(thumbnails: Dict, source_name: str, storage, request=None) -> Dict[str, str]:
+    """
+    ``{format: srcset}`` of an image, empty until its current derivatives exist
+    """
+    if not source_name or not thumbnails or thumbnails.get('source') != source_name:
+        return {}
+
+    def url(name):
+        location = storage.url(name)
+        return request.build_absolute_uri(location) if request is not None else location
+
+    widths = sorted(thumbnails['sizes'], key=int)
+    return {
+        format_name: ', '.join(f"{url(thumbnails['sizes'][width][format_name])} {width}w" for width in widths)
+        for format_name in THUMBNAIL_FORMATS
+    }
+
+
+class ThumbnailSrcsetField(serializers.ReadOnlyField):
+    """
+    srcset map of an image field of the serialized row
+    """
+
+    def __init__(self, image_field: str, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field)
+        return thumbnail_srcset(instance.thumbnails, image.name, image.storage, self.context.get('request'))
+
+
+def update_thumbnails(target: ImageTarget, pk, force: bool = False) -> bool:
+    """
+    Bring the thumbnails of one row up to date with its image
+
+    Returns:
+        Whether derivatives were written
+    """
+    model = target.model
+    row = model.objects.filter(pk=pk).values(target.field_name, 'thumbnails').first()
+    if row is None:
+        return False
+    source_name, current = row[target.field_name], row['thumbnails'] or {}
+    if current.get('source') == source_name and not force:
+        return False
+    thumbnails = {}
+    if source_name:
+        thumbnails = (not force and shared_thumbnails(source_name)) or render_thumbnails(target.storage, source_name)
+    return store_thumbnails(target, pk, source_name, thumbnails)
+
+
+def store_thumbnails(target: ImageTarget, pk, source_name: str, thumbnails: Dict) -> bool:
+    """Save derivatives unless the row's image changed in the meantime"""
+    updated = target.model.objects.filter(pk=pk, **{target.field_name: source_name}).update(thumbnails=thumbnails)
+    if updated:
+        # update() skips post_save; retire cached responses showing this row
+        bump_versions(target.model)
+    return bool(updated)
+
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='thumbnails')
+
+
+def schedule_thumbnails(instance):
+    """Generate a saved row's thumbnails in the background once committed"""
+    target = target_for(type(instance))
+    image = getattr(instance, target.field_name)
+    if (instance.thumbnails or {}).get('source') == (image.name or None):
+        return
+    transaction.on_commit(lambda: _executor.submit(_in_background, update_thumbnails, target, instance.pk))
+
+
+def _in_background(task, target: ImageTarget, *args):
+    try:
+        task(target, *args)
+    except Exception:
+        logger.exception(f"Thumbnail {task.__name__} failed for {target.name} {args[0] if args else ''}")
+    finally:
+        connections.close_all()
+
+
+def _render_in_worker(target_name: str, source_name: str):
+    """Pool task: derivatives of one image, or None when it cannot be rendered"""
+    try:
+        return source_name, render_thumbnails(TARGETS[target_name].storage, source_name)
+    except Exception as e:
+        # Any failure (unreadable file, decompression bomb, corrupt data) only
+        # fails this image; raising would abort the whole backfill
+        logger.warning(f"Skipping {target_name} image {source_name}: {e!r}")
+        return source_name, None
+
+
+def backfill_thumbnails(target_names: Iterable[str] = None, workers: int = 1, force: bool = False,
+                        chunk_size: int = 200) -> Dict[str, Dict[str, int]]:
+    """
+    Make missing (or, with ``force``, all) thumbnails of existing images
+
+    Each distinct image is rendered once, by one of ``workers`` processes,
+    unless another row already has its derivatives; rows are updated here.
+
+    Returns:
+        Dictionary of {target: {'images': n, 'written': n, 'failed': n}}
+    """
+    results = {}
+    for target_name in target_names or TARGETS:
+        target = TARGETS[target_name]
+        rows = target.model.objects.exclude(**{target.field_name: ''}).exclude(**{f'{target.field_name}__isnull': True})
+        pending = {}  # {source name: [pk, ...]}
+        for pk, source_name, thumbnails in rows.values_list('pk', target.field_name, 'thumbnails').iterator():
+            if force or (thumbnails or {}).get('source') != source_name:
+                pending.setdefault(source_name, []).append(pk)
+        counts = {'images': sum(len(pks) for pks in pending.values()), 'written': 0, 'failed': 0}
+
+        rendered = []
+        to_render = []
+        for source_name in pending:
+            shared = None if force else shared_thumbnails(source_name)
+            if shared:
+                rendered.append((source_name, shared))
+            else:
+                to_render.append(source_name)
+
+        for source_name, thumbnails in chain(rendered, _render_all(target, to_render, workers, chunk_size)):
+            for pk in pending[source_name]:
+                if thumbnails is None:
+                    counts['failed'] += 1
+                elif store_thumbnails(target, pk, source_name, thumbnails):
+                    counts['written'] += 1
+        results[target_name] = counts
+        logger.info(
+            f"Thumbnails {target_name}: {counts['written']} of {counts['images']} images, {counts['failed']} failed"
+        )
+    return results
+
+
+def _render_all(target: ImageTarget, source_names: List[str], workers: int, chunk_size: int):
+    if workers <= 1:
+        for source_name in source_names:
+            yield _render_in_worker(target.name, source_name)
+        return
+    # Workers only touch storage; do not hand them this process's connections
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(source_names), chunk_size):
+            chunk = source_names[start:start + chunk_size]
+            yield from pool.map(_render_in_worker, [target.name] * len(chunk), chunk)
@@ -0,0 +1,240 @@
+"""
+Time-decayed trending scores for products
+
+Units sold, reviews and detail views inside a rolling window each add to a
+product's score, decayed exponentially with a configurable half-life: a
+sale today counts twice as much as one ``half_life_days`` ago. Activity is
+aggregated per product and day in SQL; ``compute_trending_scores`` runs on
+a schedule and stores the result in ``Product.trending_score``, which the
+trending endpoint reads through an index.
+
+Detail views are counted in the ``versions`` cache alias rather than the
+database, so a page view does not take the database write lock; each
+``compute_trending_scores`` run first adds the buffered counts to
+``ProductViewCount``. The buffer is switched to a new generation before it
+is read, and a view racing that switch may go uncounted.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ecoswitch_backend.response_cache import bump_versions
+from ecoswitch_backend.versions import bump_version, get_version, version_cache
+
+from .models import Product, ProductReview, ProductViewCount
+
+logger = logging.getLogger(__name__)
+
+
+HALF_LIFE_DAYS = 7.0
+WINDOW_DAYS = 60
+
+# Score contributed by one unit sold, one 5 star review and one view today
+SALE_WEIGHT = 5.0
+REVIEW_WEIGHT = 3.0
+VIEW_WEIGHT = 0.2
+
+# Orders in these states do not count as sales
+EXCLUDED_ORDER_STATUSES = ('cancelled', 'returned')
+
+UPDATE_BATCH_SIZE = 500
+
+VIEW_BUFFER_PREFIX = 'trending:views'
+VIEW_BUFFER_VERSION_KEY = f'{VIEW_BUFFER_PREFIX}:generation'
+# Buffered views not flushed by then are past the trending window anyway
+VIEW_BUFFER_TIMEOUT = WINDOW_DAYS * 24 * 60 * 60
+
+
+def _slots_key(generation: int) -> str:
+    return f'{VIEW_BUFFER_PREFIX}:{generation}:slots'
+
+
+def _slot_key(generation: int, slot: int) -> str:
+    return f'{VIEW_BUFFER_PREFIX}:{generation}:slot:{slot}'
+
+
+def _count_key(generation: int, product_id: int, day: str) -> str:
+    return f'{VIEW_BUFFER_PREFIX}:{generation}:{product_id}:{day}'
+
+
+def record_product_view(product_id: int, day: Optional[date] = None):
+    """Count one detail view of a product for the day, in the view buffer"""
+    day = (day or timezone.localdate()).isoformat()
+    generation = get_version(VIEW_BUFFER_VERSION_KEY)
+    key = _count_key(generation, product_id, day)
+    if not version_cache.add(key, 1, VIEW_BUFFER_TIMEOUT):
+        try:
+            version_cache.incr(key)
+        except ValueError:
+            # Flushed (or expired) since the add
+            pass
+        return
+
+    # First view of the product and day in this generation: list it for the flush
+    slots_key = _slots_key(generation)
+    version_cache.add(slots_key, 0, VIEW_BUFFER_TIMEOUT)
+    slot = version_cache.incr(slots_key)
+    version_cache.set(_slot_key(generation, slot), (product_id, day), VIEW_BUFFER_TIMEOUT)
+
+
+def flush_view_counts() -> int:
+    """
+    Add the buffered detail views to ``ProductViewCount``
+
+    Returns:
+        Number of views flushed
+    """
+    generation = get_version(VIEW_BUFFER_VERSION_KEY)
+    # New views go to the next generation while this one is read
+    bump_version(VIEW_BUFFER_VERSION_KEY)
+
+    slots_key = _slots_key(generation)
+    slot_keys = [_slot_key(generation, slot) for slot in range(1, (version_cache.get(slots_key) or 0) + 1)]
+    views = {
+        _count_key(generation, product_id, day): (product_id, date.fromisoformat(day))
+        for product_id, day in version_cache.get_many(slot_keys).values()
+    }
+    counts = {views[key]: count for key, count in version_cache.get_many(list(views)).items() if count}
+    version_cache.delete_many([slots_key, *slot_keys, *views])
+
+    product_ids = {product_id for product_id, day in counts}
+    product_ids &= set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+    counts = {(product_id, day): count for (product_id, day), count in counts.items() if product_id in product_ids}
+    if not counts:
+        return 0
+
+    with transaction.atomic():
+        rows = {
+            (row.product_id, row.date): row
+            for row in ProductViewCount.objects.filter(
+                product_id__in=product_ids, date__in={day for product_id, day in counts}
+            )
+        }
+        updated, created = [], []
+        for (product_id, day), count in counts.items():
+            row = rows.get((product_id, day))
+            if row is None:
+                created.append(ProductViewCount(product_id=product_id, date=day, count=count))
+            else:
+                row.count += count
+                updated.append(row)
+        ProductViewCount.objects.bulk_update(updated, ['count'], batch_size=UPDATE_BATCH_SIZE)
+        ProductViewCount.objects.bulk_create(created, batch_size=UPDATE_BATCH_SIZE)
+
+    return sum(counts.values())
+
+
+def decay(age_days: int, half_life_days: float) -> float:
+    return 0.5 ** (max(age_days, 0) / half_life_days)
+
+
+def daily_activity(since: date) -> Dict[int, Dict[date, Dict[str, float]]]:
+    """
+    Sales, review and view totals per product and day since ``since``
+
+    Returns:
+        {product_id: {day: {'sales': units, 'reviews': rating / 5 summed, 'views': count}}}
+    """
+    from customers.models import OrderItem
+    from customers.order_refs import resolve_product_refs
+
+    activity = defaultdict(lambda: defaultdict(lambda: {'sales': 0.0, 'reviews': 0.0, 'views': 0.0}))
+
+    sales = list(
+        OrderItem.objects.filter(order__created_at__date__gte=since)
+        .exclude(order__order_status__in=EXCLUDED_ORDER_STATUSES)
+        .annotate(day=TruncDate('order__created_at'))
+        .values('product_id', 'product_name', 'day')
+        .annotate(units=Sum('quantity'))
+        .order_by()
+    )
+    # Order items also refer to shop and merchant products; only sales of a Product count
+    products = resolve_product_refs((row['product_id'], row['product_name']) for row in sales)
+    for row in sales:
+        source, product_id = products.get((row['product_id'], row['product_name']), (None, None))
+        if source == 'product':
+            activity[product_id][row['day']]['sales'] += row['units'] or 0
+
+    reviews = (
+        ProductReview.objects.filter(created_at__date__gte=since)
+        .annotate(day=TruncDate('created_at'))
+        .values('product_id', 'day')
+        .annotate(stars=Sum('rating'))
+        .order_by()
+    )
+    for row in reviews:
+        activity[row['product_id']][row['day']]['reviews'] += row['stars'] / 5.0
+
+    views = ProductViewCount.objects.filter(date__gte=since).values_list('product_id', 'date', 'count')
+    for product_id, day, count in views:
+        activity[product_id][day]['views'] += count
+
+    return activity
+
+
+def score_activity(activity, today: date, half_life_days: float = HALF_LIFE_DAYS) -> Dict[int, float]:
+    """Decayed, weighted score per product from ``daily_activity`` output"""
+    scores = {}
+    for product_id, days in activity.items():
+        score = 0.0
+        for day, totals in days.items():
+            weighted = (
+                SALE_WEIGHT * totals['sales'] +
+                REVIEW_WEIGHT * totals['reviews'] +
+                VIEW_WEIGHT * totals['views']
+            )
+            score += weighted * decay((today - day).days, half_life_days)
+        if score > 0:
+            scores[product_id] = round(score, 6)
+    return scores
+
+
+def compute_trending_scores(half_life_days: float = HALF_LIFE_DAYS, window_days: int = WINDOW_DAYS,
+                            today: Optional[date] = None) -> Dict[str, int]:
+    """
+    Recompute and store ``trending_score`` for every product
+
+    Args:
+        half_life_days: Days after which activity counts half
+        window_days: Activity older than this is ignored
+        today: Reference day (defaults to the local date)
+
+    Returns:
+        Dictionary with the number of buffered views flushed and of products
+        scored and reset to zero
+    """
+    views = flush_view_counts()
+    today = today or timezone.localdate()
+    since = today - timedelta(days=window_days)
+    scores = score_activity(daily_activity(since), today, half_life_days)
+
+    existing = set(Product.objects.filter(pk__in=list(scores)).values_list('pk', flat=True))
+    scores = {product_id: score for product_id, score in scores.items() if product_id in existing}
+
+    with transaction.atomic():
+        reset = Product.objects.filter(trending_score__gt=0).exclude(pk__in=list(scores)).update(trending_score=0.0)
+
+        product_ids = list(scores)
+        for start in range(0, len(product_ids), UPDATE_BATCH_SIZE):
+            batch = [
+                Product(pk=product_id, trending_score=scores[product_id])
+                for product_id in product_ids[start:start + UPDATE_BATCH_SIZE]
+            ]
+            Product.objects.bulk_update(batch, ['trending_score'])
+    bump_versions(Product)
+
+    logger.info(f"Trending scores: {views} views flushed, {len(scores)} products scored, {reset} reset")
+    return {'views': views, 'scored': len(scores), 'reset': reset}
+
+
+def prune_view_counts(window_days: int = WINDOW_DAYS, today: Optional[date] = None) -> int:
+    """Delete daily view counts that fell out of the trending window"""
+    today = today or timezone.localdate()
+    deleted, _ = ProductViewCount.objects.filter(date__lt=today - timedelta(days=window_days)).delete()
+    return deleted
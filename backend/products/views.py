@@ -1,29 +1,34 @@
 from rest_framework import viewsets, status, permissions, filters
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Q, Avg, Count
 from django_filters.rest_framework import DjangoFilterBackend
+from ecoswitch_backend.response_cache import CachedResponseMixin, cache_response
 from .models import (
     Category, Subcategory, Brand, Product, ProductReview, 
-    ProductImage, ProductVariant, ProductRecommendation
+    ProductImage, ProductVariant, ProductRecommendation, ProductSimilarity, Tag
 )
 from .serializers import (
     CategorySerializer, SubcategorySerializer, BrandSerializer, ProductSerializer,
     ProductReviewSerializer, ProductImageSerializer, ProductVariantSerializer,
     ProductRecommendationSerializer
 )
+from .pagination import ProductSearchPagination
+from .search import search_product_ids
+from .tags import filter_by_tags
+from .trending import record_product_view
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for categories (read-only)
     """
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = (Category,)
 
 
-class SubcategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class SubcategoryViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for subcategories (read-only)
     """
@@ -32,29 +37,73 @@ class SubcategoryViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.AllowAny]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['category']
+    cache_models = (Subcategory, Category)
 
 
-class BrandViewSet(viewsets.ReadOnlyModelViewSet):
+class BrandViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for brands (read-only)
     """
     queryset = Brand.objects.all()
     serializer_class = BrandSerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = (Brand,)
 
 
 class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for products (read-only)
     """
-    queryset = Product.objects.filter(is_active=True)
+    queryset = Product.objects.filter(is_active=True).select_related(
+        'category', 'subcategory', 'brand'
+    ).prefetch_related('images', 'variants', 'normalized_tags')
     serializer_class = ProductSerializer
     permission_classes = [permissions.AllowAny]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'subcategory', 'brand', 'is_eco_friendly', 'is_featured']
-    search_fields = ['name', 'description', 'brand__name', 'tags']
-    ordering_fields = ['price', 'created_at', 'sustainability_score']
+    search_fields = ['name', 'description', 'brand__name', 'normalized_tags__name']
+    ordering_fields = ['price', 'created_at', 'sustainability_score', 'avg_rating', 'trending_score']
     ordering = ['-created_at']
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        tags = self.request.query_params.getlist('tag')
+        if tags:
+            queryset = filter_by_tags(queryset, tags)
+        return queryset
+    
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        # Detail views feed the trending score
+        record_product_view(instance.pk)
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        Products with similar content, best first (``?limit=``, default 10)
+        
+        Reads the neighbours stored by the compute_similar_products command.
+        """
+        product = self.get_object()
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        
+        similarities = list(
+            ProductSimilarity.objects.filter(product=product, similar_product__is_active=True)
+            .select_related('similar_product__category', 'similar_product__subcategory', 'similar_product__brand')
+            .prefetch_related('similar_product__images', 'similar_product__variants', 'similar_product__normalized_tags')
+            .order_by('rank')[:limit]
+        )
+        serializer = self.get_serializer([similarity.similar_product for similarity in similarities], many=True)
+        results = [
+            dict(data, similarity_score=similarity.score)
+            for data, similarity in zip(serializer.data, similarities)
+        ]
+        return Response({'product_id': product.pk, 'results': results})
 
 
 class ProductReviewViewSet(viewsets.ModelViewSet):
@@ -105,25 +154,38 @@ class ProductRecommendationViewSet(viewsets.ReadOnlyModelViewSet):
 def product_search(request):
     """
     Advanced product search
+    
+    Results are paginated with a cursor (``next`` link). ``sort`` is one of
+    the named sorts in ProductSearchPagination, or ``relevance`` (the
+    default when ``q`` is given).
     """
-    query = request.GET.get('q', '')
+    query = request.GET.get('q', '').strip()
     category = request.GET.get('category', '')
     brand = request.GET.get('brand', '')
     min_price = request.GET.get('min_price', '')
     max_price = request.GET.get('max_price', '')
     eco_friendly = request.GET.get('eco_friendly', '')
-    sort_by = request.GET.get('sort_by', '-created_at')
+    min_rating = request.GET.get('min_rating', '')
+    tags = request.GET.getlist('tag')
     
-    queryset = Product.objects.filter(is_active=True)
+    if min_rating:
+        try:
+            min_rating = float(min_rating)
+        except ValueError:
+            return Response({'error': 'min_rating must be a number'}, status=status.HTTP_400_BAD_REQUEST)
     
-    if query:
-        queryset = queryset.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query) |
-            Q(brand__name__icontains=query) |
-            Q(tags__icontains=query)
+    paginator = ProductSearchPagination()
+    sort = request.GET.get('sort') or (paginator.relevance_sort if query else paginator.default_sort)
+    if sort == paginator.relevance_sort and not query:
+        return Response(
+            {'error': 'Sorting by relevance requires a search query'},
+            status=status.HTTP_400_BAD_REQUEST
         )
     
+    queryset = Product.objects.filter(is_active=True).select_related(
+        'category', 'subcategory', 'brand'
+    ).prefetch_related('images', 'variants', 'normalized_tags')
+    
     if category:
         queryset = queryset.filter(category__slug=category)
     
@@ -139,19 +201,37 @@ def product_search(request):
     if eco_friendly.lower() == 'true':
         queryset = queryset.filter(is_eco_friendly=True)
     
-    queryset = queryset.order_by(sort_by)
+    if min_rating:
+        queryset = queryset.filter(avg_rating__gte=min_rating)
     
-    serializer = ProductSerializer(queryset, many=True)
-    return Response(serializer.data)
+    if tags:
+        queryset = filter_by_tags(queryset, tags)
+    
+    ranked_ids = None
+    if query:
+        # The filters run inside the search, so its limit counts matching products only
+        ranked_ids = search_product_ids(query, limit=paginator.count_limit, queryset=queryset)
+        queryset = queryset.filter(id__in=ranked_ids)
+    
+    if sort == paginator.relevance_sort:
+        page = paginator.paginate_ranked(queryset, ranked_ids, request, sort)
+    else:
+        page = paginator.paginate_queryset(queryset, request)
+    
+    serializer = ProductSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@cache_response(Product, ProductImage, ProductVariant, Category, Subcategory, Brand, Tag)
 def featured_products(request):
     """
     Get featured products
     """
-    products = Product.objects.filter(is_active=True, is_featured=True)[:10]
+    products = Product.objects.filter(is_active=True, is_featured=True).select_related(
+        'category', 'subcategory', 'brand'
+    ).prefetch_related('images', 'variants', 'normalized_tags')[:10]
     serializer = ProductSerializer(products, many=True)
     return Response(serializer.data)
 
@@ -160,15 +240,20 @@ def featured_products(request):
 @permission_classes([permissions.AllowAny])
 def trending_products(request):
     """
-    Get trending products based on reviews and orders
+    Get trending products, optionally within a category (``?category=<slug>``)
+    
+    Scores are precomputed from recent sales, reviews and views by the
+    compute_trending_scores command.
     """
-    products = Product.objects.filter(is_active=True).annotate(
-        review_count=Count('reviews'),
-        avg_rating=Avg('reviews__rating')
-    ).filter(
-        review_count__gte=1,
-        avg_rating__gte=4.0
-    ).order_by('-review_count', '-avg_rating')[:10]
+    products = Product.objects.filter(is_active=True, trending_score__gt=0)
+    
+    category = request.GET.get('category', '')
+    if category:
+        products = products.filter(category__slug=category)
+    
+    products = products.select_related(
+        'category', 'subcategory', 'brand'
+    ).prefetch_related('images', 'variants', 'normalized_tags').order_by('-trending_score', '-id')[:10]
     
     serializer = ProductSerializer(products, many=True)
     return Response(serializer.data)
@@ -124,7 +124,7 @@ const CustomerPortal = () => {
           },
         });
         const recommendationsData = await recommendationsResponse.json();
-        setRecommendations(recommendationsData.results || recommendationsData);
+        setRecommendations(recommendationsData.recommendations || recommendationsData.results || recommendationsData);
       } catch (error) {
         // Fallback to sample data
         setRecommendations([